@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Theo dõi access log của web server (nginx/apache, định dạng common/combined):
+đọc tăng dần theo offset, chờ thay đổi bằng inotify, tách IP client ở mức byte
+và đếm số request theo IP bằng WindowCounter
+
+Đo tốc độ trên log sinh ngẫu nhiên:
+    python3 access_log.py --benchmark --lines 2000000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from file_tailer import FileTailer, InotifyWatcher
+from ip_utils import ip_key, key_to_ip
+from window_counter import WindowCounter
+
+DEFAULT_LOGS = ['/var/log/nginx/access.log', '/var/log/apache2/access.log']
+# Đọc tối đa từng này byte mỗi lượt để số đếm được cập nhật đều đặn
+READ_LIMIT = 8 * 1024 * 1024
+FALLBACK_INTERVAL = 5
+
+# Dùng khi trường đầu không phải IP (ví dụ vhost_combined: "host:port ip - - ...")
+_IP_FALLBACK = re.compile(rb'(?:^|\s)(\d{1,3}(?:\.\d{1,3}){3}|[0-9a-fA-F:]*:[0-9a-fA-F:.]+)\s')
+
+
+def _normalize(token):
+    """Token bytes -> khóa IP (ip_utils.ip_key), hoặc None nếu không phải IP"""
+    try:
+        return ip_key(token.decode('ascii'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class IpExtractor:
+    """Tách IP client của từng dòng log.
+
+    Trường đầu tiên (trước dấu cách) được lấy bằng thao tác byte; chỉ các token
+    *khác nhau* mới được kiểm tra/chuẩn hóa (có cache), regex chỉ chạy với dòng
+    có trường đầu không phải IP.
+    """
+
+    CACHE_LIMIT = 100000
+
+    def __init__(self):
+        self.cache = {}         # token bytes -> khóa IP hoặc None
+
+    def count(self, lines):
+        """Trả về Counter khóa IP -> số request trong các dòng"""
+        tokens = Counter(line[:line.find(b' ')] for line in lines if line)
+        cache = self.cache
+        counts = Counter()
+        fallback = []
+
+        for token, count in tokens.items():
+            ip = cache.get(token, False)
+            if ip is False:
+                ip = _normalize(token)
+                if len(cache) >= self.CACHE_LIMIT:
+                    cache.clear()
+                cache[token] = ip
+            if ip is not None:
+                counts[ip] += count
+            else:
+                fallback.append(token)
+
+        if fallback:
+            # Hiếm: định dạng log có trường khác đứng trước IP
+            unknown = set(fallback)
+            for line in lines:
+                if line[:line.find(b' ')] in unknown:
+                    match = _IP_FALLBACK.search(line)
+                    if match:
+                        ip = _normalize(match.group(1))
+                        if ip is not None:
+                            counts[ip] += 1
+        return counts
+
+
+class AccessLogMonitor:
+    """Thread đọc các access log và cộng số request vào counter"""
+
+    def __init__(self, paths=None, counter=None, window=60, backlog=0):
+        self.paths = list(paths or DEFAULT_LOGS)
+        self.counter = counter if counter is not None else WindowCounter(window)
+        # backlog=0: chỉ đếm request ghi sau khi daemon khởi động
+        self.tailers = [FileTailer(path, backlog=backlog) for path in self.paths]
+        self.extractor = IpExtractor()
+        self.lines_processed = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self, now=None):
+        """Đọc dữ liệu mới của mọi log; trả về số dòng đã xử lý"""
+        processed = 0
+        for tailer in self.tailers:
+            while True:
+                lines = tailer.read_lines(READ_LIMIT)
+                if not lines:
+                    break
+                self.counter.add_many(self.extractor.count(lines), now)
+                processed += len(lines)
+        self.lines_processed += processed
+        return processed
+
+    def start(self):
+        def follow():
+            watcher = InotifyWatcher(self.paths)
+            try:
+                self.poll()
+                while not self._stop.is_set():
+                    watcher.wait(FALLBACK_INTERVAL)
+                    try:
+                        self.poll()
+                    except OSError as e:
+                        print(f"Lỗi đọc access log: {e}", file=sys.stderr)
+            finally:
+                watcher.close()
+
+        self._thread = threading.Thread(target=follow, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+# ---- Benchmark ----
+
+def generate_log(path, lines, clients=5000):
+    """Sinh access log định dạng combined với `clients` IP khác nhau"""
+    rng = random.Random(42)
+    ips = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+           for _ in range(clients)]
+    ips += [f"2001:db8::{i:x}" for i in range(clients // 10)]
+    paths = ['/', '/index.html', '/api/status', '/login', '/static/app.js']
+    with open(path, 'w') as f:
+        batch = []
+        for i in range(lines):
+            ip = ips[rng.randrange(len(ips))]
+            batch.append(f'{ip} - - [01/Jan/2024:12:00:00 +0000] "GET {paths[i % 5]} HTTP/1.1" 200 '
+                         f'{rng.randint(100, 9999)} "-" "Mozilla/5.0 (X11; Linux x86_64)"\n')
+            if len(batch) >= 10000:
+                f.write(''.join(batch))
+                batch = []
+        f.write(''.join(batch))
+
+
+def benchmark(lines=1000000, path=None):
+    """Đo tốc độ xử lý (dòng/giây) từ đọc file tới đếm theo IP"""
+    cleanup = path is None
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+    try:
+        generate_log(path, lines)
+        monitor = AccessLogMonitor([path], backlog=None)
+        started = time.perf_counter()
+        processed = monitor.poll()
+        elapsed = time.perf_counter() - started
+        return processed, elapsed, len(monitor.counter)
+    finally:
+        if cleanup:
+            os.unlink(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Theo dõi access log / đo tốc độ")
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('logs', nargs='*', help="File access log cần theo dõi")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        processed, elapsed, clients = benchmark(args.lines)
+        print(f"{processed} dòng trong {elapsed:.2f}s: {processed / elapsed:,.0f} dòng/giây ({clients} IP)")
+        return 0
+
+    monitor = AccessLogMonitor(args.logs or None)
+    monitor.start()
+    try:
+        while True:
+            time.sleep(5)
+            monitor.counter.expire()
+            for key, total in monitor.counter.top(10):
+                print(f"{key_to_ip(key)}\t{total}")
+            print('-' * 30)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
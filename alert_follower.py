@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Theo dõi journal cảnh báo (JSON Lines) do auto_block.py ghi, chỉ đọc bản ghi mới
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+from file_tailer import FileTailer, InotifyWatcher
+
+ALERT_LOG = '/var/log/firewall_alerts.jsonl'
+
+# Số byte cuối file đọc lại khi mới khởi động (để có sẵn cảnh báo gần đây)
+BACKLOG_BYTES = 64 * 1024
+# Số ID cảnh báo nhớ để loại trùng
+SEEN_LIMIT = 10000
+# Dù có inotify vẫn kiểm tra lại định kỳ để phòng sự kiện bị bỏ lỡ
+FALLBACK_INTERVAL = 30
+
+
+def alert_id(alert):
+    """ID ổn định của cảnh báo (bản ghi cũ không có trường 'id')"""
+    return alert.get('id') or f"{alert.get('timestamp')}|{alert.get('ip')}|{alert.get('reason')}"
+
+
+class AlertFollower:
+    """Đọc tăng dần journal cảnh báo và gọi on_alerts(list) với các cảnh báo mới"""
+
+    def __init__(self, on_alerts, path=ALERT_LOG, backlog=BACKLOG_BYTES):
+        self.on_alerts = on_alerts
+        self.path = path
+        self.tailer = FileTailer(path, backlog=backlog)
+        self.seen = set()
+        self.seen_order = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """Đọc các bản ghi mới ngay lập tức; trả về danh sách cảnh báo mới"""
+        with self._lock:
+            new_alerts = []
+            for line in self.tailer.read_lines():
+                if not line.strip():
+                    continue
+                try:
+                    alert = json.loads(line)
+                except ValueError:
+                    continue
+
+                key = alert_id(alert)
+                if key in self.seen:
+                    continue
+                self.seen.add(key)
+                self.seen_order.append(key)
+                if len(self.seen_order) > SEEN_LIMIT:
+                    self.seen.discard(self.seen_order.popleft())
+                new_alerts.append(alert)
+
+        if new_alerts:
+            self.on_alerts(new_alerts)
+        return new_alerts
+
+    def start(self):
+        """Chạy thread theo dõi: thức dậy khi inotify báo file thay đổi"""
+        def follow():
+            watcher = InotifyWatcher(self.path)
+            try:
+                self.poll()
+                next_check = time.monotonic() + FALLBACK_INTERVAL
+                while not self._stop.is_set():
+                    # Sự kiện của file khác trong cùng thư mục (/var/log) không cần đọc lại;
+                    # xoay vòng log (đổi tên/tạo file) được inotify báo là thay đổi của file
+                    changed = watcher.wait(max(0.0, next_check - time.monotonic()))
+                    if not changed and time.monotonic() < next_check:
+                        continue
+                    next_check = time.monotonic() + FALLBACK_INTERVAL
+                    try:
+                        self.poll()
+                    except Exception as e:
+                        print(f"Lỗi đọc cảnh báo: {e}")
+            finally:
+                watcher.close()
+
+        self._thread = threading.Thread(target=follow, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
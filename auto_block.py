@@ -1,11 +1,29 @@
 #!/usr/bin/env python3
+import argparse
+import signal
 import subprocess
+import sys
 import time
 import logging
-from collections import defaultdict, deque
+from contextlib import nullcontext
+from collections import defaultdict
 import threading
 import json
 import os
+import uuid
+
+from metrics_store import MetricsStore
+from stats_collector import ConnectionCollector
+from iptables_rules import parse_iptables_save, IPTABLES
+from ban_index import BanIndex, SOURCE_AUTO, BACKEND_IPTABLES
+from fail2ban_client import Fail2BanClient, Fail2BanError
+from window_counter import WindowCounter
+from access_log import AccessLogMonitor
+from control_socket import ControlServer, ControlError, load_config_file, CONFIG_FILE, SOCKET_PATH
+from baseline import BaselineDetector, TrafficRecorder
+from ip_utils import key_to_ip, parse_network, NetworkSet
+from instrumentation import Registry, MetricsServer, Profiler, register_process_metrics
+from notifier import Notifier, test_digest
 
 CONFIG = {
     'check_interval': 10,
@@ -13,130 +31,385 @@ CONFIG = {
     'syn_threshold': 50,
     'conn_threshold': 100,
     'whitelist': ['127.0.0.1', '192.168.1.1'],
-    'log_file': '/var/log/firewall_auto_block.log'
+    'log_file': '/var/log/firewall_auto_block.log',
+    'metrics_file': '/var/log/firewall/metrics.tsdb',
+    'alert_file': '/var/log/firewall_alerts.json',
+    'alert_log': '/var/log/firewall_alerts.jsonl',
+    'alert_log_max_bytes': 50 * 1024 * 1024,
+    'ban_index_file': '/var/lib/firewall/ban_index.json',
+    'ban_sync_interval': 60,
+    # Đếm request HTTP theo IP từ access log của web server
+    'access_logs': ['/var/log/nginx/access.log', '/var/log/apache2/access.log'],
+    'http_threshold': 1200,
+    # static: ngưỡng cố định; baseline: so với baseline EWMA theo dải nguồn/dịch vụ; both: cả hai
+    'detection_mode': 'static',
+    'baseline_sigmas': 4.0,
+    'baseline_alpha': 0.05,
+    'baseline_warmup': 30,
+    'baseline_min_count': 30,
+    # Ghi lưu lượng mỗi chu kỳ để chạy lại bằng `baseline.py replay` (None: tắt)
+    'baseline_record_file': None,
+    # Endpoint Prometheus /metrics của daemon (port 0: tắt)
+    'metrics_host': '127.0.0.1',
+    'metrics_port': 9105,
+    # Thông báo: cảnh báo được gộp theo notify_window giây, mỗi kênh giới hạn số tin/giờ
+    'notify_email': [],
+    'notify_smtp_host': 'localhost',
+    'notify_smtp_port': 25,
+    'notify_email_per_hour': 12,
+    'notify_webhook': '',
+    'notify_webhook_per_hour': 120,
+    'notify_syslog': False,
+    'notify_window': 30,
+    'config_file': CONFIG_FILE,
+    'control_socket': SOCKET_PATH
 }
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(CONFIG['log_file']),
-        logging.StreamHandler()
-    ]
-)
+# Các file daemon ghi ra, chuyển vào một thư mục bằng --state-dir
+STATE_FILES = ('log_file', 'metrics_file', 'alert_file', 'alert_log', 'ban_index_file', 'control_socket')
+
+# Ánh xạ trạng thái TCP sang metric trong MetricsStore
+STATE_METRICS = {
+    'ESTABLISHED': 'established',
+    'SYN-SENT': 'syn_sent',
+    'SYN-RECV': 'syn_recv',
+    'TIME-WAIT': 'time_wait',
+    'CLOSE-WAIT': 'close_wait',
+    'FIN-WAIT-1': 'fin_wait',
+    'FIN-WAIT-2': 'fin_wait',
+}
+
+def use_state_dir(directory):
+    """Chạy một daemon riêng (thử nghiệm, mô phỏng) không đụng file của daemon chính"""
+    os.makedirs(directory, exist_ok=True)
+    for key in STATE_FILES:
+        CONFIG[key] = os.path.join(directory, os.path.basename(CONFIG[key]))
+
+def setup_logging():
+    # Gọi trong main(): import module (benchmark, công cụ) không tạo file log
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(CONFIG['log_file']),
+            logging.StreamHandler()
+        ]
+    )
 
 class DosDetector:
     def __init__(self):
-        self.syn_count = defaultdict(lambda: deque(maxlen=100))
-        self.conn_count = defaultdict(lambda: deque(maxlen=100))
-        self.blocked_ips = set()
-        self.load_blocked_ips()
+        self.config = CONFIG
+        # Đánh thức main loop khi có lệnh từ socket điều khiển
+        self.wakeup = threading.Event()
+        self.started_at = time.time()
+        self.cycles = 0
+        self.last_cycle_ms = 0.0
         
-    def load_blocked_ips(self):
+        # Số đếm theo IP trong cửa sổ time_window (không giới hạn số sự kiện)
+        # Các bộ đếm dùng khóa IP số nguyên (ip_utils), chỉ đổi ra chuỗi khi chặn/ghi log
+        self.whitelist = NetworkSet(CONFIG['whitelist'])
+        self.syn_count = WindowCounter(CONFIG['time_window'])
+        self.conn_count = WindowCounter(CONFIG['time_window'])
+        self.http_count = WindowCounter(CONFIG['time_window'])
+        self.access_monitor = None
+        if CONFIG['access_logs']:
+            self.access_monitor = AccessLogMonitor(CONFIG['access_logs'], self.http_count)
+        # Chỉ mục chặn dùng chung với GUI/web (gồm cả rule có sẵn và fail2ban)
+        self.ban_index = BanIndex(CONFIG['ban_index_file'])
+        self.fail2ban = Fail2BanClient()
+        self.last_ban_sync = 0
+        self.state_counts = defaultdict(int)
+        self.port_counts = defaultdict(int)
+        self.connection_total = 0
+        self.collector = ConnectionCollector()
+        self.baseline = BaselineDetector(CONFIG['baseline_alpha'], CONFIG['baseline_sigmas'],
+                                         CONFIG['baseline_warmup'], CONFIG['baseline_min_count'])
+        self.service_alerts = {}    # cổng -> thời điểm cảnh báo bất thường gần nhất
+        self.recorder = None
+        if CONFIG['baseline_record_file']:
+            self.recorder = TrafficRecorder(CONFIG['baseline_record_file'])
+        self.metrics_store = MetricsStore(CONFIG['metrics_file'], writable=True)
+        self.control = ControlServer(self, CONFIG['control_socket'], CONFIG['config_file'])
+        self.notifier = Notifier.from_config(CONFIG)
+        self.profiler = None
+        self.setup_instrumentation()
+        self.sync_ban_index()
+    
+    def setup_instrumentation(self):
+        """Đăng ký các chỉ số xuất ra endpoint /metrics"""
+        registry = self.registry = Registry()
+        register_process_metrics(registry)
+        self.stage_seconds = registry.histogram(
+            'firewall_stage_seconds', "Thời gian từng bước của chu kỳ kiểm tra", ('stage',))
+        self.command_seconds = registry.histogram(
+            'firewall_command_seconds', "Độ trễ lệnh iptables và backend fail2ban", ('command',))
+        self.command_errors = registry.counter(
+            'firewall_command_errors_total', "Số lệnh/backend bị lỗi", ('command',))
+        self.cycles_total = registry.counter('firewall_cycles_total', "Số chu kỳ kiểm tra đã chạy")
+        self.blocks_total = registry.counter('firewall_blocks_total', "Số IP/dải mạng đã chặn")
+        self.alerts_total = registry.counter('firewall_alerts_total', "Số cảnh báo đã ghi")
+        
+        registry.gauge('firewall_tracked_keys', "Số khóa đang theo dõi", ('table',), function=lambda: {
+            'syn': len(self.syn_count),
+            'conn': len(self.conn_count),
+            'http': len(self.http_count),
+            'baseline_sources': len(self.baseline.sources),
+            'baseline_services': len(self.baseline.services),
+        })
+        registry.gauge('firewall_ban_index_entries', "Số bản ghi trong chỉ mục chặn",
+                       function=lambda: len(self.ban_index))
+        registry.gauge('firewall_control_queue_depth', "Thay đổi cấu hình đang chờ áp dụng",
+                       function=lambda: self.control.pending.qsize())
+        registry.gauge('firewall_connections', "Số socket TCP ở lần thu thập gần nhất",
+                       function=lambda: self.connection_total)
+        registry.gauge('firewall_access_log_lines_total', "Số dòng access log đã xử lý",
+                       function=lambda: self.access_monitor.lines_processed if self.access_monitor else 0)
+        registry.gauge('firewall_notify_queue_depth', "Cảnh báo chờ gộp thành thông báo",
+                       function=lambda: self.notifier.queue.qsize())
+        registry.gauge('firewall_notify_dropped', "Cảnh báo bị bỏ vì hàng đợi thông báo đầy (chưa báo)",
+                       function=lambda: self.notifier.dropped)
+        registry.gauge('firewall_notify_sent', "Thông báo đã gửi theo kênh", ('channel',),
+                       function=lambda: {name: stats['sent'] for name, stats in
+                                         self.notifier.stats()['channels'].items()})
+        registry.gauge('firewall_notify_failed', "Lần gửi thông báo lỗi theo kênh", ('channel',),
+                       function=lambda: {name: stats['failed'] for name, stats in
+                                         self.notifier.stats()['channels'].items()})
+        registry.gauge('firewall_last_cycle_seconds', "Thời gian chu kỳ gần nhất",
+                       function=lambda: self.last_cycle_ms / 1000)
+        
+        self.metrics_server = None
+        if CONFIG['metrics_port']:
+            self.metrics_server = MetricsServer(registry, CONFIG['metrics_host'], CONFIG['metrics_port'])
+    
+    def run_command(self, name, args, **kwargs):
+        """subprocess.run có đo độ trễ theo tên lệnh"""
         try:
-            result = subprocess.run(
-                ['iptables', '-L', 'INPUT', '-n', '--line-numbers'],
-                capture_output=True, text=True
+            with self.command_seconds.time(command=name):
+                return subprocess.run(args, **kwargs)
+        except (subprocess.CalledProcessError, OSError):
+            self.command_errors.inc(command=name)
+            raise
+        
+    def apply_config(self, values):
+        """Áp dụng cấu hình mới (đã kiểm tra) - chỉ gọi từ main loop, giữa hai chu kỳ"""
+        old_logs = CONFIG['access_logs']
+        CONFIG.update(values)
+        
+        if 'time_window' in values:
+            for counter in (self.syn_count, self.conn_count, self.http_count):
+                counter.window = CONFIG['time_window']
+        
+        if 'whitelist' in values:
+            self.whitelist = NetworkSet(CONFIG['whitelist'])
+        
+        if any(key.startswith('baseline_') for key in values):
+            self.baseline.configure(CONFIG['baseline_alpha'], CONFIG['baseline_sigmas'],
+                                    CONFIG['baseline_warmup'], CONFIG['baseline_min_count'])
+        
+        if 'access_logs' in values and values['access_logs'] != old_logs:
+            if self.access_monitor is not None:
+                self.access_monitor.stop()
+                self.access_monitor = None
+            if CONFIG['access_logs']:
+                self.access_monitor = AccessLogMonitor(CONFIG['access_logs'], self.http_count)
+                self.access_monitor.start()
+        
+        if any(key.startswith('notify_') for key in values):
+            self.notifier.reconfigure(CONFIG)
+        
+        logging.info(f"Đã áp dụng cấu hình mới: {values}")
+    
+    def daemon_stats(self):
+        """Thống kê trả về qua socket điều khiển"""
+        return {
+            'uptime': time.time() - self.started_at,
+            'cycles': self.cycles,
+            'last_cycle_ms': self.last_cycle_ms,
+            'blocked': len(self.ban_index),
+            'tracked_ips': {
+                'syn': len(self.syn_count),
+                'conn': len(self.conn_count),
+                'http': len(self.http_count),
+            },
+            'connections': self.connection_total,
+            'states': dict(self.state_counts),
+            'http_lines': self.access_monitor.lines_processed if self.access_monitor else 0,
+            'detection_mode': CONFIG['detection_mode'],
+            'baseline_keys': len(self.baseline),
+            'notify': self.notifier.stats(),
+        }
+    
+    def top_offenders(self, metric, n):
+        """IP có số đếm cao nhất trong cửa sổ hiện tại"""
+        counters = {'syn': self.syn_count, 'conn': self.conn_count, 'http': self.http_count}
+        if metric not in counters:
+            raise ControlError(f"metric phải là một trong: {', '.join(counters)}")
+        return [{'ip': key_to_ip(key), 'count': count, 'blocked': self.ban_index.is_blocked(key)}
+                for key, count in counters[metric].top(n)]
+    
+    def sync_ban_index(self):
+        """Đồng bộ chỉ mục chặn với rule DROP thực tế và các ban của fail2ban"""
+        self.last_ban_sync = time.time()
+        try:
+            result = self.run_command(
+                'iptables-save', ['iptables-save', '-c'],
+                capture_output=True, text=True, check=True
             )
-            for line in result.stdout.split('\n'):
-                if 'DROP' in line and '0.0.0.0/0' not in line:
-                    parts = line.split()
-                    for part in parts:
-                        if self.is_valid_ip(part):
-                            self.blocked_ips.add(part)
+            self.ban_index.sync_iptables(parse_iptables_save(result.stdout))
         except Exception as e:
-            logging.error(f"Lỗi load blocked IPs: {e}")
+            logging.error(f"Lỗi đồng bộ rule iptables: {e}")
+        
+        if self.fail2ban.is_available():
+            try:
+                bans = []
+                with self.command_seconds.time(command='fail2ban'):
+                    for jail in self.fail2ban.jails():
+                        bans.extend(self.fail2ban.banned_with_time(jail))
+                self.ban_index.sync_fail2ban(bans)
+            except Fail2BanError as e:
+                self.command_errors.inc(command='fail2ban')
+                logging.error(f"Lỗi đồng bộ fail2ban: {e}")
     
-    def is_valid_ip(self, ip):
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        try:
-            return all(0 <= int(part) <= 255 for part in parts)
-        except ValueError:
-            return False
+    def expire_bans(self):
+        """Gỡ các lệnh chặn iptables đã hết TTL"""
+        for record in self.ban_index.pop_expired():
+            if record.backend != BACKEND_IPTABLES:
+                continue
+            try:
+                command = IPTABLES[record.version]
+                self.run_command(command, [
+                    command, '-D', 'INPUT', '-s', record.network, '-j', 'DROP'
+                ], check=True)
+                logging.info(f"Hết hạn chặn {record.network} ({record.reason})")
+            except subprocess.CalledProcessError as e:
+                logging.error(f"Lỗi gỡ chặn {record.network}: {e}")
     
     def get_network_stats(self):
         syn_stats = defaultdict(int)
         conn_stats = defaultdict(int)
+        state_counts = defaultdict(int)
         
         try:
-            result = subprocess.run(['netstat', '-tn'], capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
-                if 'SYN_' in line:
-                    parts = line.split()
-                    if len(parts) >= 5:
-                        ip = parts[4].split(':')[0]
-                        if self.is_valid_ip(ip) and ip not in CONFIG['whitelist']:
-                            syn_stats[ip] += 1
-            
-            result = subprocess.run(['ss', '-tn'], capture_output=True, text=True)
-            for line in result.stdout.split('\n'):
-                if 'ESTAB' in line or 'SYN-' in line:
-                    parts = line.split()
-                    if len(parts) >= 5:
-                        ip = parts[4].split(':')[0]
-                        if self.is_valid_ip(ip) and ip not in CONFIG['whitelist']:
-                            conn_stats[ip] += 1
+            snapshot = self.collector.collect()
+            whitelist = self.whitelist
+            
+            for ip, count in snapshot.syn_ips.items():
+                if ip not in whitelist:
+                    syn_stats[ip] = count
+            
+            for ip, count in snapshot.ips.items():
+                if ip not in whitelist:
+                    conn_stats[ip] = count
+            
+            for state, count in snapshot.states.items():
+                state_counts[STATE_METRICS.get(state, 'other')] += count
+            
+            self.port_counts = snapshot.ports
+            self.connection_total = snapshot.total
                             
         except Exception as e:
             logging.error(f"Lỗi get network stats: {e}")
-            
+        
+        self.state_counts = state_counts
         return syn_stats, conn_stats
     
+    def record_metrics(self, conn_stats):
+        """Ghi mẫu thống kê vào kho chuỗi thời gian"""
+        try:
+            gauges = dict(self.state_counts)
+            gauges['connections'] = self.connection_total
+            self.metrics_store.record_sample(time.time(), gauges, conn_stats)
+        except Exception as e:
+            logging.error(f"Lỗi ghi metrics: {e}")
+    
+    def record_event(self, name):
+        """Cộng dồn sự kiện chặn/cảnh báo vào kho chuỗi thời gian"""
+        try:
+            self.metrics_store.add_events(name)
+        except Exception as e:
+            logging.error(f"Lỗi ghi metrics: {e}")
+    
     def update_stats(self, syn_stats, conn_stats):
         current_time = time.time()
-        
-        for ip, count in syn_stats.items():
-            for _ in range(count):
-                self.syn_count[ip].append(current_time)
-                
-        for ip, count in conn_stats.items():
-            for _ in range(count):
-                self.conn_count[ip].append(current_time)
+        self.syn_count.add_many(syn_stats, current_time)
+        self.conn_count.add_many(conn_stats, current_time)
     
     def clean_old_records(self):
         current_time = time.time()
-        cutoff = current_time - CONFIG['time_window']
-        
-        for ip in list(self.syn_count.keys()):
-            while (self.syn_count[ip] and self.syn_count[ip][0] < cutoff):
-                self.syn_count[ip].popleft()
-            if not self.syn_count[ip]:
-                del self.syn_count[ip]
-                
-        for ip in list(self.conn_count.keys()):
-            while (self.conn_count[ip] and self.conn_count[ip][0] < cutoff):
-                self.conn_count[ip].popleft()
-            if not self.conn_count[ip]:
-                del self.conn_count[ip]
+        for counter in (self.syn_count, self.conn_count, self.http_count):
+            counter.expire(current_time)
     
     def check_for_attacks(self):
-        current_time = time.time()
-        cutoff = current_time - CONFIG['time_window']
-        
-        for ip in list(self.syn_count.keys()):
-            syn_in_window = sum(1 for ts in self.syn_count[ip] if ts >= cutoff)
+        if CONFIG['detection_mode'] != 'baseline':
+            for key, syn_in_window in self.syn_count.over(CONFIG['syn_threshold']):
+                if not self.ban_index.is_blocked(key):
+                    self.block_ip(key_to_ip(key), f"SYN flood detected: {syn_in_window} SYN packets")
             
-            if (syn_in_window > CONFIG['syn_threshold'] and ip not in self.blocked_ips):
-                self.block_ip(ip, f"SYN flood detected: {syn_in_window} SYN packets")
+            for key, conn_in_window in self.conn_count.over(CONFIG['conn_threshold']):
+                if not self.ban_index.is_blocked(key):
+                    self.block_ip(key_to_ip(key), f"Connection flood detected: {conn_in_window} connections")
         
-        for ip in list(self.conn_count.keys()):
-            conn_in_window = sum(1 for ts in self.conn_count[ip] if ts >= cutoff)
-            
-            if (conn_in_window > CONFIG['conn_threshold'] and ip not in self.blocked_ips):
-                self.block_ip(ip, f"Connection flood detected: {conn_in_window} connections")
+        for key, requests_in_window in self.http_count.over(CONFIG['http_threshold']):
+            if key not in self.whitelist and not self.ban_index.is_blocked(key):
+                self.block_ip(key_to_ip(key), f"HTTP flood detected: {requests_in_window} requests")
+    
+    def check_baseline(self, conn_stats):
+        """Cập nhật baseline mỗi chu kỳ (kể cả ở chế độ static để sẵn sàng khi bật)
+        và chặn các nguồn lệch khỏi baseline"""
+        source_anomalies, service_anomalies = self.baseline.observe(conn_stats, self.port_counts)
+        if CONFIG['detection_mode'] == 'static':
+            return
+        
+        for anomaly in source_anomalies:
+            reason = f"Baseline anomaly: {anomaly.describe()} kết nối từ {anomaly.key}"
+            offenders = [key_to_ip(key) for key, count in anomaly.members.items() if count > anomaly.bound]
+            if not offenders:
+                # Nhiều IP cùng dải, không IP nào vượt riêng: chặn cả dải nếu không đụng whitelist
+                if self.whitelist.overlaps(anomaly.key):
+                    logging.warning(f"{reason} - không chặn dải vì chứa IP whitelist")
+                    continue
+                offenders = [anomaly.key]
+            for target in offenders:
+                if not self.ban_index.is_blocked(target):
+                    self.block_ip(target, reason)
+        
+        now = time.time()
+        for anomaly in service_anomalies:
+            # Dịch vụ không chặn được: chỉ cảnh báo, tối đa một lần mỗi time_window
+            if now - self.service_alerts.get(anomaly.key, 0) < CONFIG['time_window']:
+                continue
+            self.service_alerts[anomaly.key] = now
+            reason = f"Lưu lượng bất thường tới cổng {anomaly.key}: {anomaly.describe()} kết nối"
+            logging.warning(reason)
+            self.write_alert({
+                'id': uuid.uuid4().hex,
+                'timestamp': now,
+                'ip': '*',
+                'port': anomaly.key,
+                'reason': reason,
+                'action': 'ANOMALY'
+            })
     
     def block_ip(self, ip, reason):
+        # Ghi vào chỉ mục trước: nếu IP đã nằm trong một dải bị chặn thì không tạo rule thừa
+        added, covering = self.ban_index.add(ip, SOURCE_AUTO, reason)
+        if not added:
+            if covering is not None:
+                logging.info(f"Bỏ qua chặn {ip}: đã bị chặn bởi {covering.network} ({covering.source})")
+            return
+        
         try:
-            subprocess.run([
-                'iptables', '-I', 'INPUT', '1', '-s', ip, '-j', 'DROP'
+            command = IPTABLES[parse_network(ip)[0]]
+            self.run_command(command, [
+                command, '-I', 'INPUT', '1', '-s', ip, '-j', 'DROP'
             ], check=True)
             
-            self.blocked_ips.add(ip)
+            self.blocks_total.inc()
+            self.record_event('blocks')
             logging.warning(f"Đã chặn IP {ip}: {reason}")
             
             alert_data = {
+                'id': uuid.uuid4().hex,
                 'timestamp': time.time(),
                 'ip': ip,
                 'reason': reason,
@@ -145,11 +418,23 @@ class DosDetector:
             self.write_alert(alert_data)
             
         except subprocess.CalledProcessError as e:
+            self.ban_index.remove(ip)
             logging.error(f"Lỗi khi chặn IP {ip}: {e}")
     
+    def send_test_notification(self):
+        """Lệnh notify_test của socket điều khiển: gửi ngay một thông báo thử"""
+        if not self.notifier.channels:
+            raise ControlError("Chưa cấu hình kênh thông báo nào")
+        self.notifier.send_now(test_digest())
+        return [channel.name for channel in self.notifier.channels]
+    
     def write_alert(self, alert_data):
+        self.append_alert_log(alert_data)
+        # Chỉ đưa vào hàng đợi, không bao giờ chờ mạng trong main loop
+        self.notifier.notify(alert_data)
+        
         try:
-            alert_file = '/var/log/firewall_alerts.json'
+            alert_file = CONFIG['alert_file']
             alerts = []
             
             if os.path.exists(alert_file):
@@ -166,32 +451,135 @@ class DosDetector:
             
             with open(alert_file, 'w') as f:
                 json.dump(alerts, f, indent=2)
+            
+            self.alerts_total.inc()
+            self.record_event('alerts')
                 
         except Exception as e:
             logging.error(f"Lỗi ghi alert: {e}")
     
+    def append_alert_log(self, alert_data):
+        """Ghi thêm cảnh báo vào journal JSON Lines (GUI đọc tăng dần theo offset)"""
+        try:
+            log_path = CONFIG['alert_log']
+            if (os.path.exists(log_path) and
+                    os.path.getsize(log_path) > CONFIG['alert_log_max_bytes']):
+                os.replace(log_path, log_path + '.1')
+            
+            with open(log_path, 'a') as f:
+                f.write(json.dumps(alert_data) + '\n')
+                
+        except Exception as e:
+            logging.error(f"Lỗi ghi alert log: {e}")
+    
     def run(self):
         logging.info("Bắt đầu giám sát tự động phát hiện DoS/DDoS...")
+        if self.access_monitor is not None:
+            self.access_monitor.start()
+            logging.info(f"Theo dõi access log: {', '.join(self.access_monitor.paths)}")
         
-        while True:
+        try:
+            self.control.start()
+        except OSError as e:
+            logging.error(f"Không mở được socket điều khiển: {e}")
+        
+        self.notifier.start()
+        
+        if self.metrics_server is not None:
             try:
-                syn_stats, conn_stats = self.get_network_stats()
-                self.update_stats(syn_stats, conn_stats)
-                self.clean_old_records()
-                self.check_for_attacks()
-                
-                if len(self.blocked_ips) > 0:
-                    logging.info(f"IP đang bị chặn: {len(self.blocked_ips)}")
-                
-                time.sleep(CONFIG['check_interval'])
-                
-            except Exception as e:
-                logging.error(f"Lỗi trong vòng lặp chính: {e}")
-                time.sleep(CONFIG['check_interval'])
+                self.metrics_server.start()
+                logging.info(f"Metrics: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                logging.error(f"Không mở được endpoint metrics: {e}")
+        
+        next_cycle = time.time()
+        while True:
+            # Thay đổi cấu hình chỉ được áp dụng ở đây, giữa hai chu kỳ
+            self.control.apply_pending()
+            
+            if time.time() >= next_cycle:
+                started = time.perf_counter()
+                try:
+                    with self.profiler.cycle() if self.profiler else nullcontext():
+                        self.run_cycle()
+                except Exception as e:
+                    logging.error(f"Lỗi trong vòng lặp chính: {e}")
+                elapsed = time.perf_counter() - started
+                self.stage_seconds.observe(elapsed, stage='total')
+                self.cycles_total.inc()
+                self.cycles += 1
+                self.last_cycle_ms = elapsed * 1000
+                next_cycle = time.time() + CONFIG['check_interval']
+            
+            self.wakeup.wait(max(0.0, next_cycle - time.time()))
+            self.wakeup.clear()
+    
+    def run_cycle(self):
+        stage = self.stage_seconds.time
+        with stage(stage='collect'):
+            syn_stats, conn_stats = self.get_network_stats()
+        with stage(stage='update'):
+            self.update_stats(syn_stats, conn_stats)
+        with stage(stage='record'):
+            self.record_metrics(conn_stats)
+            if self.recorder is not None:
+                try:
+                    self.recorder.record(time.time(), conn_stats, self.port_counts)
+                except OSError as e:
+                    logging.error(f"Lỗi ghi lưu lượng: {e}")
+        with stage(stage='expire_counters'):
+            self.clean_old_records()
+        
+        with stage(stage='ban_sync'):
+            # Thay đổi từ GUI/web (chặn thủ công) được đọc lại mỗi vòng
+            self.ban_index.reload()
+            if time.time() - self.last_ban_sync >= CONFIG['ban_sync_interval']:
+                self.sync_ban_index()
+        with stage(stage='expire_bans'):
+            self.expire_bans()
+        with stage(stage='detect'):
+            self.check_for_attacks()
+        with stage(stage='baseline'):
+            self.check_baseline(conn_stats)
+        
+        if len(self.ban_index) > 0:
+            logging.info(f"IP đang bị chặn: {len(self.ban_index)}")
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon tự động phát hiện và chặn DoS/DDoS")
+    parser.add_argument('--config', default=CONFIG_FILE,
+                        help=f"File cấu hình GUI/web lưu (mặc định {CONFIG_FILE})")
+    parser.add_argument('--state-dir', metavar='DIR',
+                        help="Ghi log, cảnh báo, metrics, chỉ mục chặn và socket điều khiển vào DIR")
+    parser.add_argument('--profile', metavar='DIR',
+                        help="Bật cProfile quanh các chu kỳ, ghi snapshot định kỳ vào DIR")
+    parser.add_argument('--profile-interval', type=int, default=300,
+                        help="Số giây giữa hai snapshot profile (mặc định 300)")
+    args = parser.parse_args(argv)
+    
+    CONFIG['config_file'] = args.config
+    if args.state_dir:
+        use_state_dir(args.state_dir)
+    setup_logging()
+    
+    # Cấu hình do GUI/web lưu (đọc trước khi tạo detector)
+    try:
+        CONFIG.update(load_config_file(args.config))
+    except (OSError, ValueError, ControlError) as e:
+        logging.error(f"Lỗi đọc file cấu hình, dùng cấu hình mặc định: {e}")
+    
     detector = DosDetector()
-    detector.run()
+    if args.profile:
+        detector.profiler = Profiler(args.profile, args.profile_interval)
+        logging.info(f"Profile: snapshot mỗi {args.profile_interval}s vào {args.profile}")
+    # systemctl stop gửi SIGTERM: thoát qua finally để gửi nốt thông báo
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        detector.run()
+    finally:
+        detector.notifier.stop()
+        if detector.profiler is not None:
+            detector.profiler.dump()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
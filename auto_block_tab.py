@@ -1,14 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
-import json
-import os
+
+from gui_worker import get_worker, BusyIndicator
+from control_socket import (ControlClient, ControlError, validate_config,
+                            load_config_file, save_config_file)
+from ip_utils import is_valid_ip
 
 class AutoBlockTab:
     def __init__(self, parent):
         self.parent = parent
         self.config_file = "/etc/firewall_auto_block.conf"
         self.service_name = "firewall-auto-block"
+        self.worker = get_worker(parent)
+        # Daemon đang chạy nhận cấu hình mới qua socket điều khiển, không cần restart
+        self.control = ControlClient()
         
         self.create_widgets()
         self.load_config()
@@ -27,6 +33,7 @@ class AutoBlockTab:
         
         self.toggle_btn = ttk.Button(status_frame, text="Bật Tự Động", command=self.toggle_auto_block)
         self.toggle_btn.pack(side=tk.RIGHT, padx=5)
+        BusyIndicator(status_frame, self.worker, 'auto_block', side=tk.RIGHT, padx=5)
         
         # Configuration frame
         config_frame = ttk.LabelFrame(main_frame, text="Cấu Hình Ngưỡng")
@@ -47,8 +54,16 @@ class AutoBlockTab:
         self.check_interval = tk.StringVar()
         ttk.Entry(config_frame, textvariable=self.check_interval, width=10).grid(row=2, column=1, padx=5, pady=2)
         
+        # HTTP Threshold (access log)
+        ttk.Label(config_frame, text="HTTP Threshold (request/phút):").grid(row=3, column=0, sticky=tk.W, padx=5, pady=2)
+        self.http_threshold = tk.StringVar()
+        ttk.Entry(config_frame, textvariable=self.http_threshold, width=10).grid(row=3, column=1, padx=5, pady=2)
+        
         # Save config button
-        ttk.Button(config_frame, text="Lưu Cấu Hình", command=self.save_config).grid(row=3, column=0, columnspan=2, pady=5)
+        ttk.Button(config_frame, text="Lưu Cấu Hình", command=self.save_config).grid(row=4, column=0, columnspan=2, pady=5)
+        self.config_source_var = tk.StringVar()
+        ttk.Label(config_frame, textvariable=self.config_source_var, foreground="gray").grid(
+            row=5, column=0, columnspan=2, sticky=tk.W, padx=5)
         
         # Whitelist frame
         whitelist_frame = ttk.LabelFrame(main_frame, text="IP Whitelist")
@@ -81,104 +96,139 @@ class AutoBlockTab:
         self.check_service_status()
     
     def check_service_status(self):
-        """Kiểm tra trạng thái service"""
-        try:
+        """Kiểm tra trạng thái service (chạy nền)"""
+        def fetch():
             result = subprocess.run(
                 ['systemctl', 'is-active', self.service_name],
                 capture_output=True, text=True
             )
-            if result.stdout.strip() == 'active':
+            return result.stdout.strip() == 'active'
+        
+        def show(active):
+            if active:
                 self.status_var.set("ĐANG BẬT - Tự động chặn đang chạy")
                 self.toggle_btn.config(text="Tắt Tự Động")
             else:
                 self.status_var.set("ĐANG TẮT - Tự động chặn không chạy")
                 self.toggle_btn.config(text="Bật Tự Động")
-        except Exception as e:
-            self.status_var.set(f"Lỗi: {str(e)}")
+        
+        self.worker.submit(
+            fetch, on_done=show,
+            on_error=lambda e: self.status_var.set(f"Lỗi: {str(e)}"),
+            key='auto_block.status', group='auto_block'
+        )
     
     def toggle_auto_block(self):
         """Bật/tắt tự động chặn"""
-        try:
-            current_status = self.status_var.get()
-            if "ĐANG BẬT" in current_status:
-                # Tắt service
-                subprocess.run(['systemctl', 'stop', self.service_name], check=True)
-                subprocess.run(['systemctl', 'disable', self.service_name], check=True)
-                messagebox.showinfo("Thành công", "Đã tắt chế độ tự động chặn")
-            else:
+        enable = "ĐANG BẬT" not in self.status_var.get()
+        
+        def run():
+            if enable:
                 # Bật service
                 subprocess.run(['systemctl', 'enable', self.service_name], check=True)
                 subprocess.run(['systemctl', 'start', self.service_name], check=True)
+            else:
+                # Tắt service
+                subprocess.run(['systemctl', 'stop', self.service_name], check=True)
+                subprocess.run(['systemctl', 'disable', self.service_name], check=True)
+        
+        def done(result):
+            if enable:
                 messagebox.showinfo("Thành công", "Đã bật chế độ tự động chặn")
-            
+            else:
+                messagebox.showinfo("Thành công", "Đã tắt chế độ tự động chặn")
             self.check_service_status()
-            
-        except subprocess.CalledProcessError as e:
+        
+        def failed(e):
             messagebox.showerror("Lỗi", f"Không thể thay đổi trạng thái: {e}")
+            self.check_service_status()
+        
+        self.worker.submit(run, on_done=done, on_error=failed,
+                           key='auto_block.toggle', group='auto_block')
     
     def load_config(self):
-        """Tải cấu hình từ file"""
+        """Tải cấu hình từ daemon (nếu đang chạy), không thì từ file (chạy nền)"""
         default_config = {
-            'syn_threshold': '50',
-            'conn_threshold': '100',
-            'check_interval': '10',
+            'syn_threshold': 50,
+            'conn_threshold': 100,
+            'http_threshold': 1200,
+            'check_interval': 10,
             'whitelist': ['127.0.0.1', '192.168.1.1']
         }
         
-        try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-            else:
+        def fetch():
+            try:
+                return self.control.get_config(), True
+            except ControlError:
+                pass
+            try:
+                config = dict(default_config)
+                config.update(load_config_file(self.config_file))
+            except (OSError, ValueError, ControlError) as e:
+                print(f"Lỗi đọc {self.config_file}: {e}")
                 config = default_config
-                self.save_config_file(config)
-        except:
-            config = default_config
-        
-        # Áp dụng cấu hình vào GUI
-        self.syn_threshold.set(config.get('syn_threshold', '50'))
-        self.conn_threshold.set(config.get('conn_threshold', '100'))
-        self.check_interval.set(config.get('check_interval', '10'))
-        
-        # Load whitelist
-        self.whitelist_listbox.delete(0, tk.END)
-        for ip in config.get('whitelist', []):
-            self.whitelist_listbox.insert(tk.END, ip)
+            return config, False
+        
+        def show(result):
+            config, live = result
+            # Áp dụng cấu hình vào GUI
+            self.syn_threshold.set(str(config.get('syn_threshold', 50)))
+            self.conn_threshold.set(str(config.get('conn_threshold', 100)))
+            self.http_threshold.set(str(config.get('http_threshold', 1200)))
+            self.check_interval.set(str(config.get('check_interval', 10)))
+            
+            # Load whitelist
+            self.whitelist_listbox.delete(0, tk.END)
+            for ip in config.get('whitelist', []):
+                self.whitelist_listbox.insert(tk.END, ip)
+            
+            if live:
+                self.config_source_var.set("Cấu hình đang chạy của daemon")
+            else:
+                self.config_source_var.set(f"Daemon không chạy - đọc từ {self.config_file}")
+        
+        self.worker.submit(fetch, on_done=show, key='auto_block.config', group='auto_block', replace=True)
     
     def save_config(self):
-        """Lưu cấu hình"""
+        """Lưu cấu hình: áp dụng ngay cho daemon đang chạy, hoặc ghi file nếu daemon tắt"""
         try:
-            # Validate inputs
-            syn_val = int(self.syn_threshold.get())
-            conn_val = int(self.conn_threshold.get())
-            interval_val = int(self.check_interval.get())
-            
-            if syn_val <= 0 or conn_val <= 0 or interval_val <= 0:
-                raise ValueError("Các giá trị phải lớn hơn 0")
-            
-            # Lấy whitelist từ listbox
-            whitelist = list(self.whitelist_listbox.get(0, tk.END))
-            
-            config = {
-                'syn_threshold': str(syn_val),
-                'conn_threshold': str(conn_val),
-                'check_interval': str(interval_val),
-                'whitelist': whitelist
-            }
-            
-            self.save_config_file(config)
-            messagebox.showinfo("Thành công", "Đã lưu cấu hình")
-            
-        except ValueError as e:
+            values = validate_config({
+                'syn_threshold': self.syn_threshold.get(),
+                'conn_threshold': self.conn_threshold.get(),
+                'http_threshold': self.http_threshold.get(),
+                'check_interval': self.check_interval.get(),
+                # Lấy whitelist từ listbox
+                'whitelist': list(self.whitelist_listbox.get(0, tk.END)),
+            })
+        except ControlError as e:
             messagebox.showerror("Lỗi", f"Giá trị không hợp lệ: {e}")
-    
-    def save_config_file(self, config):
-        """Lưu cấu hình vào file"""
-        # Đảm bảo thư mục tồn tại
-        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+            return
+        
+        def run():
+            if self.control.is_available():
+                try:
+                    # Daemon tự ghi file sau khi áp dụng
+                    self.control.set_config(values, persist=True)
+                    return True
+                except ControlError as e:
+                    # Socket cũ / daemon bận: vẫn ghi file, daemon đọc khi khởi động
+                    print(f"Không áp dụng được qua socket điều khiển: {e}")
+            config = load_config_file(self.config_file)
+            config.update(values)
+            save_config_file(config, self.config_file)
+            return False
         
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        def done(live):
+            if live:
+                self.config_source_var.set("Cấu hình đang chạy của daemon")
+                messagebox.showinfo("Thành công", "Đã lưu và áp dụng cấu hình cho daemon đang chạy")
+            else:
+                self.config_source_var.set(f"Daemon không chạy - đọc từ {self.config_file}")
+                messagebox.showinfo("Thành công", "Đã lưu cấu hình (áp dụng khi daemon khởi động)")
+        
+        self.worker.submit(run, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể lưu cấu hình: {e}"),
+                           key='auto_block.save', group='auto_block')
     
     def add_whitelist_ip(self):
         """Thêm IP vào whitelist"""
@@ -187,8 +237,8 @@ class AutoBlockTab:
             messagebox.showwarning("Cảnh báo", "Vui lòng nhập IP")
             return
         
-        # Validate IP
-        if not self.is_valid_ip(ip):
+        # Validate IP (IPv4/IPv6, có thể là dải CIDR)
+        if not is_valid_ip(ip, allow_network=True):
             messagebox.showerror("Lỗi", "IP không hợp lệ")
             return
         
@@ -208,13 +258,3 @@ class AutoBlockTab:
         
         for index in reversed(selection):
             self.whitelist_listbox.delete(index)
-    
-    def is_valid_ip(self, ip):
-        """Kiểm tra IP hợp lệ"""
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        try:
-            return all(0 <= int(part) <= 255 for part in parts)
-        except ValueError:
-            return False
\ No newline at end of file
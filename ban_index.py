@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Chỉ mục chặn IP dùng chung cho daemon, GUI và web dashboard: mỗi bản ghi là một
+địa chỉ/dải mạng (khóa số nguyên) kèm nguồn chặn, lý do, TTL và backend.
+Kiểm tra "IP đã bị chặn bởi dải nào chưa" là O(log n) nhờ tìm nhị phân trên các
+khoảng đã gộp, và các lệnh chặn thừa bị từ chối trước khi tới kernel.
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+
+from ip_utils import parse_network, format_network, key_native
+
+DEFAULT_PATH = '/var/lib/firewall/ban_index.json'
+
+# Nguồn chặn
+SOURCE_AUTO = 'auto_block'
+SOURCE_MANUAL = 'manual'
+SOURCE_IPTABLES = 'iptables'      # rule DROP có sẵn, không rõ ai tạo
+SOURCE_FAIL2BAN = 'fail2ban'
+
+BACKEND_IPTABLES = 'iptables'
+BACKEND_FAIL2BAN = 'fail2ban'
+
+# Bản ghi mới hơn khoảng này không bị đồng bộ xóa (rule kernel có thể chưa kịp tạo)
+SYNC_GRACE = 30
+
+
+class BanRecord:
+    __slots__ = ('network', 'version', 'start', 'end', 'prefixlen',
+                 'source', 'reason', 'created_at', 'ttl', 'backend')
+
+    def __init__(self, network, source, reason='', created_at=None, ttl=None, backend=BACKEND_IPTABLES):
+        self.version, self.start, self.end, self.prefixlen = parse_network(network)
+        self.network = format_network(self.version, self.start, self.prefixlen)
+        self.source = source
+        self.reason = reason
+        self.created_at = created_at if created_at is not None else time.time()
+        self.ttl = ttl
+        self.backend = backend
+
+    @property
+    def key(self):
+        return (self.version, self.start, self.prefixlen)
+
+    @property
+    def expires_at(self):
+        return self.created_at + self.ttl if self.ttl else None
+
+    def to_dict(self):
+        return {
+            'network': self.network,
+            'source': self.source,
+            'reason': self.reason,
+            'created_at': self.created_at,
+            'ttl': self.ttl,
+            'backend': self.backend,
+            'expires_at': self.expires_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['network'], data.get('source', SOURCE_IPTABLES), data.get('reason', ''),
+                   data.get('created_at'), data.get('ttl'), data.get('backend', BACKEND_IPTABLES))
+
+
+def _span(value):
+    """Chuỗi IP/dải mạng hoặc khóa IP (ip_utils.ip_key) -> (version, start, end)"""
+    if isinstance(value, int):
+        version, start = key_native(value)
+        return version, start, start
+    version, start, end, prefixlen = parse_network(value)
+    return version, start, end
+
+
+class BanIndex:
+    """Chỉ mục trong bộ nhớ, đồng bộ với file JSON (khóa flock khi ghi)"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.records = {}           # (version, start, prefixlen) -> BanRecord
+        self._intervals = {}        # version -> (starts, ends) đã gộp
+        self._prefixlens = {}       # version -> các độ dài prefix đang dùng
+        self._dirty = True
+        self._changes = 0
+        self._mtime = None
+        self._lock = threading.RLock()
+
+    # ---- Lưu trữ ----
+
+    def _file_lock(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.path + '.lock', 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _load(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._mtime is not None:
+                self.records = {}
+                self._dirty = True
+            self._mtime = None
+            return
+        if st.st_mtime_ns == self._mtime:
+            return
+
+        with open(self.path) as f:
+            try:
+                data = json.load(f)
+            except ValueError:
+                data = []
+        records = {}
+        for item in data:
+            try:
+                record = BanRecord.from_dict(item)
+            except (KeyError, ValueError):
+                continue
+            records[record.key] = record
+        self.records = records
+        self._mtime = st.st_mtime_ns
+        self._dirty = True
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump([record.to_dict() for record in self.records.values()], f)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def reload(self):
+        """Đọc lại file nếu tiến trình khác đã thay đổi nó"""
+        with self._lock:
+            self._load()
+
+    def _modify(self, change):
+        # Đọc - sửa - ghi trong một khóa file để không mất thay đổi của tiến trình khác
+        with self._lock:
+            lock_file = self._file_lock()
+            try:
+                self._load()
+                changes = self._changes
+                result = change()
+                if self._changes != changes:
+                    self._save()
+                return result
+            finally:
+                lock_file.close()
+
+    # ---- Tra cứu ----
+
+    def _rebuild(self):
+        """Gộp các dải chồng lấn/liền kề thành danh sách khoảng đã sắp xếp.
+
+        Chỉ bản ghi backend iptables (DROP mọi cổng) được tính là đã chặn: ban của
+        fail2ban thường chỉ áp cho cổng của jail, chỉ dùng để hiển thị và đồng bộ.
+        """
+        intervals = {}
+        for version in (4, 6):
+            spans = sorted((r.start, r.end) for r in self.records.values()
+                           if r.version == version and r.backend == BACKEND_IPTABLES)
+            starts, ends = [], []
+            for start, end in spans:
+                if ends and start <= ends[-1] + 1:
+                    if end > ends[-1]:
+                        ends[-1] = end
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            intervals[version] = (starts, ends)
+        self._intervals = intervals
+        self._prefixlens = {version: sorted({r.prefixlen for r in self.records.values() if r.version == version})
+                            for version in (4, 6)}
+        self._dirty = False
+
+    def _covered(self, version, start, end):
+        if self._dirty:
+            self._rebuild()
+        starts, ends = self._intervals.get(version, ((), ()))
+        i = bisect.bisect_right(starts, start) - 1
+        return i >= 0 and ends[i] >= end
+
+    def is_blocked(self, value):
+        """IP/dải mạng (chuỗi hoặc khóa IP) có nằm trọn trong một dải bị DROP bằng iptables không (O(log n))"""
+        try:
+            version, start, end = _span(value)
+        except ValueError:
+            return False
+        with self._lock:
+            return self._covered(version, start, end)
+
+    def covering(self, value):
+        """Các bản ghi chứa IP/dải mạng (duyệt theo các độ dài prefix đang dùng)"""
+        try:
+            version, start, end = _span(value)
+        except ValueError:
+            return []
+        bits = 32 if version == 4 else 128
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            found = []
+            for prefixlen in self._prefixlens.get(version, ()):
+                mask = ((1 << bits) - 1) ^ ((1 << (bits - prefixlen)) - 1)
+                record = self.records.get((version, start & mask, prefixlen))
+                if record is not None and record.end >= end:
+                    found.append(record)
+            return found
+
+    def get(self, value):
+        try:
+            version, start, end, prefixlen = parse_network(value)
+        except ValueError:
+            return None
+        with self._lock:
+            return self.records.get((version, start, prefixlen))
+
+    def entries(self, source=None):
+        with self._lock:
+            records = list(self.records.values())
+        if source:
+            records = [r for r in records if r.source == source or r.source.startswith(source + ':')]
+        return records
+
+    def __len__(self):
+        return len(self.records)
+
+    # ---- Thay đổi ----
+
+    def _put(self, record):
+        self.records[record.key] = record
+        self._dirty = True
+        self._changes += 1
+
+    def _delete(self, key):
+        del self.records[key]
+        self._dirty = True
+        self._changes += 1
+
+    def add(self, network, source, reason='', ttl=None, backend=BACKEND_IPTABLES):
+        """Ghi nhận một lệnh chặn.
+
+        Trả về (True, record) nếu đã thêm; (False, bản ghi đang chứa nó) nếu
+        dải này đã bị chặn sẵn - khi đó không cần tạo rule kernel nữa.
+        """
+        record = BanRecord(network, source, reason, ttl=ttl, backend=backend)
+
+        def change():
+            if self._covered(record.version, record.start, record.end):
+                covering = [r for r in self.covering(record.network) if r.backend == BACKEND_IPTABLES]
+                return False, covering[0] if covering else None
+            self._put(record)
+            return True, record
+
+        return self._modify(change)
+
+    def remove(self, network):
+        """Bỏ bản ghi đúng dải mạng này; trả về bản ghi đã bỏ hoặc None"""
+        def change():
+            record = self.get(network)
+            if record is not None:
+                self._delete(record.key)
+            return record
+
+        return self._modify(change)
+
+    def pop_expired(self, now=None):
+        """Bỏ và trả về các bản ghi đã hết TTL"""
+        now = now if now is not None else time.time()
+
+        def change():
+            expired = [r for r in self.records.values() if r.expires_at and r.expires_at <= now]
+            for record in expired:
+                self._delete(record.key)
+            return expired
+
+        return self._modify(change)
+
+    # ---- Đồng bộ từ iptables / fail2ban ----
+
+    def sync_iptables(self, rules):
+        """Đồng bộ bản ghi backend iptables với rule DROP thực tế của chain INPUT.
+
+        Rule DROP chưa có trong chỉ mục được ghi với nguồn 'iptables'; bản ghi
+        iptables mà rule đã bị xóa ngoài ý muốn (reboot, iptables -F) bị bỏ.
+        Chỉ xét IPv4: rules lấy từ iptables-save, bản ghi IPv6 nằm ở ip6tables.
+        """
+        present = {}
+        for rule in rules:
+            if rule.table != 'filter' or rule.chain != 'INPUT' or rule.target != 'DROP':
+                continue
+            if rule.source.startswith('!') or rule.source in ('0.0.0.0/0', '::/0'):
+                continue
+            try:
+                version, start, end, prefixlen = parse_network(rule.source)
+            except ValueError:
+                continue
+            present[(version, start, prefixlen)] = format_network(version, start, prefixlen)
+
+        def change():
+            recent = time.time() - SYNC_GRACE
+            for key, record in list(self.records.items()):
+                if (record.backend == BACKEND_IPTABLES and record.version == 4 and
+                        key not in present and record.created_at < recent):
+                    self._delete(key)
+            for key, network in present.items():
+                if key not in self.records:
+                    self._put(BanRecord(network, SOURCE_IPTABLES, 'Rule DROP có sẵn'))
+
+        self._modify(change)
+
+    def sync_fail2ban(self, bans):
+        """bans: các BanEntry của fail2ban_client (jail, ip, banned_at, bantime)"""
+        def change():
+            current = {}
+            for entry in bans:
+                try:
+                    record = BanRecord(entry.ip, f"{SOURCE_FAIL2BAN}:{entry.jail}", f"Jail {entry.jail}",
+                                       entry.banned_at, entry.bantime if entry.bantime and entry.bantime > 0 else None,
+                                       BACKEND_FAIL2BAN)
+                except ValueError:
+                    continue
+                current.setdefault(record.key, record)
+
+            for key, record in list(self.records.items()):
+                if record.backend == BACKEND_FAIL2BAN and key not in current:
+                    self._delete(key)
+            for key, record in current.items():
+                if key not in self.records:
+                    self._put(record)
+
+        self._modify(change)
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_ban_index():
+    """Chỉ mục dùng chung trong tiến trình"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = BanIndex()
+        return _default_index
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Ngưỡng thích nghi cho auto_block.py: mỗi dải nguồn (/24, /64) và mỗi dịch vụ
+(cổng cục bộ) có một baseline EWMA (trung bình + phương sai, O(1) bộ nhớ mỗi
+khóa); giá trị lệch quá `sigmas` độ lệch chuẩn so với baseline bị coi là bất thường.
+
+Ghi lại lưu lượng thật rồi chạy lại offline để chỉnh tham số:
+    python3 baseline.py record traffic.jsonl --cycles 360
+    python3 baseline.py replay traffic.jsonl --sigmas 4
+    python3 baseline.py generate synthetic.jsonl && python3 baseline.py replay synthetic.jsonl
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from ip_utils import ip_key, ip_keys, key_to_ip, parse_network, native_key
+
+DEFAULT_ALPHA = 0.05
+DEFAULT_SIGMAS = 4.0
+DEFAULT_WARMUP = 30
+DEFAULT_MIN_COUNT = 30
+PREFIX_V4 = 24
+PREFIX_V6 = 64
+MAX_KEYS = 100000
+# Độ lệch chuẩn tối thiểu (số kết nối), tránh chia cho ~0 với nguồn rất đều
+MIN_STD = 1.0
+# Số chu kỳ vắng mặt tối đa được "bù" bằng mẫu 0; sau đó baseline coi như về 0
+MAX_DECAY_CYCLES = 200
+
+
+class EwmaStat:
+    """Trung bình và phương sai trượt theo hàm mũ của một khóa"""
+
+    __slots__ = ('mean', 'var', 'samples', 'first_cycle', 'last_cycle')
+
+    def __init__(self, cycle=0):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+        self.first_cycle = cycle
+        self.last_cycle = cycle
+
+    def update(self, value, alpha):
+        if self.samples == 0:
+            self.mean = float(value)
+        else:
+            diff = value - self.mean
+            incr = alpha * diff
+            self.mean += incr
+            self.var = (1 - alpha) * (self.var + diff * incr)
+        self.samples += 1
+
+    def catch_up(self, cycle, alpha):
+        """Cộng các mẫu 0 cho những chu kỳ khóa không xuất hiện"""
+        missed = cycle - self.last_cycle - 1
+        if missed > 0 and self.samples:
+            if missed >= MAX_DECAY_CYCLES:
+                self.mean = 0.0
+                self.var = 0.0
+                self.samples += missed
+            else:
+                for _ in range(missed):
+                    self.update(0, alpha)
+        self.last_cycle = cycle
+
+    @property
+    def std(self):
+        return max(math.sqrt(self.var), MIN_STD)
+
+    def bound(self, sigmas):
+        """Giá trị lớn nhất còn coi là bình thường"""
+        return self.mean + sigmas * self.std
+
+    def to_dict(self):
+        return {'mean': self.mean, 'std': self.std, 'samples': self.samples}
+
+
+class Anomaly:
+    __slots__ = ('key', 'value', 'mean', 'std', 'score', 'bound', 'members')
+
+    def __init__(self, key, value, stat, sigmas, members=None):
+        self.key = key
+        self.value = value
+        self.mean = stat.mean
+        self.std = stat.std
+        self.score = (value - stat.mean) / stat.std
+        self.bound = stat.bound(sigmas)
+        self.members = members or {}    # khóa IP -> số kết nối trong dải (chỉ với nguồn)
+
+    def describe(self):
+        return f"{self.value} (trung bình {self.mean:.1f}, {self.score:.1f}σ)"
+
+
+class BaselineDetector:
+    """Baseline theo dải nguồn và theo dịch vụ, cập nhật mỗi chu kỳ kiểm tra.
+
+    `warmup` chu kỳ đầu chỉ học, không cảnh báo. Dải nguồn xuất hiện lần đầu
+    sau đó, khi chưa đủ `warmup` mẫu, được so với baseline chung của mọi dải
+    (nguồn mới xuất hiện vẫn bị phát hiện). Giá trị bất thường được cắt về
+    ngưỡng trước khi cập nhật để cuộc tấn công không kéo baseline lên theo.
+    """
+
+    def __init__(self, alpha=DEFAULT_ALPHA, sigmas=DEFAULT_SIGMAS, warmup=DEFAULT_WARMUP,
+                 min_count=DEFAULT_MIN_COUNT, prefix_v4=PREFIX_V4, prefix_v6=PREFIX_V6,
+                 max_keys=MAX_KEYS):
+        self.alpha = alpha
+        self.sigmas = sigmas
+        self.warmup = warmup
+        self.min_count = min_count
+        self.prefix_v4 = prefix_v4
+        self.prefix_v6 = prefix_v6
+        self.max_keys = max_keys
+        self.sources = {}           # dải nguồn -> EwmaStat
+        self.services = {}          # cổng -> EwmaStat
+        self.population = EwmaStat()
+        self.cycle = 0
+        self._mask_v4 = ~((1 << (32 - prefix_v4)) - 1)
+        self._mask_v6 = ~((1 << (128 - prefix_v6)) - 1)
+
+    def configure(self, alpha=None, sigmas=None, warmup=None, min_count=None):
+        if alpha is not None:
+            self.alpha = alpha
+        if sigmas is not None:
+            self.sigmas = sigmas
+        if warmup is not None:
+            self.warmup = warmup
+        if min_count is not None:
+            self.min_count = min_count
+
+    def _prefix(self, key):
+        """Khóa IP -> khóa của dải nguồn chứa nó (vẫn trong không gian ip_key)"""
+        if key >> 32 == 0xffff:
+            return key & self._mask_v4
+        return key & self._mask_v6
+
+    def network(self, prefix):
+        """Khóa dải nguồn -> '1.2.3.0/24'"""
+        prefixlen = self.prefix_v4 if prefix >> 32 == 0xffff else self.prefix_v6
+        return f"{key_to_ip(prefix)}/{prefixlen}"
+
+    def _check(self, stats, key, value, fallback=None):
+        """Cập nhật baseline của khóa; trả về stat dùng để so sánh nếu bất thường"""
+        stat = stats.get(key)
+        if stat is None:
+            stat = stats[key] = EwmaStat(self.cycle - 1)
+        stat.catch_up(self.cycle, self.alpha)
+
+        if stat.samples >= self.warmup:
+            reference = stat
+        elif stat.first_cycle >= self.warmup:
+            reference = fallback
+        else:
+            # Khóa có từ lúc detector mới chạy: tự học baseline của nó
+            reference = None
+        anomalous = (reference is not None and value >= self.min_count and
+                     value > reference.bound(self.sigmas))
+        if anomalous:
+            # So với baseline trước khi cập nhật, rồi cắt giá trị về ngưỡng
+            result = EwmaStat()
+            result.mean, result.var, result.samples = reference.mean, reference.var, reference.samples
+            stat.update(min(value, reference.bound(self.sigmas)), self.alpha)
+            return result
+        stat.update(value, self.alpha)
+        return None
+
+    def observe(self, source_counts, service_counts):
+        """Một chu kỳ: source_counts khóa IP -> số kết nối, service_counts cổng -> số kết nối.
+
+        Trả về (danh sách Anomaly theo dải nguồn, danh sách Anomaly theo dịch vụ).
+        """
+        self.cycle += 1
+
+        prefixes = {}
+        for key, count in source_counts.items():
+            prefix = self._prefix(key)
+            members = prefixes.get(prefix)
+            if members is None:
+                members = prefixes[prefix] = {}
+            members[key] = count
+
+        population = self.population if self.cycle > self.warmup else None
+        source_anomalies = []
+        for prefix, members in prefixes.items():
+            value = sum(members.values())
+            reference = self._check(self.sources, prefix, value, population)
+            if reference is not None:
+                source_anomalies.append(Anomaly(self.network(prefix), value, reference, self.sigmas, members))
+            else:
+                self.population.update(value, self.alpha)
+
+        service_anomalies = []
+        for port, value in service_counts.items():
+            reference = self._check(self.services, port, value)
+            if reference is not None:
+                service_anomalies.append(Anomaly(port, value, reference, self.sigmas))
+
+        if len(self.sources) > self.max_keys:
+            self._prune()
+        return source_anomalies, service_anomalies
+
+    def _prune(self):
+        """Bỏ các dải lâu không xuất hiện nhất"""
+        stale = sorted(self.sources, key=lambda key: self.sources[key].last_cycle)
+        for key in stale[:len(self.sources) - self.max_keys]:
+            del self.sources[key]
+
+    def baseline(self, key):
+        """Baseline của dải nguồn chứa IP/dải (chuỗi) hoặc của cổng (int); None nếu chưa có"""
+        if isinstance(key, int):
+            stat = self.services.get(key)
+        else:
+            version, start, end, prefixlen = parse_network(key)
+            stat = self.sources.get(self._prefix(native_key(version, start)))
+        return stat.to_dict() if stat is not None else None
+
+    def __len__(self):
+        return len(self.sources) + len(self.services)
+
+
+# ---- Ghi lại / chạy lại lưu lượng ----
+
+class TrafficRecorder:
+    """Ghi mỗi chu kỳ một dòng JSON: {"t", "sources": {ip: n}, "services": {port: n}}
+    (IP ghi dạng chuỗi để bản ghi đọc được bằng công cụ khác).
+
+    append=True ghi tiếp vào file có sẵn (ghi lưu lượng thật); append=False ghi đè
+    (bản ghi sinh giả phải là một chuỗi chu kỳ liền mạch)."""
+
+    def __init__(self, path, append=True):
+        self.path = path
+        self._file = open(path, 'a' if append else 'w')
+
+    def record(self, timestamp, source_counts, service_counts, attack=None):
+        sources = {key_to_ip(ip) if isinstance(ip, int) else ip: count
+                   for ip, count in source_counts.items()}
+        entry = {'t': timestamp, 'sources': sources,
+                 'services': {str(port): count for port, count in service_counts.items()}}
+        if attack is not None:
+            entry['attack'] = attack
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_recording(path):
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            sources = {}
+            for ip, count in entry.get('sources', {}).items():
+                try:
+                    sources[ip_key(ip)] = count
+                except ValueError:
+                    continue
+            services = {int(port): count for port, count in entry.get('services', {}).items()}
+            yield entry.get('t'), sources, services, entry.get('attack')
+
+
+def replay(path, detector, verbose=True):
+    """Chạy detector trên bản ghi; nếu bản ghi có nhãn 'attack' (danh sách IP tấn
+    công của chu kỳ) thì đếm số nguồn tấn công bị phát hiện và cảnh báo sai"""
+    cycles = 0
+    flagged = 0
+    first_attack = {}           # khóa IP tấn công -> chu kỳ đầu tiên xuất hiện
+    detected = {}               # khóa IP tấn công -> số chu kỳ tới khi bị phát hiện
+    false_positives = 0
+    false_keys = set()
+    started = time.perf_counter()
+
+    for timestamp, sources, services, attack in read_recording(path):
+        cycles += 1
+        source_anomalies, service_anomalies = detector.observe(sources, services)
+        flagged += len(source_anomalies) + len(service_anomalies)
+
+        attackers = set(ip_keys(attack or ()))
+        for ip in attackers:
+            first_attack.setdefault(ip, cycles)
+        for anomaly in source_anomalies:
+            hits = attackers.intersection(anomaly.members)
+            for ip in hits:
+                detected.setdefault(ip, cycles - first_attack[ip])
+            if not hits:
+                false_positives += 1
+                false_keys.add(anomaly.key)
+
+        if verbose:
+            for anomaly in source_anomalies:
+                print(f"[{cycles}] nguồn {anomaly.key}: {anomaly.describe()}")
+            for anomaly in service_anomalies:
+                print(f"[{cycles}] cổng {anomaly.key}: {anomaly.describe()}")
+
+    return {
+        'cycles': cycles,
+        'anomalies': flagged,
+        'tracked_keys': len(detector),
+        'elapsed': time.perf_counter() - started,
+        'attackers': len(first_attack),
+        'detected': {key_to_ip(key): delay for key, delay in detected.items()},
+        'false_positives': false_positives,
+        'false_keys': len(false_keys),
+    }
+
+
+def generate(path, cycles=720, sources=500, seed=42):
+    """Sinh lưu lượng giả có nhãn: nguồn bình thường, một crawler ổn định
+    lưu lượng cao, một flood chậm (tăng dần) và một burst từ nguồn mới"""
+    rng = random.Random(seed)
+    clients = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+               for _ in range(sources)]
+    crawler = '198.51.100.7'
+    slow_flood = '203.0.113.50'
+    burst = '192.0.2.99'
+
+    recorder = TrafficRecorder(path, append=False)
+    try:
+        for cycle in range(cycles):
+            counts = {}
+            for ip in rng.sample(clients, sources // 5):
+                counts[ip] = rng.randint(1, 8)
+            counts[crawler] = 150 + rng.randint(-20, 20)
+            attack = []
+            if cycle >= cycles // 2:
+                # Flood chậm: luôn dưới conn_threshold tĩnh (100) nhưng lệch xa baseline ~2
+                counts[slow_flood] = 60 + rng.randint(0, 20)
+                attack.append(slow_flood)
+            else:
+                counts[slow_flood] = rng.randint(0, 3)
+            if cycles * 3 // 4 <= cycle < cycles * 3 // 4 + 10:
+                counts[burst] = 400
+                attack.append(burst)
+
+            services = {443: sum(counts.values()), 22: rng.randint(1, 4)}
+            recorder.record(cycle * 10.0, counts, services, attack)
+    finally:
+        recorder.close()
+
+
+def record(path, cycles, interval):
+    """Ghi lưu lượng thật từ /proc/net/tcp (không cần daemon)"""
+    from stats_collector import ConnectionCollector
+
+    collector = ConnectionCollector()
+    recorder = TrafficRecorder(path)
+    try:
+        for _ in range(cycles):
+            snapshot = collector.collect()
+            recorder.record(snapshot.timestamp, dict(snapshot.ips), dict(snapshot.ports))
+            time.sleep(interval)
+    finally:
+        recorder.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Baseline thích nghi: ghi/chạy lại lưu lượng")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_record = sub.add_parser('record', help="Ghi lưu lượng thật")
+    p_record.add_argument('file')
+    p_record.add_argument('--cycles', type=int, default=360)
+    p_record.add_argument('--interval', type=float, default=10)
+
+    p_generate = sub.add_parser('generate', help="Sinh lưu lượng giả có nhãn tấn công")
+    p_generate.add_argument('file')
+    p_generate.add_argument('--cycles', type=int, default=720)
+    p_generate.add_argument('--sources', type=int, default=500)
+
+    p_replay = sub.add_parser('replay', help="Chạy detector trên bản ghi")
+    p_replay.add_argument('file')
+    p_replay.add_argument('--alpha', type=float, default=DEFAULT_ALPHA)
+    p_replay.add_argument('--sigmas', type=float, default=DEFAULT_SIGMAS)
+    p_replay.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+    p_replay.add_argument('--min-count', type=int, default=DEFAULT_MIN_COUNT)
+    p_replay.add_argument('--quiet', action='store_true')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record(args.file, args.cycles, args.interval)
+    elif args.command == 'generate':
+        generate(args.file, args.cycles, args.sources)
+    else:
+        detector = BaselineDetector(args.alpha, args.sigmas, args.warmup, args.min_count)
+        result = replay(args.file, detector, verbose=not args.quiet)
+        print(f"{result['cycles']} chu kỳ, {result['anomalies']} bất thường, "
+              f"{result['tracked_keys']} khóa, {result['elapsed']:.2f}s")
+        if result['attackers']:
+            delays = ', '.join(f"{ip} sau {delay} chu kỳ" for ip, delay in sorted(result['detected'].items()))
+            print(f"Phát hiện {len(result['detected'])}/{result['attackers']} nguồn tấn công ({delays}); "
+                  f"{result['false_positives']} cảnh báo sai trên {result['false_keys']} dải")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
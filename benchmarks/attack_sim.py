@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+"""
+Mô phỏng tấn công đầu-cuối trên một máy Linux bằng network namespace (cần root):
+
+    fwsim-atk (attacker, client nền)  <-- veth -->  fwsim-tgt (dịch vụ TCP, daemon auto_block)
+    10.200.0.2                                      10.200.0.1:8080
+
+    sudo python3 benchmarks/attack_sim.py                                 # cả 3 kịch bản
+    sudo python3 benchmarks/attack_sim.py --scenario syn --rate 500 --duration 20
+    sudo python3 benchmarks/attack_sim.py --scenario distributed --sources 200 --mode both
+
+Kịch bản:
+  syn          SYN giả nguồn (10.203.0.0/16), không hoàn tất bắt tay
+  conn         một IP (10.201.0.10) mở và giữ nhiều kết nối
+  distributed  nhiều IP cùng dải 10.201.1.0/24..., mỗi IP dưới ngưỡng cố định
+
+Client hợp lệ (10.202.0.0/24) gửi request chạy song song suốt kịch bản để đếm
+false positive. Daemon chạy với --state-dir riêng nên không đụng file của daemon
+thật; nếu máy không có iptables thì dùng bộ lệnh giả của fixtures (chỉ đo phát
+hiện, không chặn gói thật).
+
+Kết quả cho mỗi kịch bản: thời gian phát hiện (bản ghi vào chỉ mục chặn),
+thời gian chặn (rule đã tạo, cảnh báo BLOCKED), số nguồn tấn công bị chặn, CPU
+của daemon và thời gian bước collect (từ endpoint /metrics), số IP hợp lệ bị
+chặn. Ghi JSON vào benchmarks/results/.
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import resource
+import selectors
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+from ip_utils import NetworkSet  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+TARGET_NS = 'fwsim-tgt'
+ATTACK_NS = 'fwsim-atk'
+TARGET_IP = '10.200.0.1'
+ATTACK_IP = '10.200.0.2'
+PORT = 8080
+METRICS_PORT = 9105
+
+ATTACK_NET = '10.201.0.0/16'        # nguồn thật của attacker (AnyIP trong fwsim-atk)
+BACKGROUND_NET = '10.202.0.0/16'    # client hợp lệ
+SPOOF_NET = '10.203.0.0/16'         # nguồn giả của SYN flood: gói trả lời bị bỏ ở fwsim-atk
+
+SCENARIOS = {
+    # kịch bản -> tham số mặc định
+    'syn': {'rate': 300, 'sources': 1},
+    'conn': {'rate': 40, 'sources': 1},
+    'distributed': {'rate': 200, 'sources': 100},
+}
+
+
+# ---- Địa chỉ ----
+
+def attack_sources(scenario, count):
+    if scenario == 'syn':
+        return [f"10.203.{i // 250}.{i % 250 + 1}" for i in range(count)]
+    if scenario == 'conn':
+        return [f"10.201.0.{10 + i}" for i in range(count)]
+    # Cùng /24 cho tới khi đầy: baseline gộp theo dải
+    return [f"10.201.{1 + i // 250}.{i % 250 + 1}" for i in range(count)]
+
+
+def background_sources(count):
+    return [f"10.202.0.{i + 1}" for i in range(count)]
+
+
+# ---- Namespace ----
+
+def sh(*args, check=True):
+    return subprocess.run(args, check=check, capture_output=True, text=True)
+
+
+def in_ns(ns, *args):
+    return ['ip', 'netns', 'exec', ns, *args]
+
+
+def teardown():
+    for ns in (TARGET_NS, ATTACK_NS):
+        sh('ip', 'netns', 'del', ns, check=False)
+
+
+def setup_topology():
+    """Hai namespace nối bằng veth; các dải nguồn được định tuyến qua attacker"""
+    teardown()
+    sh('ip', 'netns', 'add', TARGET_NS)
+    sh('ip', 'netns', 'add', ATTACK_NS)
+    sh('ip', 'link', 'add', 'fwsim-t', 'netns', TARGET_NS, 'type', 'veth',
+       'peer', 'name', 'fwsim-a', 'netns', ATTACK_NS)
+
+    for ns, dev, address in ((TARGET_NS, 'fwsim-t', TARGET_IP), (ATTACK_NS, 'fwsim-a', ATTACK_IP)):
+        sh(*in_ns(ns, 'ip', 'link', 'set', 'lo', 'up'))
+        sh(*in_ns(ns, 'ip', 'addr', 'add', f"{address}/24", 'dev', dev))
+        sh(*in_ns(ns, 'ip', 'link', 'set', dev, 'up'))
+
+    for network in (ATTACK_NET, BACKGROUND_NET, SPOOF_NET):
+        sh(*in_ns(TARGET_NS, 'ip', 'route', 'add', network, 'via', ATTACK_IP))
+    # AnyIP: attacker bind được mọi địa chỉ trong dải mà không cần gán từng địa chỉ
+    for network in (ATTACK_NET, BACKGROUND_NET):
+        sh(*in_ns(ATTACK_NS, 'ip', 'route', 'add', 'local', network, 'dev', 'lo'))
+
+    # SYN-RECV phải nằm lại trong bảng socket để daemon thấy (không dùng syncookies)
+    for key, value in (('net.ipv4.tcp_syncookies', '0'),
+                       ('net.ipv4.tcp_max_syn_backlog', '65536'),
+                       ('net.core.somaxconn', '65535')):
+        sh(*in_ns(TARGET_NS, 'sysctl', '-qw', f"{key}={value}"), check=False)
+
+
+# ---- Tiến trình trong namespace (gọi lại chính file này) ----
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def emit(**data):
+    print(json.dumps(data), flush=True)
+
+
+def serve(args):
+    """Dịch vụ TCP của máy đích: trả lời request rồi đóng, giữ kết nối im lặng"""
+    raise_fd_limit()
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('0.0.0.0', args.port))
+    listener.listen(65535)
+    listener.setblocking(False)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    emit(event='ready')
+    while True:
+        for key, _ in selector.select():
+            sock = key.fileobj
+            if sock is listener:
+                try:
+                    conn, _ = listener.accept()
+                except OSError:
+                    continue
+                conn.setblocking(False)
+                selector.register(conn, selectors.EVENT_READ)
+                continue
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                data = b''
+            if data:
+                try:
+                    sock.send(b"HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                except OSError:
+                    pass
+            selector.unregister(sock)
+            sock.close()
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def syn_packet(source, target, sport, dport, seq):
+    src = socket.inet_aton(source)
+    dst = socket.inet_aton(target)
+    tcp = struct.pack('!HHLLBBHHH', sport, dport, seq, 0, 5 << 4, 0x02, 64240, 0, 0)
+    pseudo = src + dst + struct.pack('!BBH', 0, socket.IPPROTO_TCP, len(tcp))
+    tcp = tcp[:16] + struct.pack('!H', _checksum(pseudo + tcp)) + tcp[18:]
+    # Kernel tự điền tổng độ dài, id và checksum IP (IP_HDRINCL)
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 0, 0, 0, 64, socket.IPPROTO_TCP, 0, src, dst)
+    return ip + tcp
+
+
+def paced(rate, duration):
+    """Sinh chỉ số sự kiện theo nhịp `rate`/giây trong `duration` giây"""
+    started = time.time()
+    interval = 1.0 / rate
+    i = 0
+    while True:
+        due = started + i * interval
+        now = time.time()
+        if now - started >= duration:
+            return
+        if due > now:
+            time.sleep(min(due - now, 0.05))
+            continue
+        yield i
+        i += 1
+
+
+def flood(args):
+    """SYN flood (raw socket) hoặc connection flood (kết nối được giữ mở)"""
+    raise_fd_limit()
+    sources = args.sources.split(',')
+    sent = errors = 0
+    held = []
+    rng = random.Random(args.seed)
+
+    # SIGTERM/SIGINT chỉ được nhận ở sigwait cuối hàm
+    signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGTERM, signal.SIGINT])
+    raw = None
+    if args.kind == 'syn':
+        raw = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_RAW)
+
+    emit(event='started', timestamp=time.time())
+    for i in paced(args.rate, args.duration):
+        source = sources[i % len(sources)]
+        try:
+            if raw is not None:
+                packet = syn_packet(source, args.target, rng.randint(1024, 65535), args.port,
+                                    rng.getrandbits(32))
+                raw.sendto(packet, (args.target, 0))
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                sock.bind((source, 0))
+                sock.connect_ex((args.target, args.port))
+                held.append(sock)
+            sent += 1
+        except OSError:
+            errors += 1
+    emit(event='finished', timestamp=time.time(), sent=sent, errors=errors)
+    # Giữ kết nối tới khi bị dừng để daemon còn thấy chúng
+    signal.sigwait([signal.SIGTERM, signal.SIGINT])
+
+
+def background(args):
+    """Client hợp lệ: mỗi IP gửi một request ngắn mỗi `interval` giây"""
+    sources = args.sources.split(',')
+    ok = failed = 0
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    emit(event='started', timestamp=time.time())
+    rate = len(sources) / args.interval
+    for i in paced(rate, args.duration):
+        if stop:
+            break
+        try:
+            with socket.create_connection((args.target, args.port), timeout=1.0,
+                                          source_address=(sources[i % len(sources)], 0)) as sock:
+                sock.sendall(b"GET / HTTP/1.0\r\n\r\n")
+                sock.recv(64)
+            ok += 1
+        except OSError:
+            failed += 1
+    emit(event='finished', timestamp=time.time(), ok=ok, failed=failed)
+
+
+# ---- Điều phối ----
+
+class NsProcess:
+    """Tiến trình con chạy trong namespace, đọc các dòng JSON nó in ra"""
+
+    def __init__(self, ns, argv, env=None, log=None):
+        self.proc = subprocess.Popen(
+            in_ns(ns, *argv), env=env, text=True,
+            stdout=subprocess.PIPE if log is None else log,
+            stderr=subprocess.DEVNULL if log is None else subprocess.STDOUT)
+        self.events = queue.Queue()
+        if log is None:
+            threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                self.events.put(json.loads(line))
+            except ValueError:
+                continue
+
+    def event(self, timeout=10.0):
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self, sig=signal.SIGTERM, timeout=5.0):
+        if self.proc.poll() is None:
+            self.proc.send_signal(sig)
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+
+
+def self_argv(*args):
+    return [sys.executable, os.path.abspath(__file__), *args]
+
+
+def scrape_metrics():
+    """Đọc /metrics của daemon (endpoint chỉ nghe trong namespace đích)"""
+    code = ("import urllib.request, sys; sys.stdout.write(urllib.request.urlopen("
+            f"'http://127.0.0.1:{METRICS_PORT}/metrics', timeout=2).read().decode())")
+    result = subprocess.run(in_ns(TARGET_NS, sys.executable, '-c', code),
+                            capture_output=True, text=True)
+    samples = {}
+    for line in result.stdout.splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            samples[name] = float(value)
+    return samples
+
+
+def wait_for(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def read_jsonl(path):
+    items = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return items
+
+
+def analyse(state_dir, started, sources, legit):
+    """Đối chiếu chỉ mục chặn và nhật ký cảnh báo với các dải tấn công/hợp lệ"""
+    try:
+        with open(os.path.join(state_dir, 'ban_index.json')) as f:
+            bans = [ban for ban in json.load(f) if ban.get('source') == 'auto_block']
+    except (OSError, ValueError):
+        bans = []
+    blocked_at = {}
+    for alert in read_jsonl(os.path.join(state_dir, 'firewall_alerts.jsonl')):
+        if alert.get('action') == 'BLOCKED':
+            blocked_at.setdefault(alert['ip'], alert['timestamp'])
+
+    attack = NetworkSet(sources)
+    background_set = NetworkSet(legit)
+    attack_bans, false_positives = [], []
+    for ban in bans:
+        network = ban['network']
+        if background_set.overlaps(network):
+            false_positives.append(network)
+        elif attack.overlaps(network):
+            attack_bans.append(ban)
+        else:
+            false_positives.append(network)
+
+    covered = NetworkSet(ban['network'] for ban in attack_bans)
+    detected = [ban['created_at'] for ban in attack_bans]
+    # Cảnh báo ghi IP như lúc gọi block_ip ('1.2.3.4'), chỉ mục ghi dạng CIDR ('1.2.3.4/32')
+    enforced = []
+    for ban in attack_bans:
+        timestamp = blocked_at.get(ban['network'], blocked_at.get(ban['network'].split('/')[0]))
+        if timestamp is not None:
+            enforced.append(timestamp)
+
+    def delay(times):
+        return round(min(times) - started, 3) if times else None
+
+    return {
+        'time_to_detect_s': delay(detected),
+        'time_to_block_s': delay(enforced),
+        'last_detect_s': round(max(detected) - started, 3) if detected else None,
+        'sources_blocked': sum(1 for source in sources if source in covered),
+        'sources': len(sources),
+        'bans': [ban['network'] for ban in attack_bans],
+        'false_positives': false_positives,
+    }
+
+
+def metric_delta(before, after, name):
+    return after.get(name, 0.0) - before.get(name, 0.0)
+
+
+def collect_cost(before, after):
+    """CPU của daemon và thời gian trung bình bước collect giữa hai lần scrape"""
+    count = metric_delta(before, after, 'firewall_stage_seconds_count{stage="collect"}')
+    total = metric_delta(before, after, 'firewall_stage_seconds_sum{stage="collect"}')
+    cycles = metric_delta(before, after, 'firewall_stage_seconds_count{stage="total"}')
+    cycle_sum = metric_delta(before, after, 'firewall_stage_seconds_sum{stage="total"}')
+    return {
+        'cpu_s': round(metric_delta(before, after, 'process_cpu_seconds_total'), 3),
+        'collect_ms': round(total / count * 1000, 3) if count else None,
+        'cycle_ms': round(cycle_sum / cycles * 1000, 3) if cycles else None,
+        'cycles': int(cycles),
+        'connections': after.get('firewall_connections'),
+        'rss_mb': round(after.get('process_resident_memory_bytes', 0) / 1e6, 1),
+    }
+
+
+def daemon_config(args):
+    return {
+        'check_interval': args.check_interval,
+        'time_window': args.time_window,
+        'syn_threshold': args.syn_threshold,
+        'conn_threshold': args.conn_threshold,
+        'ban_sync_interval': 3600,
+        'whitelist': ['127.0.0.1'],
+        'access_logs': [],
+        'detection_mode': args.mode,
+        'baseline_warmup': args.baseline_warmup,
+    }
+
+
+def run_scenario(args, scenario, work_dir):
+    defaults = SCENARIOS[scenario]
+    rate = args.rate or defaults['rate']
+    sources = attack_sources(scenario, args.sources or defaults['sources'])
+    legit = background_sources(args.background)
+
+    state_dir = os.path.join(work_dir, scenario)
+    os.makedirs(state_dir)
+    config_path = os.path.join(state_dir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump(daemon_config(args), f, indent=2)
+
+    env = dict(os.environ)
+    enforcement = 'iptables'
+    if args.fake_iptables or shutil.which('iptables') is None:
+        bin_dir, state_path = fixtures.install_iptables_shim(state_dir)
+        env['PATH'] = bin_dir + os.pathsep + env.get('PATH', '')
+        env['FAKE_IPTABLES_STATE'] = state_path
+        enforcement = 'fake'
+
+    setup_topology()
+    processes = []
+    try:
+        server = NsProcess(TARGET_NS, self_argv('serve', '--port', str(PORT)))
+        processes.append(server)
+        if not server.event():
+            raise RuntimeError("Dịch vụ đích không khởi động")
+
+        with open(os.path.join(state_dir, 'daemon.out'), 'w') as log:
+            daemon = NsProcess(TARGET_NS, [sys.executable, os.path.join(ROOT, 'auto_block.py'),
+                                           '--config', config_path, '--state-dir', state_dir],
+                               env=env, log=log)
+        processes.append(daemon)
+        if not wait_for(lambda: scrape_metrics().get('firewall_cycles_total'), 15):
+            raise RuntimeError(f"Daemon không chạy, xem {state_dir}/daemon.out")
+
+        if legit:
+            duration = args.warmup + args.duration + args.settle + 5
+            client = NsProcess(ATTACK_NS, self_argv(
+                'background', '--target', TARGET_IP, '--port', str(PORT),
+                '--sources', ','.join(legit), '--interval', str(args.background_interval),
+                '--duration', str(duration)))
+            processes.append(client)
+            client.event()
+        # Traffic nền trước tấn công: baseline học xong giai đoạn warmup
+        time.sleep(args.warmup)
+
+        before = scrape_metrics()
+        attacker = NsProcess(ATTACK_NS, self_argv(
+            'flood', '--kind', 'syn' if scenario == 'syn' else 'conn',
+            '--target', TARGET_IP, '--port', str(PORT), '--sources', ','.join(sources),
+            '--rate', str(rate), '--duration', str(args.duration), '--seed', str(args.seed)))
+        processes.append(attacker)
+        started = attacker.event()
+        if not started:
+            raise RuntimeError("Attacker không khởi động")
+        finished = attacker.event(args.duration + 10) or {}
+        time.sleep(args.settle)
+        after = scrape_metrics()
+
+        attacker.stop()
+        client_result = {}
+        if legit:
+            client.stop()
+            client_result = client.event(2) or {}
+        daemon.stop(signal.SIGINT)
+    finally:
+        for process in reversed(processes):
+            process.stop()
+        teardown()
+
+    result = analyse(state_dir, started['timestamp'], sources, legit)
+    result.update({
+        'enforcement': enforcement,
+        'rate': rate,
+        'attack_sent': finished.get('sent'),
+        'attack_errors': finished.get('errors'),
+        'background_ok': client_result.get('ok'),
+        'background_failed': client_result.get('failed'),
+        'daemon_idle': collect_cost({}, before),
+        'daemon_attack': collect_cost(before, after),
+    })
+    return result
+
+
+def print_result(name, result):
+    attack = result['daemon_attack']
+    print(f"  phát hiện: {result['time_to_detect_s']}s  chặn: {result['time_to_block_s']}s  "
+          f"nguồn bị chặn: {result['sources_blocked']}/{result['sources']}  "
+          f"false positive: {len(result['false_positives'])}")
+    print(f"  daemon: CPU {attack['cpu_s']}s trong {attack['cycles']} chu kỳ, "
+          f"collect {attack['collect_ms']} ms/chu kỳ, {attack['connections']:.0f} socket "
+          f"(iptables {result['enforcement']})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mô phỏng tấn công bằng network namespace")
+    sub = parser.add_subparsers(dest='command')
+
+    run = sub.add_parser('run', help="Chạy các kịch bản (mặc định)")
+    run.add_argument('--scenario', default='syn,conn,distributed',
+                     help="Danh sách kịch bản: syn, conn, distributed")
+    run.add_argument('--rate', type=int, help="Gói SYN/kết nối mỗi giây (tổng các nguồn)")
+    run.add_argument('--sources', type=int, help="Số IP nguồn tấn công")
+    run.add_argument('--duration', type=float, default=20)
+    run.add_argument('--warmup', type=float, default=12, help="Số giây chỉ có traffic nền trước tấn công")
+    run.add_argument('--settle', type=float, default=3, help="Số giây chờ sau tấn công trước khi đo")
+    run.add_argument('--background', type=int, default=20, help="Số client hợp lệ")
+    run.add_argument('--background-interval', type=float, default=2.0,
+                     help="Mỗi client gửi một request sau bấy nhiêu giây")
+    run.add_argument('--mode', default='both', choices=('static', 'baseline', 'both'))
+    run.add_argument('--check-interval', type=int, default=1)
+    run.add_argument('--time-window', type=int, default=10)
+    run.add_argument('--syn-threshold', type=int, default=50)
+    run.add_argument('--conn-threshold', type=int, default=100)
+    run.add_argument('--baseline-warmup', type=int, default=8)
+    run.add_argument('--fake-iptables', action='store_true', help="Dùng iptables giả kể cả khi máy có iptables")
+    run.add_argument('--seed', type=int, default=42)
+    run.add_argument('--output', help="File JSON kết quả")
+    run.add_argument('--keep', action='store_true', help="Giữ thư mục trạng thái của daemon")
+
+    server = sub.add_parser('serve')
+    server.add_argument('--port', type=int, default=PORT)
+
+    attacker = sub.add_parser('flood')
+    attacker.add_argument('--kind', choices=('syn', 'conn'), required=True)
+    attacker.add_argument('--target', required=True)
+    attacker.add_argument('--port', type=int, default=PORT)
+    attacker.add_argument('--sources', required=True)
+    attacker.add_argument('--rate', type=float, required=True)
+    attacker.add_argument('--duration', type=float, required=True)
+    attacker.add_argument('--seed', type=int, default=42)
+
+    client = sub.add_parser('background')
+    client.add_argument('--target', required=True)
+    client.add_argument('--port', type=int, default=PORT)
+    client.add_argument('--sources', required=True)
+    client.add_argument('--interval', type=float, default=2.0)
+    client.add_argument('--duration', type=float, required=True)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith('-'):
+        argv = ['run', *argv]
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        return serve(args)
+    if args.command == 'flood':
+        return flood(args)
+    if args.command == 'background':
+        return background(args)
+
+    if os.geteuid() != 0:
+        print("Cần quyền root để tạo network namespace")
+        return 2
+    scenarios = args.scenario.split(',')
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"kịch bản không hợp lệ: {name}")
+
+    work_dir = tempfile.mkdtemp(prefix='fwsim-')
+    results = {}
+    try:
+        for name in scenarios:
+            print(f"- {name} ...", flush=True)
+            results[name] = run_scenario(args, name, work_dir)
+            print_result(name, results[name])
+    finally:
+        if args.keep:
+            print(f"Trạng thái daemon: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'version': 1,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'command')},
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, 'attack-' + time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Đã ghi kết quả: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
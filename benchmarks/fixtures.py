@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Dữ liệu giả cho benchmark: /proc/net/tcp{,6} với số socket tùy ý, file cảnh
+báo nhiều kích thước và bộ lệnh iptables/ip6tables/iptables-save/ipset giả
+(ghi lại lệnh gọi, giữ rule trong một file trạng thái thay vì sửa kernel)
+"""
+
+import json
+import os
+import random
+import stat
+import sys
+import time
+
+PROC_HEADER = ("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when "
+               "retrnsmt   uid  timeout inode\n")
+
+# Tỷ lệ trạng thái TCP trong fixture: phần lớn ESTABLISHED, có SYN-RECV và TIME-WAIT
+STATES = ['01'] * 70 + ['03'] * 10 + ['06'] * 15 + ['08'] * 5
+
+
+def _hex_v4(value):
+    # /proc/net/tcp in địa chỉ IPv4 dạng little-endian
+    return value.to_bytes(4, 'big')[::-1].hex().upper()
+
+
+def _hex_v6(value):
+    raw = value.to_bytes(16, 'big')
+    return ''.join(raw[i:i + 4][::-1].hex().upper() for i in range(0, 16, 4))
+
+
+def write_proc_tcp(directory, sockets, clients=None, attackers=5, seed=42):
+    """Sinh tcp (90%) và tcp6 (10%) với `sockets` dòng; `attackers` IP chiếm
+    khoảng 20% số socket để bước phát hiện có việc làm. Trả về (tcp, tcp6)."""
+    rng = random.Random(seed)
+    clients = clients or max(10, sockets // 20)
+    pool_v4 = [rng.randint(0x01000000, 0xDFFFFFFF) for _ in range(clients)]
+    pool_v6 = [(0x20010DB8 << 96) | rng.getrandbits(64) for _ in range(max(1, clients // 10))]
+    heavy = pool_v4[:attackers]
+
+    tcp_path = os.path.join(directory, f'tcp_{sockets}')
+    tcp6_path = os.path.join(directory, f'tcp6_{sockets}')
+    local_v4 = _hex_v4(0xC0A80001)
+    local_v6 = _hex_v6((0x20010DB8 << 96) | 1)
+    v6_count = sockets // 10
+
+    with open(tcp_path, 'w') as f:
+        f.write(PROC_HEADER)
+        # Socket LISTEN như máy thật
+        for port in (22, 80, 443):
+            f.write(f"   0: 00000000:{port:04X} 00000000:0000 0A 00000000:00000000 00:00000000 "
+                    f"00000000     0        0 1 1 0000000000000000 100 0 0 10 0\n")
+        batch = []
+        for i in range(sockets - v6_count):
+            remote = heavy[i % attackers] if rng.random() < 0.2 else pool_v4[rng.randrange(clients)]
+            port = (443, 80, 22)[i % 3]
+            batch.append(f"{i:4d}: {local_v4}:{port:04X} {_hex_v4(remote)}:{rng.randint(1024, 65535):04X} "
+                         f"{STATES[i % 100]} 00000000:00000000 00:00000000 00000000  1000        0 "
+                         f"{100000 + i} 1 0000000000000000 20 4 30 10 -1\n")
+            if len(batch) >= 10000:
+                f.write(''.join(batch))
+                batch = []
+        f.write(''.join(batch))
+
+    with open(tcp6_path, 'w') as f:
+        f.write(PROC_HEADER)
+        for i in range(v6_count):
+            remote = pool_v6[rng.randrange(len(pool_v6))]
+            f.write(f"{i:4d}: {local_v6}:01BB {_hex_v6(remote)}:{rng.randint(1024, 65535):04X} "
+                    f"{STATES[i % 100]} 00000000:00000000 00:00000000 00000000  1000        0 "
+                    f"{900000 + i} 1 0000000000000000 20 4 30 10 -1\n")
+    return tcp_path, tcp6_path
+
+
+def make_alert(i, now=None):
+    now = now or time.time()
+    return {
+        'id': f"bench{i:08x}",
+        'timestamp': now - i,
+        'ip': f"203.0.{(i >> 8) & 255}.{i & 255}",
+        'reason': f"Connection flood detected: {100 + i % 500} connections",
+        'action': 'BLOCKED',
+    }
+
+
+def write_alert_files(directory, count):
+    """File cảnh báo dạng danh sách JSON (web/GUI đọc) và JSON Lines (journal)"""
+    alerts = [make_alert(i) for i in range(count)]
+    json_path = os.path.join(directory, f'alerts_{count}.json')
+    jsonl_path = os.path.join(directory, f'alerts_{count}.jsonl')
+    with open(json_path, 'w') as f:
+        json.dump(alerts, f)
+    with open(jsonl_path, 'w') as f:
+        for alert in alerts:
+            f.write(json.dumps(alert) + '\n')
+    return json_path, jsonl_path
+
+
+# ---- iptables giả ----
+
+_SHIM = r'''#!{python}
+"""iptables/ip6tables/iptables-save/ipset giả cho benchmark"""
+import fcntl, json, os, sys, time
+
+state_path = os.environ.get('FAKE_IPTABLES_STATE', {state!r})
+name = os.path.basename(sys.argv[0])
+args = sys.argv[1:]
+delay = float(os.environ.get('FAKE_IPTABLES_DELAY', '0'))
+
+with open(state_path + '.lock', 'a') as lock:
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {{'rules': [], 'sets': {{}}, 'calls': 0}}
+    state['calls'] += 1
+    code = 0
+
+    if delay:
+        time.sleep(delay)
+    if name == 'iptables-save':
+        out = ['*filter', ':INPUT ACCEPT [0:0]', ':FORWARD ACCEPT [0:0]', ':OUTPUT ACCEPT [0:0]']
+        for family, chain, spec in state['rules']:
+            if family == 'iptables':
+                out.append(f'[0:0] -A {{chain}} {{spec}}')
+        out.append('COMMIT')
+        sys.stdout.write('\n'.join(out) + '\n')
+    elif name == 'ipset':
+        if args[:1] == ['create']:
+            state['sets'].setdefault(args[1], [])
+        elif args[:1] == ['add']:
+            state['sets'].setdefault(args[1], []).append(args[2])
+        elif args[:1] == ['del']:
+            members = state['sets'].get(args[1], [])
+            code = 0 if args[2] in members else 1
+            if args[2] in members:
+                members.remove(args[2])
+    elif '-I' in args or '-A' in args:
+        flag = '-I' if '-I' in args else '-A'
+        i = args.index(flag)
+        chain = args[i + 1]
+        rest = args[i + 2:]
+        if flag == '-I' and rest and rest[0].isdigit():
+            rest = rest[1:]
+        spec = ' '.join(rest)
+        if '-s' in rest and '/' not in rest[rest.index('-s') + 1]:
+            # iptables-save in nguồn dạng CIDR
+            j = rest.index('-s') + 1
+            rest[j] += '/128' if ':' in rest[j] else '/32'
+            spec = ' '.join(rest)
+        entry = [name, chain, spec]
+        if flag == '-I':
+            state['rules'].insert(0, entry)
+        else:
+            state['rules'].append(entry)
+    elif '-D' in args:
+        i = args.index('-D')
+        chain = args[i + 1]
+        rest = args[i + 2:]
+        if '-s' in rest and '/' not in rest[rest.index('-s') + 1]:
+            j = rest.index('-s') + 1
+            rest[j] += '/128' if ':' in rest[j] else '/32'
+        entry = [name, chain, ' '.join(rest)]
+        if entry in state['rules']:
+            state['rules'].remove(entry)
+        else:
+            sys.stderr.write('iptables: Bad rule (does a matching rule exist in that chain?).\n')
+            code = 1
+
+    tmp = state_path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+sys.exit(code)
+'''
+
+SHIM_COMMANDS = ('iptables', 'ip6tables', 'iptables-save', 'ipset')
+
+
+def install_iptables_shim(directory):
+    """Tạo thư mục bin chứa lệnh giả; trả về (bin_dir, state_path).
+    Thêm bin_dir vào đầu PATH để subprocess gọi lệnh giả."""
+    bin_dir = os.path.join(directory, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    state_path = os.path.join(directory, 'iptables_state.json')
+    script = _SHIM.format(python=sys.executable, state=state_path)
+    for command in SHIM_COMMANDS:
+        path = os.path.join(bin_dir, command)
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir, state_path
+
+
+def read_shim_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'rules': [], 'sets': {}, 'calls': 0}
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Benchmark các bước nóng của hệ thống trên dữ liệu giả (không đụng kernel, /var/log):
+thu thập /proc/net/tcp, từng bước một chu kỳ DosDetector, chặn qua iptables giả,
+ghi cảnh báo, đọc access log và độ trễ API web khi nhiều request đồng thời.
+
+    python3 benchmarks/run.py                       # 1k, 10k, 100k socket
+    python3 benchmarks/run.py --sockets 1000,1000000
+    python3 benchmarks/run.py --compare benchmarks/results/truoc.json
+
+Kết quả ghi ra JSON (mặc định benchmarks/results/<thời điểm>.json); --compare
+so với một lần chạy trước và trả mã lỗi 1 nếu chậm hơn quá --tolerance.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixtures  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SOCKETS = [1000, 10000, 100000]
+DEFAULT_ALERTS = [100, 10000, 100000]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(fn, repeat):
+    """Chạy fn `repeat` lần; trả về danh sách thời gian (giây)"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def peak_memory_kb(fn):
+    """Bộ nhớ Python cấp phát đỉnh (KB) trong một lần chạy fn (lần đo riêng, tracemalloc làm chậm)"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def summary_ms(times):
+    return {
+        'median_ms': statistics.median(times) * 1000,
+        'min_ms': min(times) * 1000,
+        'max_ms': max(times) * 1000,
+        'runs': len(times),
+    }
+
+
+class Environment:
+    """Thư mục tạm chứa fixture, lệnh iptables giả và mọi file daemon sẽ ghi"""
+
+    def __init__(self, keep=False):
+        self.dir = tempfile.mkdtemp(prefix='firewall-bench-')
+        self.keep = keep
+        self.bin_dir, self.shim_state = fixtures.install_iptables_shim(self.dir)
+        self._old_env = dict(os.environ)
+        os.environ['PATH'] = self.bin_dir + os.pathsep + os.environ.get('PATH', '')
+        os.environ['FAKE_IPTABLES_STATE'] = self.shim_state
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def reset_shim(self):
+        for suffix in ('', '.lock'):
+            if os.path.exists(self.shim_state + suffix):
+                os.unlink(self.shim_state + suffix)
+
+    def close(self):
+        os.environ.clear()
+        os.environ.update(self._old_env)
+        if not self.keep:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def make_detector(env, tcp_path=None, tcp6_path=None):
+    """DosDetector với mọi đường dẫn trỏ vào thư mục tạm"""
+    import auto_block
+    from stats_collector import ConnectionCollector
+
+    auto_block.CONFIG.update({
+        'metrics_file': env.path('metrics.tsdb'),
+        'alert_file': env.path('alerts.json'),
+        'alert_log': env.path('alerts.jsonl'),
+        'ban_index_file': env.path('ban_index.json'),
+        'access_logs': [],
+        'baseline_record_file': None,
+        'detection_mode': 'both',
+    })
+    detector = auto_block.DosDetector()
+    if tcp_path:
+        detector.collector = ConnectionCollector(((tcp_path, False), (tcp6_path, True)))
+    return detector
+
+
+# ---- Các bước đo ----
+
+def bench_collect(env, sockets, repeat):
+    from stats_collector import ConnectionCollector
+
+    tcp_path, tcp6_path = fixtures.write_proc_tcp(env.dir, sockets)
+    collector = ConnectionCollector(((tcp_path, False), (tcp6_path, True)))
+    times = timed(collector.collect, repeat)
+    result = summary_ms(times)
+    result['sockets'] = sockets
+    result['us_per_socket'] = statistics.median(times) * 1e6 / sockets
+    result['peak_kb'] = peak_memory_kb(ConnectionCollector(((tcp_path, False), (tcp6_path, True))).collect)
+    return result
+
+
+def bench_cycle(env, sockets, cycles):
+    """Thời gian từng bước của DosDetector.run_cycle (chu kỳ đầu có chặn thật qua lệnh giả)"""
+    tcp_path, tcp6_path = fixtures.write_proc_tcp(env.dir, sockets)
+    env.reset_shim()
+    detector = make_detector(env, tcp_path, tcp6_path)
+    stage_times = {}
+
+    def stage(name, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        stage_times.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    def one_cycle():
+        syn_stats, conn_stats = stage('get_network_stats', detector.get_network_stats)
+        stage('update_stats', detector.update_stats, syn_stats, conn_stats)
+        stage('record_metrics', detector.record_metrics, conn_stats)
+        stage('clean_old_records', detector.clean_old_records)
+        stage('check_for_attacks', detector.check_for_attacks)
+        stage('check_baseline', detector.check_baseline, conn_stats)
+
+    totals = timed(one_cycle, cycles)
+    result = {
+        'sockets': sockets,
+        'cycle': summary_ms(totals),
+        'stages': {name: summary_ms(times) for name, times in stage_times.items()},
+        'blocked': len(detector.ban_index),
+        'tracked_ips': len(detector.conn_count),
+    }
+    result['peak_kb'] = peak_memory_kb(one_cycle)
+    return result
+
+
+def bench_enforce(env, blocks, lookups):
+    """Độ trễ chặn một IP (chỉ mục + lệnh iptables giả) và tra cứu chỉ mục chặn"""
+    env.reset_shim()
+    detector = make_detector(env)
+    latencies = []
+    for i in range(blocks):
+        ip = f"198.18.{i >> 8}.{i & 255}"
+        started = time.perf_counter()
+        detector.block_ip(ip, 'benchmark')
+        latencies.append(time.perf_counter() - started)
+
+    from ban_index import BanIndex, SOURCE_MANUAL
+    from ip_utils import ip_key
+    index = BanIndex(env.path('lookup_index.json'))
+    for i in range(100):
+        index.add(f"10.{i}.0.0/16", SOURCE_MANUAL)
+    keys = [ip_key(f"10.{i % 200}.{i % 250}.{i % 254 + 1}") for i in range(lookups)]
+    index.is_blocked(keys[0])
+    started = time.perf_counter()
+    for key in keys:
+        index.is_blocked(key)
+    lookup_time = time.perf_counter() - started
+
+    state = fixtures.read_shim_state(env.shim_state)
+    return {
+        'blocks': blocks,
+        'block_p50_ms': percentile(latencies, 0.5) * 1000,
+        'block_p95_ms': percentile(latencies, 0.95) * 1000,
+        'iptables_calls': state['calls'],
+        'lookup_us': lookup_time * 1e6 / lookups,
+    }
+
+
+def bench_alerts(env, count, repeat):
+    """write_alert khi file cảnh báo đang có `count` bản ghi"""
+    json_path, jsonl_path = fixtures.write_alert_files(env.dir, count)
+    detector = make_detector(env)
+    alert_file = detector.config['alert_file']
+
+    def write():
+        shutil.copyfile(json_path, alert_file)
+        started = time.perf_counter()
+        detector.write_alert(fixtures.make_alert(0))
+        return time.perf_counter() - started
+
+    times = [write() for _ in range(repeat)]
+    return {
+        'alerts': count,
+        'file_kb': os.path.getsize(json_path) // 1024,
+        'write': summary_ms(times),
+    }
+
+
+def bench_access_log(lines):
+    import access_log
+
+    processed, elapsed, clients = access_log.benchmark(lines)
+    return {'lines': processed, 'seconds': elapsed, 'lines_per_second': processed / elapsed, 'clients': clients}
+
+
+def bench_api(env, alerts, concurrency_levels, requests_per_level):
+    """Độ trễ HTTP thật (werkzeug) của /api/status và /api/bans khi nhiều client đồng thời"""
+    try:
+        import web_dashboard
+        from werkzeug.serving import make_server
+    except ImportError as e:
+        return {'skipped': f"Thiếu thư viện web: {e}"}
+    from ban_index import BanIndex, SOURCE_MANUAL
+
+    json_path, _ = fixtures.write_alert_files(env.dir, alerts)
+    web_dashboard.ALERT_FILE = json_path
+    web_dashboard.ban_index = BanIndex(env.path('web_ban_index.json'))
+    for i in range(1000):
+        web_dashboard.ban_index.add(f"198.19.{i >> 8}.{i & 255}", SOURCE_MANUAL)
+
+    server = make_server('127.0.0.1', 0, web_dashboard.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    results = {'alerts': alerts}
+
+    try:
+        for endpoint in ('/api/status', '/api/bans'):
+            urllib.request.urlopen(base + endpoint).read()
+            for concurrency in concurrency_levels:
+                latencies = []
+                lock = threading.Lock()
+                per_thread = max(1, requests_per_level // concurrency)
+
+                def client():
+                    local = []
+                    for _ in range(per_thread):
+                        started = time.perf_counter()
+                        urllib.request.urlopen(base + endpoint).read()
+                        local.append(time.perf_counter() - started)
+                    with lock:
+                        latencies.extend(local)
+
+                started = time.perf_counter()
+                threads = [threading.Thread(target=client) for _ in range(concurrency)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+
+                results[f"{endpoint} c={concurrency}"] = {
+                    'requests': len(latencies),
+                    'p50_ms': percentile(latencies, 0.5) * 1000,
+                    'p95_ms': percentile(latencies, 0.95) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                    'requests_per_second': len(latencies) / elapsed,
+                }
+    finally:
+        server.shutdown()
+    return results
+
+
+# ---- So sánh ----
+
+# Chỉ số càng thấp càng tốt / càng cao càng tốt
+LOWER_IS_BETTER = ('median_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'block_p50_ms', 'block_p95_ms',
+                   'us_per_socket', 'lookup_us', 'peak_kb', 'seconds')
+HIGHER_IS_BETTER = ('lines_per_second', 'requests_per_second')
+
+
+def flatten(data, prefix=''):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(previous, current, tolerance):
+    """Danh sách (chỉ số, trước, sau, tỷ lệ) chậm đi quá tolerance"""
+    old = flatten(previous.get('results', {}))
+    new = flatten(current.get('results', {}))
+    regressions = []
+    for name, value in new.items():
+        before = old.get(name)
+        if not before or not value:
+            continue
+        metric = name.rsplit('.', 1)[-1]
+        if metric in LOWER_IS_BETTER:
+            ratio = value / before
+        elif metric in HIGHER_IS_BETTER:
+            ratio = before / value
+        else:
+            continue
+        if ratio > 1 + tolerance:
+            regressions.append((name, before, value, ratio))
+    return regressions
+
+
+def parse_sizes(text):
+    return [int(item) for item in text.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark firewall trên dữ liệu giả")
+    parser.add_argument('--sockets', type=parse_sizes, default=DEFAULT_SOCKETS,
+                        help="Số socket trong /proc/net/tcp giả, cách nhau bởi dấu phẩy (tới 1000000)")
+    parser.add_argument('--alerts', type=parse_sizes, default=DEFAULT_ALERTS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--blocks', type=int, default=50)
+    parser.add_argument('--log-lines', type=int, default=500000)
+    parser.add_argument('--concurrency', type=parse_sizes, default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--only', help="Chỉ chạy các bước (collect,cycle,enforce,alerts,access_log,api)")
+    parser.add_argument('--output', help="File JSON kết quả")
+    parser.add_argument('--compare', help="File JSON của lần chạy trước")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--keep', action='store_true', help="Giữ thư mục fixture tạm")
+    args = parser.parse_args(argv)
+
+    # Daemon ghi log mỗi lần chặn; chỉ giữ lỗi để kết quả dễ đọc
+    logging.getLogger().setLevel(logging.ERROR)
+    only = set(args.only.split(',')) if args.only else None
+    env = Environment(keep=args.keep)
+    results = {}
+
+    def run(name, fn, *fn_args):
+        if only and name.split('[')[0] not in only:
+            return
+        print(f"- {name} ...", flush=True)
+        results[name] = fn(*fn_args)
+
+    try:
+        for sockets in args.sockets:
+            run(f"collect[{sockets}]", bench_collect, env, sockets, args.repeat)
+        for sockets in args.sockets:
+            run(f"cycle[{sockets}]", bench_cycle, env, sockets, args.cycles)
+        run('enforce', bench_enforce, env, args.blocks, 100000)
+        for count in args.alerts:
+            run(f"alerts[{count}]", bench_alerts, env, count, args.repeat)
+        run('access_log', bench_access_log, args.log_lines)
+        run('api', bench_api, env, args.alerts[len(args.alerts) // 2], args.concurrency, args.requests)
+    finally:
+        env.close()
+
+    report = {
+        'version': 1,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results,
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Đã ghi kết quả: {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        regressions = compare(previous, report, args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"CHẬM HƠN {name}: {before:.3f} -> {after:.3f} (x{ratio:.2f})")
+        if regressions:
+            return 1
+        print(f"Không có chỉ số nào chậm hơn {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
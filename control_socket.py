@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Socket điều khiển của auto_block.py: đọc/sửa cấu hình, nạp lại file cấu hình,
+xem thống kê và các IP vi phạm nhiều nhất khi daemon đang chạy.
+
+Giao thức: mỗi dòng là một JSON
+    -> {"cmd": "set_config", "values": {"syn_threshold": 80}, "persist": true}
+    <- {"ok": true, "result": {...}}       hoặc   {"ok": false, "error": "..."}
+
+Thay đổi cấu hình được kiểm tra trước, rồi main loop của daemon áp dụng
+nguyên khối giữa hai chu kỳ kiểm tra (không cần khởi động lại, giữ nguyên số đếm).
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+
+from ip_utils import parse_network
+
+SOCKET_PATH = '/run/firewall-auto-block.sock'
+CONFIG_FILE = '/etc/firewall_auto_block.conf'
+# Thời gian tối đa chờ main loop áp dụng thay đổi
+APPLY_TIMEOUT = 5.0
+# Client chờ lâu hơn APPLY_TIMEOUT để nhận được câu trả lời "đang bận" của daemon
+# thay vì tự hết giờ và coi như daemon không chạy
+TIMEOUT = APPLY_TIMEOUT + 5.0
+
+
+class ControlError(Exception):
+    pass
+
+
+# ---- Kiểm tra cấu hình ----
+
+def _positive_int(value):
+    value = int(value)
+    if value <= 0:
+        raise ValueError("phải lớn hơn 0")
+    return value
+
+
+def _positive_float(value):
+    value = float(value)
+    if not value > 0:
+        raise ValueError("phải lớn hơn 0")
+    return value
+
+
+def _fraction(value):
+    value = float(value)
+    if not 0 < value <= 1:
+        raise ValueError("phải trong khoảng (0, 1]")
+    return value
+
+
+def _detection_mode(value):
+    if value not in ('static', 'baseline', 'both'):
+        raise ValueError("phải là static, baseline hoặc both")
+    return value
+
+
+def _ip_list(value):
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(',') if item.strip()]
+    result = []
+    for item in value:
+        parse_network(str(item).strip())
+        result.append(str(item).strip())
+    return result
+
+
+def _path_list(value):
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(',') if item.strip()]
+    return [str(item) for item in value]
+
+
+def _email_list(value):
+    if isinstance(value, str):
+        value = [item.strip() for item in value.replace(';', ',').split(',') if item.strip()]
+    result = []
+    for item in value:
+        item = str(item).strip()
+        local, _, domain = item.partition('@')
+        if not local or not domain or ' ' in item:
+            raise ValueError(f"email không hợp lệ: {item}")
+        result.append(item)
+    return result
+
+
+def _url(value):
+    value = str(value or '').strip()
+    if value and not value.startswith(('http://', 'https://')):
+        raise ValueError("phải bắt đầu bằng http:// hoặc https://")
+    return value
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def _host(value):
+    value = str(value).strip()
+    if not value or ' ' in value:
+        raise ValueError("tên máy không hợp lệ")
+    return value
+
+
+def _port(value):
+    value = int(value)
+    if not 0 < value < 65536:
+        raise ValueError("phải trong khoảng 1-65535")
+    return value
+
+
+# Khóa có thể đổi lúc chạy -> hàm chuẩn hóa (ValueError nếu sai)
+TUNABLE = {
+    'check_interval': _positive_int,
+    'time_window': _positive_int,
+    'syn_threshold': _positive_int,
+    'conn_threshold': _positive_int,
+    'http_threshold': _positive_int,
+    'ban_sync_interval': _positive_int,
+    'whitelist': _ip_list,
+    'access_logs': _path_list,
+    'detection_mode': _detection_mode,
+    'baseline_sigmas': _positive_float,
+    'baseline_alpha': _fraction,
+    'baseline_warmup': _positive_int,
+    'baseline_min_count': _positive_int,
+    'notify_email': _email_list,
+    'notify_smtp_host': _host,
+    'notify_smtp_port': _port,
+    'notify_email_per_hour': _positive_int,
+    'notify_webhook': _url,
+    'notify_webhook_per_hour': _positive_int,
+    'notify_syslog': _bool,
+    'notify_window': _positive_int,
+}
+
+
+def validate_config(values):
+    """Chuẩn hóa các giá trị cấu hình; ControlError liệt kê mọi khóa sai"""
+    if not isinstance(values, dict):
+        raise ControlError("values phải là object JSON")
+    clean = {}
+    errors = []
+    for key, value in values.items():
+        convert = TUNABLE.get(key)
+        if convert is None:
+            errors.append(f"{key}: không thể thay đổi")
+            continue
+        try:
+            clean[key] = convert(value)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{key}: giá trị không hợp lệ ({e})")
+    if errors:
+        raise ControlError("; ".join(errors))
+    return clean
+
+
+def load_config_file(path=CONFIG_FILE):
+    """Đọc file cấu hình (JSON); trả về {} nếu chưa có. Bỏ qua khóa không hỗ trợ."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return validate_config({key: value for key, value in data.items() if key in TUNABLE})
+
+
+def save_config_file(config, path=CONFIG_FILE):
+    """Ghi file cấu hình nguyên khối (file tạm + rename)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {key: config[key] for key in TUNABLE if key in config}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---- Phía daemon ----
+
+class _PendingChange:
+    """Thay đổi chờ main loop áp dụng"""
+
+    def __init__(self, values, persist):
+        self.values = values
+        self.persist = persist
+        self.done = threading.Event()
+        self.error = None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                result = self.server.control.dispatch(request)
+                response = {'ok': True, 'result': result}
+            except ControlError as e:
+                response = {'ok': False, 'error': str(e)}
+            except ValueError as e:
+                response = {'ok': False, 'error': f"Yêu cầu không hợp lệ: {e}"}
+            except Exception as e:
+                # Lỗi không lường trước vẫn phải có câu trả lời, không cắt kết nối
+                logging.exception("Lỗi xử lý lệnh điều khiển")
+                response = {'ok': False, 'error': f"Lỗi nội bộ: {e}"}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Chạy trong daemon. detector cần có: config, apply_config(values),
+    daemon_stats(), top_offenders(metric, n), send_test_notification()
+    và wakeup (threading.Event)."""
+
+    def __init__(self, detector, path=SOCKET_PATH, config_file=CONFIG_FILE):
+        self.detector = detector
+        self.path = path
+        self.config_file = config_file
+        self.pending = queue.Queue()
+        self.server = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = _UnixServer(self.path, _Handler)
+        self.server.control = self
+        # Chỉ root được điều khiển daemon
+        os.chmod(self.path, 0o600)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def dispatch(self, request):
+        if not isinstance(request, dict):
+            raise ControlError("Yêu cầu phải là object JSON")
+        command = request.get('cmd')
+        if command == 'ping':
+            return 'pong'
+        if command == 'get_config':
+            return {key: self.detector.config[key] for key in TUNABLE if key in self.detector.config}
+        if command == 'set_config':
+            values = validate_config(request.get('values', {}))
+            return self.submit(values, request.get('persist', True))
+        if command == 'reload':
+            try:
+                values = load_config_file(self.config_file)
+            except (OSError, ValueError) as e:
+                raise ControlError(f"Không đọc được {self.config_file}: {e}")
+            return self.submit(values, persist=False)
+        if command == 'stats':
+            return self.detector.daemon_stats()
+        if command == 'top':
+            try:
+                n = max(1, min(int(request.get('n', 10)), 1000))
+            except (TypeError, ValueError):
+                raise ControlError("n phải là số nguyên")
+            return self.detector.top_offenders(request.get('metric', 'conn'), n)
+        if command == 'notify_test':
+            return self.detector.send_test_notification()
+        raise ControlError(f"Lệnh không hỗ trợ: {command}")
+
+    def submit(self, values, persist):
+        """Đưa thay đổi cho main loop và chờ tới khi nó được áp dụng"""
+        change = _PendingChange(values, persist)
+        self.pending.put(change)
+        self.detector.wakeup.set()
+        if not change.done.wait(APPLY_TIMEOUT):
+            raise ControlError("Daemon chưa áp dụng thay đổi (đang bận), sẽ áp dụng ở chu kỳ tới")
+        if change.error:
+            raise ControlError(change.error)
+        return {key: self.detector.config[key] for key in values}
+
+    def apply_pending(self):
+        """Gọi từ main loop của daemon, giữa hai chu kỳ kiểm tra"""
+        while True:
+            try:
+                change = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.detector.apply_config(change.values)
+                if change.persist:
+                    merged = dict(load_config_file(self.config_file))
+                    merged.update(change.values)
+                    save_config_file(merged, self.config_file)
+            except Exception as e:
+                change.error = str(e)
+            change.done.set()
+
+
+# ---- Phía client (GUI, web, script) ----
+
+class ControlClient:
+    def __init__(self, path=SOCKET_PATH, timeout=TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+
+    def is_available(self):
+        return os.path.exists(self.path)
+
+    def call(self, cmd, **args):
+        request = dict(args, cmd=cmd)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        except OSError as e:
+            raise ControlError(f"Không kết nối được daemon ({self.path}): {e}")
+        finally:
+            sock.close()
+
+        try:
+            response = json.loads(data)
+        except ValueError:
+            raise ControlError("Phản hồi không hợp lệ từ daemon")
+        if not response.get('ok'):
+            raise ControlError(response.get('error', 'Lỗi không xác định'))
+        return response.get('result')
+
+    def get_config(self):
+        return self.call('get_config')
+
+    def set_config(self, values, persist=True):
+        return self.call('set_config', values=values, persist=persist)
+
+    def reload(self):
+        return self.call('reload')
+
+    def stats(self):
+        return self.call('stats')
+
+    def top(self, metric='conn', n=10):
+        return self.call('top', metric=metric, n=n)
+
+    def notify_test(self):
+        return self.call('notify_test')
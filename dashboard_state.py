@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Mô hình trạng thái của tab Dashboard: dữ liệu được làm mới trong nền,
+widget chỉ được cập nhật khi giá trị thực sự thay đổi
+"""
+
+import queue
+import subprocess
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from alert_follower import AlertFollower
+from ban_index import get_ban_index
+from iptables_rules import RulesCache
+from metrics_store import MetricsStore
+
+# Chu kỳ làm mới trạng thái dịch vụ / số IP bị chặn (ms)
+REFRESH_INTERVAL_MS = 15000
+# Chu kỳ chuyển cảnh báo mới từ thread theo dõi sang main thread (ms)
+ALERT_DRAIN_MS = 500
+RECENT_ALERTS = 10
+
+_MISSING = object()
+
+
+def start_of_day(timestamp):
+    return datetime.fromtimestamp(timestamp).replace(
+        hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def format_alert(alert):
+    alert_time = datetime.fromtimestamp(alert['timestamp'])
+    return f"{alert_time.strftime('%H:%M:%S')} - {alert['ip']} - {alert['reason']}"
+
+
+class DashboardState:
+    """Giá trị dashboard + listener theo từng khóa (chỉ dùng trên main thread)"""
+
+    def __init__(self, root, worker):
+        self.root = root
+        self.worker = worker
+        self.values = {}
+        self.listeners = defaultdict(list)
+
+        self.rules_cache = RulesCache(max_age=REFRESH_INTERVAL_MS / 1000 / 2)
+        self.ban_index = get_ban_index()
+        self.metrics_store = MetricsStore()
+
+        # Bộ đếm cảnh báo trong ngày: giá trị nền từ MetricsStore + cảnh báo mới
+        self.day_start = start_of_day(time.time())
+        self.alerts_today = 0
+        self.counted_until = None
+        self.recent_alerts = deque(maxlen=RECENT_ALERTS)
+        self.incoming_alerts = queue.Queue()
+        self.follower = AlertFollower(self.incoming_alerts.put)
+
+    # ---- Listener ----
+
+    def subscribe(self, key, callback):
+        """callback(value) được gọi ngay (nếu đã có giá trị) và mỗi khi giá trị đổi"""
+        self.listeners[key].append(callback)
+        value = self.values.get(key, _MISSING)
+        if value is not _MISSING:
+            callback(value)
+
+    def update(self, **values):
+        for key, value in values.items():
+            if self.values.get(key, _MISSING) == value:
+                continue
+            self.values[key] = value
+            for callback in self.listeners[key]:
+                callback(value)
+
+    # ---- Làm mới ----
+
+    def start(self):
+        self.worker.submit(self.fetch_alert_baseline, on_done=self.on_alert_baseline,
+                           on_error=lambda e: self.on_alert_baseline((time.time(), 0)),
+                           key='dashboard.baseline', group='main')
+        self.schedule_refresh()
+        self.root.after(ALERT_DRAIN_MS, self.drain_alerts)
+
+    def refresh(self):
+        """Làm mới số IP bị chặn và trạng thái dịch vụ trong nền"""
+        self.worker.submit(self.fetch_status, on_done=lambda values: self.update(**values),
+                           on_error=lambda e: print(f"Lỗi làm mới dashboard: {e}"),
+                           key='dashboard.refresh', group='main')
+
+    def schedule_refresh(self):
+        self.refresh()
+        self.root.after(REFRESH_INTERVAL_MS, self.schedule_refresh)
+
+    def fetch_status(self):
+        # Chạy trong thread nền
+        values = {}
+        for key, service in (('auto_block_active', 'firewall-auto-block'),
+                             ('fail2ban_active', 'fail2ban')):
+            result = subprocess.run(['systemctl', 'is-active', service],
+                                    capture_output=True, text=True)
+            values[key] = result.stdout.strip() == 'active'
+
+        try:
+            # Chỉ mục chặn hợp nhất: rule DROP, chặn tự động/thủ công và fail2ban
+            self.ban_index.sync_iptables(self.rules_cache.get_rules())
+            values['blocked_count'] = len(self.ban_index)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Lỗi đọc rules: {e}")
+        return values
+
+    def fetch_alert_baseline(self):
+        # Số cảnh báo từ đầu ngày tới giờ, lấy từ MetricsStore thay vì đọc lại file
+        now = time.time()
+        points = self.metrics_store.read('alerts', self.day_start, now, archive=1)
+        return now, int(sum(value for ts, value in points))
+
+    def on_alert_baseline(self, result):
+        self.counted_until, baseline = result
+        self.alerts_today += baseline
+        self.update(alerts_today=self.alerts_today)
+        self.follower.start()
+
+    def drain_alerts(self):
+        """Chuyển cảnh báo mới (từ thread theo dõi) vào state trên main thread"""
+        day_start = start_of_day(time.time())
+        if day_start != self.day_start:
+            # Sang ngày mới
+            self.day_start = day_start
+            self.alerts_today = 0
+
+        changed = False
+        while True:
+            try:
+                alerts = self.incoming_alerts.get_nowait()
+            except queue.Empty:
+                break
+            for alert in alerts:
+                timestamp = alert.get('timestamp', 0)
+                self.recent_alerts.append(format_alert(alert))
+                # Cảnh báo cũ trong backlog đã nằm trong giá trị nền
+                if timestamp > self.counted_until and timestamp >= self.day_start:
+                    self.alerts_today += 1
+                changed = True
+
+        if changed:
+            self.update(recent_alerts=tuple(self.recent_alerts))
+        self.update(alerts_today=self.alerts_today)
+        self.root.after(ALERT_DRAIN_MS, self.drain_alerts)
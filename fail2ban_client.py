@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Client nói chuyện trực tiếp với fail2ban-server qua Unix socket (giao thức của
+fail2ban-client: lệnh được pickle, kết thúc bằng <F2B_END_COMMAND>), dùng một
+kết nối lâu dài thay vì mỗi lệnh khởi động một tiến trình fail2ban-client
+
+Gỡ ban hàng loạt từ script:
+    sudo python3 fail2ban_client.py unban --jail sshd 1.2.3.4 5.6.7.8
+    sudo python3 fail2ban_client.py unban --file false_positives.txt   # mỗi dòng: "<jail> <ip>"
+"""
+
+import argparse
+import os
+import pickle
+import socket
+import socketserver
+import sys
+import threading
+import time
+from datetime import datetime
+
+SOCKET_PATH = '/var/run/fail2ban/fail2ban.sock'
+END_COMMAND = b'<F2B_END_COMMAND>'
+CLOSE_COMMAND = b'<F2B_CLOSE_COMMAND>'
+TIMEOUT = 5.0
+RECV_SIZE = 65536
+# Số IP tối đa trong một lệnh unbanip
+UNBAN_BATCH = 200
+# fail2ban chạy actionunban (một lệnh iptables) cho từng IP trước khi trả lời:
+# thời gian chờ của unbanip tăng theo số IP trong lô
+UNBAN_SECONDS_PER_IP = 0.05
+# unban --all: không biết trước số IP
+UNBAN_ALL_TIMEOUT = 300.0
+
+
+class Fail2BanError(Exception):
+    pass
+
+
+class JailStatus:
+    """Kết quả của lệnh `status <jail>`"""
+
+    __slots__ = ('name', 'currently_failed', 'total_failed', 'file_list',
+                 'currently_banned', 'total_banned', 'banned_ips')
+
+    def __init__(self, name, currently_failed=0, total_failed=0, file_list=(),
+                 currently_banned=0, total_banned=0, banned_ips=()):
+        self.name = name
+        self.currently_failed = currently_failed
+        self.total_failed = total_failed
+        self.file_list = list(file_list)
+        self.currently_banned = currently_banned
+        self.total_banned = total_banned
+        self.banned_ips = list(banned_ips)
+
+    @classmethod
+    def from_reply(cls, name, reply):
+        # reply: [('Filter', [(key, value), ...]), ('Actions', [(key, value), ...])]
+        fields = {}
+        for section, items in reply:
+            for key, value in items:
+                fields[key] = value
+        return cls(
+            name,
+            currently_failed=fields.get('Currently failed', 0),
+            total_failed=fields.get('Total failed', 0),
+            file_list=fields.get('File list', []) or [],
+            currently_banned=fields.get('Currently banned', 0),
+            total_banned=fields.get('Total banned', 0),
+            banned_ips=fields.get('Banned IP list', []) or [],
+        )
+
+
+class BanEntry:
+    """Một IP đang bị ban kèm thời điểm ban và hết hạn"""
+
+    __slots__ = ('jail', 'ip', 'banned_at', 'bantime', 'expires_at')
+
+    def __init__(self, jail, ip, banned_at=None, bantime=None, expires_at=None):
+        self.jail = jail
+        self.ip = ip
+        self.banned_at = banned_at
+        self.bantime = bantime
+        self.expires_at = expires_at
+
+
+class UnbanResult:
+    """Tổng kết một lần gỡ ban hàng loạt"""
+
+    __slots__ = ('requested', 'unbanned', 'failed')
+
+    def __init__(self):
+        self.requested = 0
+        self.unbanned = 0
+        self.failed = {}        # jail -> (số IP, thông báo lỗi)
+
+    def summary(self):
+        text = f"Đã gỡ ban {self.unbanned}/{self.requested} IP"
+        not_banned = self.requested - self.unbanned - sum(count for count, error in self.failed.values())
+        if not_banned > 0:
+            text += f" ({not_banned} IP không còn bị ban)"
+        for jail, (count, error) in self.failed.items():
+            text += f"\nLỗi jail {jail} ({count} IP): {error}"
+        return text
+
+
+def _parse_time(text):
+    try:
+        return datetime.strptime(text.strip(), '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+def parse_ban_entry(jail, line):
+    """Phân tích một dòng của `get <jail> banip --with-time`:
+    '1.2.3.4 \\t2024-01-01 12:00:00 + 600 = 2024-01-01 12:10:00'
+    """
+    ip, _, rest = line.partition('\t')
+    ip = ip.strip()
+    if not rest:
+        return BanEntry(jail, ip)
+
+    start, _, rest = rest.partition(' + ')
+    bantime, _, end = rest.partition(' = ')
+    try:
+        bantime = int(bantime)
+    except ValueError:
+        bantime = None
+    return BanEntry(jail, ip, _parse_time(start), bantime, _parse_time(end))
+
+
+def _convert(value):
+    # Như fail2ban-client: chỉ gửi kiểu cơ bản
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
+
+
+def encode_message(obj):
+    return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL) + END_COMMAND
+
+
+class Fail2BanClient:
+    """Kết nối lâu dài tới fail2ban-server; an toàn khi dùng từ nhiều thread"""
+
+    def __init__(self, path=SOCKET_PATH, timeout=TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise Fail2BanError(f"Không kết nối được fail2ban ({self.path}): {e}")
+        self.sock = sock
+
+    def _receive(self):
+        data = b''
+        while not data.endswith(END_COMMAND):
+            chunk = self.sock.recv(RECV_SIZE)
+            if not chunk:
+                raise ConnectionError("fail2ban đóng kết nối")
+            data += chunk
+        return pickle.loads(data[:-len(END_COMMAND)])
+
+    def send(self, command, timeout=None):
+        """Gửi một lệnh (list) và trả về kết quả; lỗi phía server -> Fail2BanError.
+        timeout: thời gian chờ trả lời của riêng lệnh này (mặc định self.timeout)"""
+        message = encode_message([_convert(part) for part in command])
+        with self._lock:
+            for attempt in (0, 1):
+                if self.sock is None:
+                    self._connect()
+                try:
+                    self.sock.settimeout(self.timeout)
+                    self.sock.sendall(message)
+                except OSError as e:
+                    # Lệnh chưa gửi xong (server khởi động lại, kết nối cũ đã đóng):
+                    # server chưa chạy lệnh nên kết nối lại và gửi lại một lần
+                    self._close_socket()
+                    if attempt:
+                        raise Fail2BanError(f"Lỗi giao tiếp với fail2ban: {e}")
+                    continue
+                try:
+                    self.sock.settimeout(timeout or self.timeout)
+                    reply = self._receive()
+                except (OSError, EOFError, pickle.UnpicklingError) as e:
+                    # Lệnh đã tới server (có thể đã chạy): không gửi lại vì banip/unbanip
+                    # không idempotent, lần gửi thứ hai sẽ báo sai kết quả
+                    self._close_socket()
+                    raise Fail2BanError(f"Lỗi giao tiếp với fail2ban (lệnh có thể đã được thực hiện): {e}")
+                break
+
+        code, result = reply
+        if code != 0:
+            raise Fail2BanError(str(result))
+        return result
+
+    def _close_socket(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def close(self):
+        with self._lock:
+            if self.sock is not None:
+                try:
+                    self.sock.sendall(CLOSE_COMMAND)
+                except OSError:
+                    pass
+            self._close_socket()
+
+    # ---- Lệnh có kiểu ----
+
+    def ping(self):
+        return self.send(['ping']) == 'pong'
+
+    def jails(self):
+        status = dict(self.send(['status']))
+        jail_list = status.get('Jail list', '')
+        return [name.strip() for name in jail_list.split(',') if name.strip()]
+
+    def jail_status(self, jail):
+        return JailStatus.from_reply(jail, self.send(['status', jail]))
+
+    def banned_with_time(self, jail):
+        lines = self.send(['get', jail, 'banip', '--with-time']) or []
+        return [parse_ban_entry(jail, line) for line in lines]
+
+    def ban(self, jail, ip):
+        return self.send(['set', jail, 'banip', ip])
+
+    def unban(self, jail, ips):
+        """Gỡ ban nhiều IP khỏi một jail trong một lệnh; trả về số IP đã gỡ"""
+        ips = list(ips)
+        if not ips:
+            return 0
+        return self.send(['set', jail, 'unbanip'] + ips,
+                         timeout=self.timeout + UNBAN_SECONDS_PER_IP * len(ips))
+
+    def unban_all(self):
+        """Gỡ ban mọi IP ở mọi jail; trả về số IP đã gỡ"""
+        return self.send(['unban', '--all'], timeout=max(self.timeout, UNBAN_ALL_TIMEOUT))
+
+    def unban_many(self, targets, progress=None, batch_size=UNBAN_BATCH):
+        """Gỡ ban danh sách (jail, ip): gom theo jail, mỗi jail một lệnh unbanip
+        (chia lô batch_size IP). progress(đã xử lý, tổng) được gọi sau mỗi lô.
+        Lỗi ở một jail không dừng các jail còn lại. Trả về UnbanResult.
+        """
+        by_jail = {}
+        for jail, ip in targets:
+            by_jail.setdefault(jail, {})[ip] = None     # dict giữ thứ tự, bỏ IP trùng
+        by_jail = {jail: list(ips) for jail, ips in by_jail.items()}
+
+        result = UnbanResult()
+        result.requested = sum(len(ips) for ips in by_jail.values())
+        done = 0
+        for jail, ips in by_jail.items():
+            for start in range(0, len(ips), batch_size):
+                batch = ips[start:start + batch_size]
+                try:
+                    result.unbanned += self.unban(jail, batch)
+                except Fail2BanError as e:
+                    count, error = result.failed.get(jail, (0, str(e)))
+                    result.failed[jail] = (count + len(batch), error)
+                done += len(batch)
+                if progress:
+                    progress(done, result.requested)
+        return result
+
+
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    """Client dùng chung trong tiến trình"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = Fail2BanClient()
+        return _default_client
+
+
+# ---- Server giả lập (dùng để thử nghiệm, không cần fail2ban thật) ----
+
+class _FakeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = b''
+        while True:
+            chunk = self.request.recv(RECV_SIZE)
+            if not chunk:
+                return
+            data += chunk
+            while True:
+                if data.startswith(CLOSE_COMMAND):
+                    return
+                end = data.find(END_COMMAND)
+                if end < 0:
+                    break
+                command = pickle.loads(data[:end])
+                data = data[end + len(END_COMMAND):]
+                self.request.sendall(encode_message(self.server.fake.dispatch(command)))
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FakeFail2BanServer:
+    """fail2ban-server giả trong bộ nhớ: jails -> {ip: thời điểm ban}"""
+
+    def __init__(self, path, jails=None, bantime=600, latency=0.0):
+        self.path = path
+        self.bantime = bantime
+        self.latency = latency
+        self.jails = {name: dict(ips) for name, ips in (jails or {}).items()}
+        self.failed = {name: 0 for name in self.jails}
+        self.commands = []
+        self._lock = threading.Lock()
+        self.server = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = _UnixServer(self.path, _FakeHandler)
+        self.server.fake = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def dispatch(self, command):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.commands.append(command)
+            try:
+                return [0, self._execute(command)]
+            except Exception as e:
+                return [1, e]
+
+    def _execute(self, command):
+        name = command[0]
+        if name == 'ping':
+            return 'pong'
+        if name == 'status' and len(command) == 1:
+            return [('Number of jail', len(self.jails)),
+                    ('Jail list', ', '.join(self.jails))]
+        if name == 'status':
+            jail = self._jail(command[1])
+            return [('Filter', [('Currently failed', self.failed[command[1]]),
+                                ('Total failed', self.failed[command[1]]),
+                                ('File list', ['/var/log/auth.log'])]),
+                    ('Actions', [('Currently banned', len(jail)),
+                                 ('Total banned', len(jail)),
+                                 ('Banned IP list', list(jail))])]
+        if name == 'get' and command[2:] == ['banip', '--with-time']:
+            lines = []
+            for ip, banned_at in self._jail(command[1]).items():
+                start = datetime.fromtimestamp(banned_at).strftime('%Y-%m-%d %H:%M:%S')
+                end = datetime.fromtimestamp(banned_at + self.bantime).strftime('%Y-%m-%d %H:%M:%S')
+                lines.append(f"{ip} \t{start} + {self.bantime} = {end}")
+            return lines
+        if name == 'set' and command[2] == 'banip':
+            jail = self._jail(command[1])
+            for ip in command[3:]:
+                jail[ip] = time.time()
+            return len(command) - 3
+        if name == 'set' and command[2] == 'unbanip':
+            jail = self._jail(command[1])
+            return sum(1 for ip in command[3:] if jail.pop(ip, None) is not None)
+        if name == 'unban' and command[1:] == ['--all']:
+            count = sum(len(jail) for jail in self.jails.values())
+            for jail in self.jails.values():
+                jail.clear()
+            return count
+        raise ValueError(f"Invalid command: {command}")
+
+    def _jail(self, name):
+        if name not in self.jails:
+            raise ValueError(f"Sorry but the jail '{name}' does not exist")
+        return self.jails[name]
+
+
+# ---- Dòng lệnh ----
+
+def read_targets(path, default_jail=None):
+    """Đọc danh sách "<jail> <ip>" (hoặc chỉ "<ip>" khi có default_jail); '-' là stdin"""
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for line in f:
+            parts = line.split('#', 1)[0].split()
+            if len(parts) >= 2:
+                yield parts[0], parts[1]
+            elif len(parts) == 1 and default_jail:
+                yield default_jail, parts[0]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Truy vấn / gỡ ban fail2ban qua socket")
+    parser.add_argument('--socket', default=SOCKET_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('jails', help="Liệt kê jail")
+    banned_parser = commands.add_parser('banned', help="Liệt kê IP bị ban (kèm thời gian)")
+    banned_parser.add_argument('jails', nargs='*')
+    unban_parser = commands.add_parser('unban', help="Gỡ ban hàng loạt")
+    unban_parser.add_argument('ips', nargs='*')
+    unban_parser.add_argument('--jail', help="Jail cho các IP không ghi jail")
+    unban_parser.add_argument('--file', help="File danh sách '<jail> <ip>' ('-' là stdin)")
+    args = parser.parse_args(argv)
+
+    client = Fail2BanClient(args.socket)
+    try:
+        if args.command == 'jails':
+            print('\n'.join(client.jails()))
+        elif args.command == 'banned':
+            for jail in args.jails or client.jails():
+                for entry in client.banned_with_time(jail):
+                    expires = datetime.fromtimestamp(entry.expires_at).isoformat() if entry.expires_at else ''
+                    print(f"{jail}\t{entry.ip}\t{expires}")
+        else:
+            targets = []
+            if args.ips:
+                if not args.jail:
+                    parser.error("cần --jail khi truyền IP trên dòng lệnh")
+                targets.extend((args.jail, ip) for ip in args.ips)
+            if args.file:
+                targets.extend(read_targets(args.file, args.jail))
+            result = client.unban_many(targets)
+            print(result.summary())
+            return 1 if result.failed else 0
+    except Fail2BanError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
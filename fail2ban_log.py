@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Đọc tăng dần /var/log/fail2ban.log và giữ chỉ mục (jail, ip) trong bộ nhớ:
+thời điểm ban, dự kiến gỡ ban và số lần vi phạm (Found)
+"""
+
+import re
+import threading
+from datetime import datetime
+
+from file_tailer import FileTailer
+
+FAIL2BAN_LOG = '/var/log/fail2ban.log'
+# Số bản ghi tối đa; vượt quá thì bỏ các IP không còn bị ban lâu nhất
+MAX_ENTRIES = 200000
+# Giới hạn byte đọc mỗi lần update() để không giữ thread quá lâu
+READ_LIMIT = 64 * 1024 * 1024
+
+# 2024-01-01 12:00:00,123 fail2ban.actions [123]: NOTICE  [sshd] Ban 1.2.3.4
+_LINE = re.compile(
+    rb'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)[,.]\d+ fail2ban\.\w+\s*\[\d+\]:\s*\w+\s+'
+    rb'\[([^\]]+)\] (Found|Ban|Unban|Restore Ban) (\S+)'
+)
+
+
+class BanRecord:
+    """Thông tin của một (jail, ip) tổng hợp từ log"""
+
+    __slots__ = ('matches', 'banned', 'banned_at', 'unbanned_at', 'last_seen')
+
+    def __init__(self):
+        self.matches = 0
+        self.banned = False
+        self.banned_at = None
+        self.unbanned_at = None
+        self.last_seen = 0.0
+
+
+class Fail2BanLogIndex:
+    def __init__(self, path=FAIL2BAN_LOG, backlog=None):
+        self.tailer = FileTailer(path, backlog=backlog)
+        self.records = {}           # (jail, ip) -> BanRecord
+        self.bantimes = {}          # jail -> bantime (giây), để tính dự kiến gỡ ban
+        self.lines_read = 0
+        self._lock = threading.Lock()
+        self._time_cache = (None, 0.0)
+
+    def _timestamp(self, text):
+        # Nhiều dòng liên tiếp có cùng giây: chỉ parse lại khi chuỗi đổi
+        cached_text, cached_value = self._time_cache
+        if text != cached_text:
+            cached_value = datetime.strptime(text.decode(), '%Y-%m-%d %H:%M:%S').timestamp()
+            self._time_cache = (text, cached_value)
+        return cached_value
+
+    def update(self, max_bytes=READ_LIMIT):
+        """Đọc các dòng mới (tối đa max_bytes); trả về số dòng đã đọc"""
+        lines = self.tailer.read_lines(max_bytes)
+        self.lines_read += len(lines)
+
+        with self._lock:
+            records = self.records
+            for line in lines:
+                # Lọc nhanh bằng tìm chuỗi con trước khi chạy regex
+                if b'] Found ' not in line and b'Ban ' not in line and b'] Unban ' not in line:
+                    continue
+                match = _LINE.match(line)
+                if not match:
+                    continue
+
+                when, jail, action, ip = match.groups()
+                timestamp = self._timestamp(when)
+                key = (jail.decode(), ip.decode())
+                record = records.get(key)
+                if record is None:
+                    record = records[key] = BanRecord()
+
+                if action == b'Found':
+                    record.matches += 1
+                elif action == b'Unban':
+                    record.banned = False
+                    record.unbanned_at = timestamp
+                elif action == b'Restore Ban' and record.banned:
+                    # Ban được khôi phục sau khi fail2ban khởi động lại: giữ thời điểm ban cũ
+                    pass
+                else:
+                    record.banned = True
+                    record.banned_at = timestamp
+                record.last_seen = timestamp
+
+            if len(records) > MAX_ENTRIES:
+                self._prune()
+        return len(lines)
+
+    def _prune(self):
+        inactive = sorted((record.last_seen, key) for key, record in self.records.items()
+                          if not record.banned)
+        for last_seen, key in inactive[:len(self.records) - MAX_ENTRIES]:
+            del self.records[key]
+
+    def set_bantime(self, jail, seconds):
+        self.bantimes[jail] = seconds
+
+    def lookup(self, jail, ip):
+        """Trả về (thời điểm ban, dự kiến gỡ ban, số lần vi phạm); None nếu chưa biết"""
+        with self._lock:
+            record = self.records.get((jail, ip))
+            if record is None:
+                return None, None, None
+            banned_at = record.banned_at if record.banned else None
+            bantime = self.bantimes.get(jail)
+            expires_at = banned_at + bantime if banned_at and bantime and bantime > 0 else None
+            return banned_at, expires_at, record.matches
+
+    def banned(self):
+        """Danh sách (jail, ip) đang bị ban theo log"""
+        with self._lock:
+            return [key for key, record in self.records.items() if record.banned]
+
@@ -2,10 +2,36 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
 import json
+from datetime import datetime
+
+from gui_worker import get_worker, BusyIndicator
+from fail2ban_client import get_client
+from jail_status import get_service
+from fail2ban_log import Fail2BanLogIndex
+from tree_sync import sync_tree
+from ban_index import get_ban_index
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+# Số IP bị ban hiển thị mỗi trang (Treeview chậm dần khi có hàng chục nghìn dòng)
+BANNED_PAGE_SIZE = 500
 
 class Fail2BanTab:
     def __init__(self, parent):
         self.parent = parent
+        self.worker = get_worker(parent)
+        # Kết nối socket lâu dài tới fail2ban-server (không fork fail2ban-client)
+        self.client = get_client()
+        # Trạng thái jail lấy song song, có cache; một kết quả cho cả hai bảng
+        self.jail_service = get_service()
+        # Thời điểm ban / số lần vi phạm lấy từ fail2ban.log (đọc tăng dần)
+        self.ban_log = Fail2BanLogIndex()
+        
+        # Danh sách IP bị ban đầy đủ (jail, ip, values) và phần sau khi lọc
+        self.banned_rows = []
+        self.banned_filtered = []
+        self.banned_page = 0
         self.create_widgets()
         self.refresh_status()
     
@@ -28,6 +54,7 @@ class Fail2BanTab:
         ttk.Button(btn_frame, text="Dừng", command=lambda: self.control_service('stop')).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="Khởi Động Lại", command=lambda: self.control_service('restart')).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="Làm Mới", command=self.refresh_status).pack(side=tk.LEFT, padx=2)
+        BusyIndicator(status_frame, self.worker, 'fail2ban', side=tk.RIGHT, padx=5)
         
         # Jails status
         jails_frame = ttk.LabelFrame(main_frame, text="Trạng Thái Jails")
@@ -53,21 +80,48 @@ class Fail2BanTab:
         banned_frame = ttk.LabelFrame(main_frame, text="IP Đang Bị Ban")
         banned_frame.pack(fill=tk.BOTH, expand=True)
         
+        # Lọc theo tiền tố IP / jail (lọc ngay trong bộ nhớ khi gõ)
+        banned_filter_frame = ttk.Frame(banned_frame)
+        banned_filter_frame.pack(fill=tk.X, padx=5, pady=(5, 0))
+        
+        ttk.Label(banned_filter_frame, text="Lọc IP:").pack(side=tk.LEFT)
+        self.ip_filter_var = tk.StringVar()
+        self.ip_filter_var.trace_add('write', lambda *args: self.apply_banned_filter())
+        ttk.Entry(banned_filter_frame, textvariable=self.ip_filter_var, width=20).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(banned_filter_frame, text="Jail:").pack(side=tk.LEFT)
+        self.jail_filter_var = tk.StringVar(value='Tất cả')
+        self.jail_filter_combo = ttk.Combobox(banned_filter_frame, textvariable=self.jail_filter_var,
+                                              values=['Tất cả'], state='readonly', width=15)
+        self.jail_filter_combo.pack(side=tk.LEFT, padx=5)
+        self.jail_filter_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_banned_filter())
+        
+        self.banned_count_var = tk.StringVar(value="")
+        ttk.Label(banned_filter_frame, textvariable=self.banned_count_var).pack(side=tk.RIGHT)
+        
         # Treeview for banned IPs
-        banned_columns = ('jail', 'ip', 'time', 'matches')
-        self.banned_tree = ttk.Treeview(banned_frame, columns=banned_columns, show='headings')
+        banned_tree_frame = ttk.Frame(banned_frame)
+        banned_tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        banned_columns = ('jail', 'ip', 'time', 'expires', 'matches')
+        self.banned_tree = ttk.Treeview(banned_tree_frame, columns=banned_columns, show='headings')
         
         self.banned_tree.heading('jail', text='Jail')
         self.banned_tree.heading('ip', text='IP')
         self.banned_tree.heading('time', text='Thời Gian')
+        self.banned_tree.heading('expires', text='Gỡ Ban Lúc')
         self.banned_tree.heading('matches', text='Số Lần Vi Phạm')
         
         self.banned_tree.column('jail', width=100)
         self.banned_tree.column('ip', width=120)
         self.banned_tree.column('time', width=150)
+        self.banned_tree.column('expires', width=150)
         self.banned_tree.column('matches', width=100)
         
-        self.banned_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        banned_scrollbar = ttk.Scrollbar(banned_tree_frame, orient=tk.VERTICAL, command=self.banned_tree.yview)
+        self.banned_tree.configure(yscrollcommand=banned_scrollbar.set)
+        self.banned_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        banned_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Control buttons for banned IPs
         banned_btn_frame = ttk.Frame(banned_frame)
@@ -76,199 +130,232 @@ class Fail2BanTab:
         ttk.Button(banned_btn_frame, text="Làm Mới", command=self.refresh_banned).pack(side=tk.LEFT, padx=2)
         ttk.Button(banned_btn_frame, text="Gỡ Ban IP", command=self.unban_ip).pack(side=tk.LEFT, padx=2)
         ttk.Button(banned_btn_frame, text="Gỡ Ban Tất Cả", command=self.unban_all).pack(side=tk.LEFT, padx=2)
+        
+        # Tiến trình gỡ ban hàng loạt (chỉ hiện khi đang chạy)
+        self.unban_progress = ttk.Progressbar(banned_btn_frame, length=150)
+        self.unban_progress_var = tk.StringVar(value="")
+        self.unban_progress_label = ttk.Label(banned_btn_frame, textvariable=self.unban_progress_var)
+        
+        ttk.Button(banned_btn_frame, text="Sau >", command=lambda: self.go_banned_page(1)).pack(side=tk.RIGHT, padx=2)
+        self.banned_page_var = tk.StringVar(value="Trang 0/0")
+        ttk.Label(banned_btn_frame, textvariable=self.banned_page_var).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(banned_btn_frame, text="< Trước", command=lambda: self.go_banned_page(-1)).pack(side=tk.RIGHT, padx=2)
     
     def refresh_status(self):
         """Làm mới trạng thái Fail2ban"""
-        try:
+        def fetch():
             # Kiểm tra trạng thái service
             result = subprocess.run(
                 ['systemctl', 'is-active', 'fail2ban'],
                 capture_output=True, text=True
             )
-            
-            if result.stdout.strip() == 'active':
+            return result.stdout.strip() == 'active'
+        
+        def show(active):
+            if active:
                 self.status_var.set("ĐANG CHẠY - Fail2ban hoạt động bình thường")
             else:
                 self.status_var.set("DỪNG - Fail2ban không chạy")
-            
-            # Làm mới danh sách jails
-            self.refresh_jails()
-            
-            # Làm mới danh sách IP bị ban
-            self.refresh_banned()
-            
-        except Exception as e:
-            self.status_var.set(f"Lỗi: {str(e)}")
+        
+        self.worker.submit(
+            fetch, on_done=show,
+            on_error=lambda e: self.status_var.set(f"Lỗi: {str(e)}"),
+            key='fail2ban.service', group='fail2ban'
+        )
+        
+        # Làm mới bảng jails và bảng IP bị ban từ cùng một lần lấy
+        self.refresh_jails()
     
-    def refresh_jails(self):
-        """Làm mới danh sách jails"""
-        try:
-            # Clear existing data
-            for item in self.jails_tree.get_children():
-                self.jails_tree.delete(item)
-            
-            # Lấy thông tin jails
-            result = subprocess.run(
-                ['fail2ban-client', 'status'],
-                capture_output=True, text=True
-            )
-            
-            jails = []
-            current_section = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if line.startswith('Jail list:'):
-                    current_section = 'jail_list'
-                elif line.startswith('|-') and current_section == 'jail_list':
-                    jail_name = line.split('|')[-1].strip().strip(',')
-                    if jail_name:
-                        jails.append(jail_name)
-            
-            # Lấy chi tiết từng jail
-            for jail in jails:
-                jail_result = subprocess.run(
-                    ['fail2ban-client', 'status', jail],
-                    capture_output=True, text=True
-                )
-                
-                status = "Đang chạy"
-                filter_name = "N/A"
-                banned_count = "0"
-                
-                for line in jail_result.stdout.split('\n'):
-                    if 'Filter' in line:
-                        filter_name = line.split(':')[-1].strip()
-                    elif 'Currently banned' in line:
-                        banned_count = line.split(':')[-1].strip()
-                
-                self.jails_tree.insert('', tk.END, values=(
-                    jail, status, filter_name, banned_count
-                ))
-                
-        except Exception as e:
-            print(f"Lỗi làm mới jails: {e}")
+    def refresh_jails(self, force=False, replace=False):
+        """Làm mới bảng jails và bảng IP bị ban (force=True bỏ qua cache;
+        replace=True bỏ kết quả của lần làm mới đang chạy, dùng sau ban/gỡ ban)"""
+        def fetch():
+            snapshot = self.jail_service.get(max_age=0 if force else None)
+            try:
+                while self.ban_log.update():
+                    pass
+            except OSError as e:
+                print(f"Lỗi đọc fail2ban.log: {e}")
+            try:
+                # Cho daemon/web biết IP nào fail2ban đang chặn
+                get_ban_index().sync_fail2ban(snapshot.bans)
+            except OSError as e:
+                print(f"Lỗi cập nhật chỉ mục chặn: {e}")
+            return snapshot
+        
+        self.worker.submit(
+            fetch, on_done=self.show_snapshot,
+            on_error=lambda e: print(f"Lỗi làm mới jails: {e}"),
+            key='fail2ban.jails', group='fail2ban', replace=replace
+        )
     
-    def refresh_banned(self):
+    def refresh_banned(self, replace=False):
         """Làm mới danh sách IP bị ban"""
-        try:
-            # Clear existing data
-            for item in self.banned_tree.get_children():
-                self.banned_tree.delete(item)
-            
-            # Lấy danh sách IP bị ban từ tất cả jails
-            result = subprocess.run(
-                ['fail2ban-client', 'status'],
-                capture_output=True, text=True
-            )
-            
-            jails = []
-            current_section = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if line.startswith('Jail list:'):
-                    current_section = 'jail_list'
-                elif line.startswith('|-') and current_section == 'jail_list':
-                    jail_name = line.split('|')[-1].strip().strip(',')
-                    if jail_name:
-                        jails.append(jail_name)
-            
-            # Lấy IP bị ban từ từng jail
-            for jail in jails:
-                banned_result = subprocess.run(
-                    ['fail2ban-client', 'status', jail],
-                    capture_output=True, text=True
-                )
-                
-                for line in banned_result.stdout.split('\n'):
-                    if 'IP list:' in line:
-                        ips = line.split(':')[-1].strip().split(',')
-                        for ip in ips:
-                            ip = ip.strip()
-                            if ip and ip != '    ':
-                            # Thêm vào treeview
-                                  self.banned_tree.insert('', tk.END, values=(
-                                jail, ip, 'Đang bị ban', 'N/A'
-                            ))
-                            
-        except Exception as e:
-            print(f"Lỗi làm mới banned IPs: {e}")
+        self.refresh_jails(force=True, replace=replace)
+    
+    def show_snapshot(self, snapshot):
+        # Bảng jails: đồng bộ theo tên jail
+        jail_rows = []
+        for status in snapshot.jails:
+            filter_name = ', '.join(status.file_list) or "N/A"
+            jail_rows.append((status.name, (status.name, "Đang chạy", filter_name, status.currently_banned)))
+        for jail, error in snapshot.errors.items():
+            jail_rows.append((jail, (jail, "Lỗi", error, "N/A")))
+        sync_tree(self.jails_tree, jail_rows)
+        
+        # Bảng IP bị ban: giữ toàn bộ trong bộ nhớ, Treeview chỉ chứa trang đang xem
+        rows = []
+        for entry in snapshot.bans:
+            if entry.bantime:
+                self.ban_log.set_bantime(entry.jail, entry.bantime)
+            # Ưu tiên thời gian từ fail2ban-server, thiếu thì lấy từ log
+            log_banned_at, log_expires_at, matches = self.ban_log.lookup(entry.jail, entry.ip)
+            banned_at = entry.banned_at or log_banned_at
+            expires_at = entry.expires_at or log_expires_at
+            rows.append((entry.jail, entry.ip, (
+                entry.jail, entry.ip,
+                format_time(banned_at) if banned_at else 'Đang bị ban',
+                format_time(expires_at) if expires_at else 'N/A',
+                matches if matches is not None else 'N/A'
+            )))
+        rows.sort(key=lambda row: (row[0], row[1]))
+        self.banned_rows = rows
+        
+        self.jail_filter_combo['values'] = ['Tất cả'] + sorted({status.name for status in snapshot.jails})
+        self.apply_banned_filter(keep_page=True)
+    
+    def apply_banned_filter(self, keep_page=False):
+        """Lọc IP bị ban theo tiền tố IP và jail"""
+        prefix = self.ip_filter_var.get().strip()
+        jail = self.jail_filter_var.get()
+        
+        rows = self.banned_rows
+        if jail != 'Tất cả':
+            rows = [row for row in rows if row[0] == jail]
+        if prefix:
+            rows = [row for row in rows if row[1].startswith(prefix)]
+        self.banned_filtered = rows
+        
+        page_count = self.banned_page_count()
+        if not keep_page:
+            self.banned_page = 0
+        self.banned_page = min(self.banned_page, max(0, page_count - 1))
+        self.render_banned_page()
+    
+    def banned_page_count(self):
+        return (len(self.banned_filtered) + BANNED_PAGE_SIZE - 1) // BANNED_PAGE_SIZE
+    
+    def go_banned_page(self, step):
+        page = self.banned_page + step
+        if 0 <= page < self.banned_page_count():
+            self.banned_page = page
+            self.render_banned_page()
+    
+    def render_banned_page(self):
+        # Chỉ các dòng (jail, ip) thêm/bớt/đổi mới bị động tới; vùng chọn được giữ nguyên
+        start = self.banned_page * BANNED_PAGE_SIZE
+        page_rows = self.banned_filtered[start:start + BANNED_PAGE_SIZE]
+        sync_tree(self.banned_tree, [(f"{jail}|{ip}", values) for jail, ip, values in page_rows])
+        
+        page_count = self.banned_page_count()
+        self.banned_page_var.set(f"Trang {self.banned_page + 1 if page_count else 0}/{page_count}")
+        self.banned_count_var.set(f"{len(self.banned_filtered)}/{len(self.banned_rows)} IP")
     
     def control_service(self, action):
         """Điều khiển service Fail2ban"""
-        try:
-            if action == 'start':
-                subprocess.run(['sudo', 'systemctl', 'start', 'fail2ban'], check=True)
-                messagebox.showinfo("Thành công", "Đã khởi động Fail2ban")
-            elif action == 'stop':
-                subprocess.run(['sudo', 'systemctl', 'stop', 'fail2ban'], check=True)
-                messagebox.showinfo("Thành công", "Đã dừng Fail2ban")
-            elif action == 'restart':
-                subprocess.run(['sudo', 'systemctl', 'restart', 'fail2ban'], check=True)
-                messagebox.showinfo("Thành công", "Đã khởi động lại Fail2ban")
-            
+        messages = {
+            'start': "Đã khởi động Fail2ban",
+            'stop': "Đã dừng Fail2ban",
+            'restart': "Đã khởi động lại Fail2ban",
+        }
+        if action not in messages:
+            return
+        
+        def done(result):
+            messagebox.showinfo("Thành công", messages[action])
             self.refresh_status()
-            
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Lỗi", f"Không thể {action} Fail2ban: {e}")
+        
+        def run():
+            subprocess.run(['sudo', 'systemctl', action, 'fail2ban'], check=True)
+        
+        self.worker.submit(
+            run, on_done=done,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể {action} Fail2ban: {e}"),
+            key='fail2ban.control', group='fail2ban'
+        )
     
     def unban_ip(self):
-        """Gỡ ban IP đã chọn"""
+        """Gỡ ban các IP đã chọn: một xác nhận, mỗi jail một lệnh, một thông báo tổng kết"""
         selection = self.banned_tree.selection()
         if not selection:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn IP để gỡ ban")
             return
         
-        for item in selection:
-            values = self.banned_tree.item(item)['values']
-            jail = values[0]
-            ip = values[1]
-            
+        # iid có dạng "jail|ip"
+        targets = [tuple(item.split('|', 1)) for item in selection]
+        jail_count = len({jail for jail, ip in targets})
+        if not messagebox.askyesno("Xác nhận", f"Gỡ ban {len(targets)} IP từ {jail_count} jail?"):
+            return
+        
+        # Thread nền chỉ ghi vào state; thanh tiến trình đọc state qua after()
+        state = {'done': 0, 'total': len(targets), 'finished': False}
+        
+        def on_progress(done, total):
+            state['done'] = done
+            state['total'] = total
+        
+        def run():
             try:
-                subprocess.run(
-                    ['sudo', 'fail2ban-client', 'set', jail, 'unbanip', ip],
-                    check=True
-                )
-                messagebox.showinfo("Thành công", f"Đã gỡ ban IP {ip} từ jail {jail}")
-            except subprocess.CalledProcessError as e:
-                messagebox.showerror("Lỗi", f"Không thể gỡ ban IP {ip}: {e}")
-        
-        self.refresh_banned()
+                return self.client.unban_many(targets, progress=on_progress)
+            finally:
+                state['finished'] = True
+        
+        def poll():
+            self.unban_progress['maximum'] = max(1, state['total'])
+            self.unban_progress['value'] = state['done']
+            self.unban_progress_var.set(f"{state['done']}/{state['total']}")
+            if not state['finished']:
+                self.parent.after(100, poll)
+        
+        def finish():
+            state['finished'] = True
+            self.unban_progress.pack_forget()
+            self.unban_progress_label.pack_forget()
+            self.jail_service.invalidate()
+            self.refresh_banned(replace=True)
+        
+        def done(result):
+            finish()
+            if result.failed:
+                messagebox.showerror("Lỗi", result.summary())
+            else:
+                messagebox.showinfo("Thành công", result.summary())
+        
+        def failed(error):
+            finish()
+            messagebox.showerror("Lỗi", f"Không thể gỡ ban: {error}")
+        
+        self.unban_progress.pack(side=tk.LEFT, padx=5)
+        self.unban_progress_label.pack(side=tk.LEFT)
+        poll()
+        self.worker.submit(run, on_done=done, on_error=failed, key='fail2ban.unban', group='fail2ban')
     
     def unban_all(self):
         """Gỡ ban tất cả IP"""
         if not messagebox.askyesno("Xác nhận", "Bạn có chắc muốn gỡ ban tất cả IP?"):
             return
         
-        try:
-            # Lấy danh sách tất cả jails
-            result = subprocess.run(
-                ['fail2ban-client', 'status'],
-                capture_output=True, text=True
-            )
-            
-            jails = []
-            current_section = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if line.startswith('Jail list:'):
-                    current_section = 'jail_list'
-                elif line.startswith('|-') and current_section == 'jail_list':
-                    jail_name = line.split('|')[-1].strip().strip(',')
-                    if jail_name:
-                        jails.append(jail_name)
-            
-            # Gỡ ban tất cả IP từ mỗi jail
-            for jail in jails:
-                subprocess.run(
-                    ['sudo', 'fail2ban-client', 'set', jail, 'unban', '--all'],
-                    check=True
-                )
-            
+        def run():
+            # Gỡ ban tất cả IP của mọi jail trong một lệnh
+            return self.client.unban_all()
+        
+        def done(result):
             messagebox.showinfo("Thành công", "Đã gỡ ban tất cả IP")
-            self.refresh_banned()
-            
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Lỗi", f"Không thể gỡ ban tất cả IP: {e}")
\ No newline at end of file
+            self.jail_service.invalidate()
+            self.refresh_banned(replace=True)
+        
+        self.worker.submit(
+            run, on_done=done,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể gỡ ban tất cả IP: {e}"),
+            key='fail2ban.unban_all', group='fail2ban'
+        )
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Đọc tăng dần file log theo offset (xử lý xoay vòng log) và chờ thay đổi bằng inotify
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# Hằng số từ <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+READ_CHUNK = 1024 * 1024
+
+
+class InotifyWatcher:
+    """Theo dõi thư mục chứa file; nếu không có inotify thì chỉ ngủ hết timeout.
+
+    Thư mục chưa tồn tại (ví dụ /var/log/apache2 trên máy chỉ có nginx) không
+    làm tắt inotify của các file khác: thư mục cha gần nhất đang có được theo dõi
+    thay, tới khi thư mục được tạo.
+    """
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        self.names = {}
+        self.pending = []       # file chưa có thư mục, đang theo dõi thư mục cha
+        self.fd = None
+
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_init1')
+        except (OSError, AttributeError):
+            return
+        self.fd = fd
+        for path in paths:
+            self._watch(os.path.abspath(path))
+
+    def _watch(self, path):
+        """Theo dõi thư mục chứa path, hoặc thư mục cha gần nhất đang tồn tại"""
+        directory, name = os.path.split(path)
+        while not os.path.isdir(directory):
+            directory, name = os.path.split(directory)
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            # Ví dụ không có quyền đọc thư mục: file này chỉ được kiểm tra định kỳ
+            return
+        self.names.setdefault(wd, set()).add(os.fsencode(name))
+        if os.path.join(directory, name) != path:
+            self.pending.append(path)
+
+    def wait(self, timeout):
+        """Chờ tối đa timeout giây; trả về True nếu có thay đổi liên quan tới file"""
+        if self.fd is None:
+            time.sleep(timeout)
+            return True
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+
+        changed = False
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            if name in self.names.get(wd, ()):
+                changed = True
+            offset += _EVENT.size + length
+
+        if changed and self.pending:
+            # Có thể một thư mục đang chờ vừa được tạo: theo dõi sâu thêm
+            pending, self.pending = self.pending, []
+            for path in pending:
+                self._watch(path)
+        return changed
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class FileTailer:
+    """Trả về các dòng mới của file kể từ lần đọc trước.
+
+    backlog=None đọc từ đầu file; backlog=n bắt đầu từ n byte cuối file
+    (0 là chỉ đọc dữ liệu ghi thêm sau này).
+    """
+
+    def __init__(self, path, backlog=None):
+        self.path = path
+        self.backlog = backlog
+        self.offset = 0
+        self._file = None
+        self._inode = None
+        self._partial = b''
+        self._started = False
+
+    def _open(self, first):
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+
+        st = os.fstat(f.fileno())
+        self._file = f
+        self._inode = (st.st_dev, st.st_ino)
+        self._partial = b''
+        self.offset = 0
+
+        if first and self.backlog is not None:
+            self.offset = max(0, st.st_size - self.backlog)
+            if self.offset:
+                # Bỏ dòng dở dang ở vị trí bắt đầu
+                f.seek(self.offset - 1)
+                if f.read(1) != b'\n':
+                    f.readline()
+                self.offset = f.tell()
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self, max_bytes):
+        self._file.seek(self.offset)
+        chunks = []
+        remaining = max_bytes
+        while remaining is None or remaining > 0:
+            chunk = self._file.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+        if not chunks:
+            return []
+        data = b''.join(chunks)
+        self.offset += len(data)
+
+        data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        return lines
+
+    def read_lines(self, max_bytes=None):
+        """Đọc các dòng hoàn chỉnh mới (bytes, không kèm '\\n')"""
+        lines = []
+
+        if self._file is None:
+            # backlog chỉ áp dụng cho file đã tồn tại ở lần đọc đầu tiên
+            first = not self._started
+            self._started = True
+            if not self._open(first):
+                return lines
+        else:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                st = None
+
+            if st is None or (st.st_dev, st.st_ino) != self._inode:
+                # Log đã bị xoay vòng: đọc nốt file cũ rồi chuyển sang file mới
+                lines.extend(self._drain(max_bytes))
+                if st is None:
+                    return lines
+                # Dòng cuối của file cũ không còn được ghi tiếp
+                if self._partial:
+                    lines.append(self._partial)
+                self.close()
+                if not self._open(first=False):
+                    return lines
+            elif st.st_size < self.offset:
+                # File bị cắt ngắn (copytruncate)
+                self.offset = 0
+                self._partial = b''
+
+        lines.extend(self._drain(max_bytes))
+        return lines
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Pool thread dùng chung cho GUI: mọi lệnh subprocess chạy nền, kết quả được
+đưa về main loop của Tk qua queue và root.after()
+"""
+
+import queue
+import time
+import traceback
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+# Chu kỳ lấy kết quả từ queue (ms)
+DRAIN_INTERVAL_MS = 30
+# Ngân sách thời gian cho mỗi lần xử lý callback trên main thread (ms)
+FRAME_BUDGET_MS = 16
+
+
+class Task:
+    """Một việc đã gửi vào pool; cancel() bỏ qua kết quả nếu việc đang chạy"""
+
+    __slots__ = ('key', 'group', 'future', 'cancelled', 'on_done', 'on_error')
+
+    def __init__(self, key, group, on_done, on_error):
+        self.key = key
+        self.group = group
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class GuiWorker:
+    def __init__(self, root, max_workers=4):
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gui-worker')
+        self.results = queue.Queue()
+        self.inflight = {}                      # key -> Task (loại trùng việc đang chạy)
+        self.busy_counts = defaultdict(int)     # group -> số việc đang chạy
+        self.busy_listeners = defaultdict(list) # group -> [callback(busy)]
+
+        # Đo thời gian main thread bị chặn: độ trễ của after() và thời gian callback
+        self.lag_samples = deque(maxlen=200)
+        self.callback_samples = deque(maxlen=200)
+        self._expected = time.perf_counter() + DRAIN_INTERVAL_MS / 1000
+        self.root.after(DRAIN_INTERVAL_MS, self._drain)
+
+    # ---- Gửi việc ----
+
+    def submit(self, fn, *args, on_done=None, on_error=None, key=None, group=None, replace=False):
+        """Chạy fn(*args) trong pool.
+
+        on_done(result) / on_error(exc) được gọi trên main thread. Nếu key đang
+        có việc chạy thì không gửi thêm mà trả về Task đang chạy; replace=True
+        thì hủy việc cũ (bỏ kết quả) và chạy việc mới.
+        """
+        if key is not None and key in self.inflight:
+            if not replace:
+                return self.inflight[key]
+            self.inflight.pop(key).cancel()
+
+        task = Task(key, group, on_done, on_error)
+        if key is not None:
+            self.inflight[key] = task
+        self._set_busy(group, +1)
+        task.future = self.pool.submit(self._run, task, fn, args)
+        task.future.add_done_callback(lambda future: self._on_future_done(task, future))
+        return task
+
+    def _on_future_done(self, task, future):
+        # Việc bị hủy trước khi chạy: _run không chạy nên tự báo kết quả để
+        # main thread giảm busy và dọn inflight
+        if future.cancelled():
+            self.results.put((task, False, None))
+
+    def cancel(self, key):
+        task = self.inflight.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_group(self, group):
+        for key, task in list(self.inflight.items()):
+            if task.group == group:
+                del self.inflight[key]
+                task.cancel()
+
+    def _run(self, task, fn, args):
+        # Chạy trong thread của pool: không được đụng tới widget Tk ở đây
+        if task.cancelled:
+            self.results.put((task, False, None))
+            return
+        try:
+            self.results.put((task, True, fn(*args)))
+        except Exception as e:
+            e.traceback_text = traceback.format_exc()
+            self.results.put((task, False, e))
+
+    # ---- Trạng thái bận theo tab ----
+
+    def add_busy_listener(self, group, callback):
+        """callback(True/False) khi group bắt đầu/kết thúc có việc chạy nền"""
+        self.busy_listeners[group].append(callback)
+
+    def is_busy(self, group):
+        return self.busy_counts[group] > 0
+
+    def _set_busy(self, group, delta):
+        if group is None:
+            return
+        before = self.busy_counts[group] > 0
+        self.busy_counts[group] += delta
+        after = self.busy_counts[group] > 0
+        if before != after:
+            for callback in self.busy_listeners[group]:
+                callback(after)
+
+    # ---- Main thread ----
+
+    def _drain(self):
+        now = time.perf_counter()
+        self.lag_samples.append(max(0.0, (now - self._expected) * 1000))
+
+        deadline = now + FRAME_BUDGET_MS / 1000
+        while time.perf_counter() < deadline:
+            try:
+                task, ok, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if task.key is not None and self.inflight.get(task.key) is task:
+                del self.inflight[task.key]
+            self._set_busy(task.group, -1)
+            if task.cancelled:
+                continue
+
+            started = time.perf_counter()
+            try:
+                if ok and task.on_done:
+                    task.on_done(value)
+                elif not ok and task.on_error:
+                    task.on_error(value)
+                elif not ok:
+                    print(f"Lỗi tác vụ nền: {value}")
+            except Exception as e:
+                print(f"Lỗi xử lý kết quả tác vụ nền: {e}")
+            self.callback_samples.append((time.perf_counter() - started) * 1000)
+
+        self._expected = time.perf_counter() + DRAIN_INTERVAL_MS / 1000
+        self.root.after(DRAIN_INTERVAL_MS, self._drain)
+
+    def when_idle(self, groups, callback):
+        """Gọi callback (trên main thread) khi mọi group trong danh sách đã hết việc"""
+        if any(self.is_busy(group) for group in groups):
+            self.root.after(DRAIN_INTERVAL_MS, lambda: self.when_idle(groups, callback))
+        else:
+            callback()
+
+    def blocking_stats(self):
+        """Thời gian main thread bị chặn gần đây (ms): (độ trễ lớn nhất, callback lâu nhất)"""
+        return (max(self.lag_samples, default=0.0), max(self.callback_samples, default=0.0))
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def get_worker(widget):
+    """Lấy GuiWorker dùng chung của cửa sổ chứa widget (tạo mới nếu chưa có)"""
+    root = widget.winfo_toplevel()
+    worker = getattr(root, 'gui_worker', None)
+    if worker is None:
+        worker = GuiWorker(root)
+        root.gui_worker = worker
+    return worker
+
+
+class BusyIndicator:
+    """Thanh tiến trình chạy khi group có việc nền (hiện/ẩn tự động)"""
+
+    def __init__(self, parent, worker, group, **pack_options):
+        self.bar = ttk.Progressbar(parent, mode='indeterminate', length=80)
+        self.pack_options = pack_options
+        worker.add_busy_listener(group, self.set_busy)
+        if worker.is_busy(group):
+            self.set_busy(True)
+
+    def set_busy(self, busy):
+        if busy:
+            self.bar.pack(**self.pack_options)
+            self.bar.start(15)
+        else:
+            self.bar.stop()
+            self.bar.pack_forget()
@@ -23,6 +23,8 @@ sudo apt install -y \
 # Cài đặt Python packages
 echo "Đang cài đặt Python packages..."
 pip3 install matplotlib flask
+# Tùy chọn: xuất báo cáo dạng Parquet (stats_export.py)
+pip3 install pyarrow || echo "Bỏ qua pyarrow - chỉ hỗ trợ xuất CSV/JSON Lines"
 
 # Tạo thư mục log
 echo "Đang tạo thư mục log..."
@@ -36,7 +38,8 @@ sudo chmod 666 /var/log/firewall_alerts.json
 echo "Đang cấu hình Fail2Ban..."
 sudo cp /etc/fail2ban/jail.conf /etc/fail2ban/jail.local
 
-# Tạo custom filter cho HTTP flood
+# Tạo custom filter cho HTTP lỗi (404/5xx)
+# Flood theo số request được auto_block.py tự đếm từ access log (access_log.py)
 sudo tee /etc/fail2ban/filter.d/http-flood.conf > /dev/null <<EOF
 [Definition]
 failregex = ^<HOST> -.*"(GET|POST).*HTTP.*" (404|503|500)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Đo đạc nội bộ của daemon auto_block: bộ đếm, gauge và histogram thời gian
+(từng bước của chu kỳ, lệnh iptables/fail2ban), xuất ra endpoint HTTP cục bộ
+theo định dạng văn bản của Prometheus:
+
+    curl -s http://127.0.0.1:9105/metrics
+
+Chế độ --profile của daemon dùng Profiler để ghi snapshot cProfile định kỳ.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Giá trị đặt trực tiếp, hoặc hàm được gọi mỗi lần scrape (trả về số hoặc dict nhãn -> số)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), function=None):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+    def render(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+            if isinstance(value, dict):
+                items = sorted(((key if isinstance(key, tuple) else (key,)), v) for key, v in value.items())
+            else:
+                items = [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self.values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}        # nhãn -> [số đếm theo bucket..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self.series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', _number(bound)))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), function=None):
+        return self._register(Gauge(name, help_text, labels, function))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+def process_memory():
+    """RSS và bộ nhớ ảo của tiến trình (byte) từ /proc/self/status"""
+    values = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmSize:')):
+                    name, amount = line.split(':', 1)
+                    values[name] = int(amount.split()[0]) * 1024
+    except OSError:
+        pass
+    return values
+
+
+def register_process_metrics(registry):
+    started = time.time()
+    registry.gauge('process_resident_memory_bytes', "Bộ nhớ thường trú (RSS)",
+                   function=lambda: process_memory().get('VmRSS', 0))
+    registry.gauge('process_virtual_memory_bytes', "Bộ nhớ ảo",
+                   function=lambda: process_memory().get('VmSize', 0))
+    registry.gauge('process_start_time_seconds', "Thời điểm khởi động (unix)", function=lambda: started)
+    registry.gauge('process_cpu_seconds_total', "Thời gian CPU đã dùng",
+                   function=lambda: sum(os.times()[:2]))
+    registry.gauge('process_threads', "Số thread", function=threading.active_count)
+
+
+# ---- Endpoint HTTP ----
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """HTTP /metrics chạy trong thread nền (mặc định chỉ nghe trên localhost)"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9105):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.server.daemon_threads = True
+        self.server.registry = self.registry
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+# ---- Profile ----
+
+class Profiler:
+    """Bật cProfile quanh từng chu kỳ; mỗi `interval` giây ghi một snapshot
+    (.pstats để mở bằng snakeviz/pstats, kèm .txt top hàm theo cumulative) rồi đo lại từ đầu"""
+
+    def __init__(self, directory, interval=300, top=40):
+        self.directory = directory
+        self.interval = interval
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.profiled = False   # profile hiện tại đã được bật ít nhất một lần chưa
+        self.window_started = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def cycle(self):
+        self.profile.enable()
+        self.profiled = True
+        try:
+            yield
+        finally:
+            self.profile.disable()
+        if time.time() - self.window_started >= self.interval:
+            self.dump()
+
+    def dump(self):
+        """Ghi snapshot hiện tại; trả về đường dẫn file .pstats (None nếu chưa đo gì
+        từ lần ghi trước, ví dụ daemon dừng ngay sau một lần ghi định kỳ)"""
+        if not self.profiled:
+            return None
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(self.directory, f"profile-{stamp}.pstats")
+        self.profile.dump_stats(path)
+
+        text = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=text)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        with open(os.path.join(self.directory, f"profile-{stamp}.txt"), 'w') as f:
+            f.write(text.getvalue())
+
+        self.profile = cProfile.Profile()
+        self.profiled = False
+        self.window_started = time.time()
+        return path
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Phân tích địa chỉ IP dùng chung cho daemon, GUI và web dashboard: IPv4/IPv6 và
+CIDR -> số nguyên bằng một lần gọi inet_pton, có cache LRU cho địa chỉ hay gặp.
+
+Khóa IP (ip_key) là số nguyên 128 bit, IPv4 được ánh xạ vào ::ffff:0:0/96:
+'1.2.3.4' và '::ffff:1.2.3.4' cùng một khóa, và key.to_bytes(16, 'big') chính
+là dạng 16 byte MetricsStore lưu trên đĩa. Bộ đếm, tập hợp và whitelist dùng
+khóa này; chỉ đổi về chuỗi khi hiển thị, ghi log hoặc gọi iptables.
+"""
+
+import bisect
+import socket
+from functools import lru_cache
+
+V4_BASE = 0xffff << 32
+V4_MASK = 0xffffffff
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def ip_key(text):
+    """'1.2.3.4' / '2001:db8::1' -> khóa số nguyên; ValueError nếu không hợp lệ"""
+    try:
+        return V4_BASE | int.from_bytes(socket.inet_pton(socket.AF_INET, text), 'big')
+    except OSError:
+        pass
+    except TypeError:
+        raise ValueError(f"IP không hợp lệ: {text!r}")
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, text), 'big')
+    except OSError:
+        raise ValueError(f"IP không hợp lệ: {text!r}")
+
+
+def key_version(key):
+    return 4 if key >> 32 == 0xffff else 6
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def key_to_ip(key):
+    """Khóa số nguyên -> chuỗi IP chuẩn"""
+    if key >> 32 == 0xffff:
+        return socket.inet_ntoa((key & V4_MASK).to_bytes(4, 'big'))
+    return socket.inet_ntop(socket.AF_INET6, key.to_bytes(16, 'big'))
+
+
+def key_native(key):
+    """Khóa -> (version, số nguyên theo họ địa chỉ: 32 bit với IPv4)"""
+    if key >> 32 == 0xffff:
+        return 4, key & V4_MASK
+    return 6, key
+
+
+def native_key(version, value):
+    return V4_BASE | value if version == 4 else value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_network(text):
+    """'10.0.0.0/8', '1.2.3.4', '2001:db8::/32' -> (version, start, end, prefixlen)
+    theo họ địa chỉ (như ipaddress.ip_network(strict=False)); ValueError nếu sai"""
+    if not isinstance(text, str):
+        raise ValueError(f"Dải mạng không hợp lệ: {text!r}")
+    address, sep, length = text.strip().partition('/')
+    if ':' in address:
+        version, bits = 6, 128
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+        except OSError:
+            raise ValueError(f"IP không hợp lệ: {address!r}")
+    else:
+        version, bits = 4, 32
+        try:
+            value = int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+        except OSError:
+            raise ValueError(f"IP không hợp lệ: {address!r}")
+
+    if sep:
+        if not length.isdigit() or int(length) > bits:
+            raise ValueError(f"Độ dài prefix không hợp lệ: {text!r}")
+        prefixlen = int(length)
+    else:
+        prefixlen = bits
+    host_mask = (1 << (bits - prefixlen)) - 1
+    start = value & ~host_mask
+    return version, start, start | host_mask, prefixlen
+
+
+def format_network(version, start, prefixlen):
+    """(version, start, prefixlen) -> '10.0.0.0/8'"""
+    if version == 4:
+        address = socket.inet_ntoa(start.to_bytes(4, 'big'))
+    else:
+        address = socket.inet_ntop(socket.AF_INET6, start.to_bytes(16, 'big'))
+    return f"{address}/{prefixlen}"
+
+
+def network_key_range(text):
+    """Dải mạng -> (khóa đầu, khóa cuối) trong không gian ip_key"""
+    version, start, end, prefixlen = parse_network(text)
+    return native_key(version, start), native_key(version, end)
+
+
+def is_valid_ip(text, allow_network=False):
+    """IP (hoặc IP/CIDR nếu allow_network) hợp lệ, IPv4 hoặc IPv6"""
+    try:
+        if allow_network:
+            parse_network(text)
+        else:
+            ip_key(text.strip())
+        return True
+    except (ValueError, AttributeError):
+        return False
+
+
+# Prefix ngắn nhất được chặn thủ công: /0 hay /1 gõ nhầm sẽ chặn mọi kết nối vào máy (cả SSH)
+MIN_BLOCK_PREFIX = {4: 8, 6: 32}
+# Không bao giờ chặn loopback
+PROTECTED_NETWORKS = ('127.0.0.0/8', '::1')
+
+
+def check_block_network(text, whitelist=None):
+    """Kiểm tra IP/dải trước khi chặn thủ công; ValueError nêu lý do nếu không được chặn.
+
+    whitelist: NetworkSet các IP/dải không được chặn (dải giao với nó bị từ chối).
+    """
+    version, start, end, prefixlen = parse_network(text)
+    if prefixlen < MIN_BLOCK_PREFIX[version]:
+        raise ValueError(f"Dải {text} quá rộng (tối thiểu /{MIN_BLOCK_PREFIX[version]})")
+    if NetworkSet(PROTECTED_NETWORKS).overlaps(text):
+        raise ValueError(f"Dải {text} chứa địa chỉ loopback")
+    if whitelist is not None and whitelist.overlaps(text):
+        raise ValueError(f"Dải {text} chứa IP trong whitelist")
+
+
+# ---- Phân tích hàng loạt ----
+
+def ip_keys(texts):
+    """Danh sách chuỗi IP -> danh sách khóa (bỏ qua chuỗi không hợp lệ)"""
+    keys = []
+    for text in texts:
+        try:
+            keys.append(ip_key(text.strip()))
+        except (ValueError, AttributeError):
+            continue
+    return keys
+
+
+class NetworkSet:
+    """Tập các IP/dải mạng (whitelist): kiểm tra khóa IP bằng tìm nhị phân trên
+    các khoảng đã gộp"""
+
+    def __init__(self, networks=()):
+        self.invalid = []
+        spans = []
+        for text in networks:
+            try:
+                spans.append(network_key_range(text))
+            except ValueError:
+                self.invalid.append(text)
+        spans.sort()
+
+        self.starts, self.ends = [], []
+        for start, end in spans:
+            if self.ends and start <= self.ends[-1] + 1:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __contains__(self, value):
+        """value: khóa IP (int) hoặc chuỗi IP"""
+        if not isinstance(value, int):
+            try:
+                value = ip_key(value.strip())
+            except (ValueError, AttributeError):
+                return False
+        i = bisect.bisect_right(self.starts, value) - 1
+        return i >= 0 and self.ends[i] >= value
+
+    def overlaps(self, network):
+        """Dải mạng có giao với tập không"""
+        start, end = network_key_range(network)
+        i = bisect.bisect_right(self.starts, end) - 1
+        return i >= 0 and self.ends[i] >= start
+
+    def __len__(self):
+        return len(self.starts)
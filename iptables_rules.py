@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Phân tích rules iptables thành bản ghi có cấu trúc (có bộ đếm và tốc độ)
+"""
+
+import subprocess
+import threading
+import time
+
+# Lệnh theo phiên bản IP của địa chỉ/dải mạng cần chặn
+IPTABLES = {4: 'iptables', 6: 'ip6tables'}
+
+
+class Rule:
+    """Một rule iptables đã được phân tích từ iptables-save -c"""
+
+    __slots__ = (
+        'table', 'chain', 'num', 'spec', 'target', 'protocol', 'source',
+        'destination', 'in_iface', 'out_iface', 'dport', 'sport',
+        'packets', 'bytes', 'pps', 'bps', 'key'
+    )
+
+    def __init__(self, table, chain, num, spec, packets, bytes_):
+        self.table = table
+        self.chain = chain
+        self.num = num
+        self.spec = spec
+        self.packets = packets
+        self.bytes = bytes_
+        self.target = ''
+        self.protocol = 'all'
+        self.source = '0.0.0.0/0'
+        self.destination = '0.0.0.0/0'
+        self.in_iface = '*'
+        self.out_iface = '*'
+        self.dport = ''
+        self.sport = ''
+        self.pps = 0.0
+        self.bps = 0.0
+        self.key = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'key'}
+
+
+# Ánh xạ option iptables -> thuộc tính của Rule
+_OPTION_FIELDS = {
+    '-j': 'target',
+    '--jump': 'target',
+    '-p': 'protocol',
+    '--protocol': 'protocol',
+    '-s': 'source',
+    '--source': 'source',
+    '-d': 'destination',
+    '--destination': 'destination',
+    '-i': 'in_iface',
+    '--in-interface': 'in_iface',
+    '-o': 'out_iface',
+    '--out-interface': 'out_iface',
+    '--dport': 'dport',
+    '--destination-port': 'dport',
+    '--dports': 'dport',
+    '--sport': 'sport',
+    '--source-port': 'sport',
+    '--sports': 'sport',
+}
+
+SORT_FIELDS = ('num', 'chain', 'target', 'source', 'destination', 'protocol',
+               'packets', 'bytes', 'pps', 'bps')
+
+
+def parse_iptables_save(text):
+    """Phân tích output của `iptables-save -c` thành danh sách Rule"""
+    rules = []
+    table = 'filter'
+    positions = {}
+    occurrences = {}
+
+    for line in text.splitlines():
+        if not line or line[0] == '#':
+            continue
+        first = line[0]
+        if first == '*':
+            table = line[1:].strip()
+            continue
+        if first == ':' or line.startswith('COMMIT'):
+            continue
+
+        packets = bytes_ = 0
+        if first == '[':
+            end = line.find(']')
+            if end < 0:
+                continue
+            counters = line[1:end].split(':')
+            try:
+                packets, bytes_ = int(counters[0]), int(counters[1])
+            except (ValueError, IndexError):
+                pass
+            line = line[end + 1:].lstrip()
+
+        if not line.startswith('-A '):
+            continue
+
+        tokens = line.split()
+        chain = tokens[1]
+        spec = ' '.join(tokens[2:])
+        chain_key = (table, chain)
+        num = positions.get(chain_key, 0) + 1
+        positions[chain_key] = num
+
+        rule = Rule(table, chain, num, spec, packets, bytes_)
+
+        negate = False
+        i = 2
+        while i < len(tokens):
+            token = tokens[i]
+            if token == '!':
+                negate = True
+                i += 1
+                continue
+            field = _OPTION_FIELDS.get(token)
+            if field and i + 1 < len(tokens):
+                value = tokens[i + 1]
+                setattr(rule, field, '!' + value if negate else value)
+                i += 2
+            else:
+                i += 1
+            negate = False
+
+        # Khóa ổn định để so sánh giữa hai lần lấy mẫu (vị trí rule có thể dịch chuyển)
+        ident = (table, chain, spec)
+        occurrence = occurrences.get(ident, 0)
+        occurrences[ident] = occurrence + 1
+        rule.key = (table, chain, spec, occurrence)
+
+        rules.append(rule)
+
+    return rules
+
+
+class RulesCache:
+    """Cache các rule đã phân tích và tính tốc độ gói/byte giữa hai lần lấy mẫu"""
+
+    def __init__(self, max_age=2.0):
+        self.max_age = max_age
+        self.rules = []
+        self.sampled_at = 0.0
+        self._previous = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Đọc lại iptables-save -c và cập nhật tốc độ"""
+        result = subprocess.run(
+            ['iptables-save', '-c'],
+            capture_output=True, text=True, check=True
+        )
+        self.load(result.stdout, time.time())
+
+    def load(self, text, now):
+        """Nạp một mẫu iptables-save -c tại thời điểm now"""
+        rules = parse_iptables_save(text)
+
+        with self._lock:
+            elapsed = now - self.sampled_at if self.sampled_at else 0.0
+            previous = self._previous
+            current = {}
+
+            for rule in rules:
+                prev = previous.get(rule.key)
+                if prev and elapsed > 0:
+                    prev_packets, prev_bytes = prev
+                    # Bộ đếm bị reset (iptables -Z) thì bỏ qua mẫu này
+                    if rule.packets >= prev_packets and rule.bytes >= prev_bytes:
+                        rule.pps = (rule.packets - prev_packets) / elapsed
+                        rule.bps = (rule.bytes - prev_bytes) / elapsed
+                current[rule.key] = (rule.packets, rule.bytes)
+
+            self.rules = rules
+            self._previous = current
+            self.sampled_at = now
+
+    def get_rules(self):
+        """Trả về snapshot rules, làm mới nếu cache đã cũ"""
+        if time.time() - self.sampled_at > self.max_age:
+            self.refresh()
+        return self.rules
+
+    def query(self, chain=None, table=None, target=None, search=None,
+              sort='num', descending=False, page=1, per_page=100):
+        """Lọc, sắp xếp và phân trang rules phía server"""
+        rules = self.get_rules()
+
+        if table:
+            rules = [r for r in rules if r.table == table]
+        if chain:
+            rules = [r for r in rules if r.chain == chain]
+        if target:
+            rules = [r for r in rules if r.target == target]
+        if search:
+            rules = [r for r in rules if search in r.spec]
+
+        if sort not in SORT_FIELDS:
+            sort = 'num'
+        if sort == 'num':
+            rules = sorted(rules, key=lambda r: (r.table, r.chain, r.num), reverse=descending)
+        else:
+            rules = sorted(rules, key=lambda r: getattr(r, sort), reverse=descending)
+
+        page = max(1, page)
+        per_page = max(1, min(per_page, 1000))
+        start = (page - 1) * per_page
+
+        return {
+            'total': len(rules),
+            'page': page,
+            'per_page': per_page,
+            'sampled_at': self.sampled_at,
+            'rules': [r.to_dict() for r in rules[start:start + per_page]]
+        }
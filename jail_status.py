@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Dịch vụ lấy trạng thái mọi jail fail2ban: truy vấn song song (pool giới hạn),
+cache ngắn hạn và gộp các yêu cầu làm mới đồng thời thành một lần lấy duy nhất
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from fail2ban_client import Fail2BanClient, SOCKET_PATH
+
+# Thời gian sống của kết quả trong cache (giây)
+DEFAULT_TTL = 5.0
+# Số truy vấn jail chạy đồng thời (mỗi truy vấn dùng một kết nối socket riêng)
+DEFAULT_WORKERS = 8
+
+
+class JailSnapshot:
+    """Trạng thái mọi jail tại một thời điểm; dùng chung cho cả hai bảng của tab"""
+
+    __slots__ = ('jails', 'bans', 'errors', 'fetched_at', 'duration')
+
+    def __init__(self, jails, bans, errors, fetched_at, duration):
+        self.jails = jails          # [JailStatus]
+        self.bans = bans            # [BanEntry] của mọi jail
+        self.errors = errors        # {jail: thông báo lỗi}
+        self.fetched_at = fetched_at
+        self.duration = duration
+
+
+class JailStatusService:
+    def __init__(self, path=SOCKET_PATH, ttl=DEFAULT_TTL, max_workers=DEFAULT_WORKERS):
+        self.path = path
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jail-status')
+
+        # Các kết nối rảnh, tái sử dụng giữa các lần lấy
+        self.clients = queue.LifoQueue()
+        self.snapshot = None
+        self._inflight = None
+        # Tăng mỗi lần invalidate(): kết quả của lần lấy bắt đầu trước đó đã cũ
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    # ---- Kết nối ----
+
+    def _acquire_client(self):
+        try:
+            return self.clients.get_nowait()
+        except queue.Empty:
+            return Fail2BanClient(self.path)
+
+    def _release_client(self, client):
+        if self.clients.qsize() < self.max_workers:
+            self.clients.put(client)
+        else:
+            client.close()
+
+    def _call(self, fn):
+        client = self._acquire_client()
+        try:
+            return fn(client)
+        finally:
+            self._release_client(client)
+
+    # ---- Lấy dữ liệu ----
+
+    def _fetch_jail(self, jail):
+        def query(client):
+            return client.jail_status(jail), client.banned_with_time(jail)
+        return self._call(query)
+
+    def _fetch(self):
+        started = time.time()
+        jail_names = self._call(lambda client: client.jails())
+
+        futures = [(jail, self.pool.submit(self._fetch_jail, jail)) for jail in jail_names]
+        jails, bans, errors = [], [], {}
+        for jail, future in futures:
+            try:
+                status, entries = future.result()
+            except Exception as e:
+                errors[jail] = str(e)
+                continue
+            jails.append(status)
+            bans.extend(entries)
+
+        finished = time.time()
+        return JailSnapshot(jails, bans, errors, finished, finished - started)
+
+    def get(self, max_age=None):
+        """Trả về JailSnapshot (chặn tới khi có kết quả).
+
+        Dùng cache nếu chưa cũ hơn max_age (mặc định: ttl); nếu đang có một lần
+        lấy khác chạy thì chờ chung kết quả đó thay vì gửi truy vấn mới.
+        """
+        max_age = self.ttl if max_age is None else max_age
+
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is not None and time.time() - snapshot.fetched_at <= max_age:
+                return snapshot
+
+            future = self._inflight
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight = future
+                generation = self.generation
+
+        if not owner:
+            return future.result()
+
+        try:
+            snapshot = self._fetch()
+        except BaseException as e:
+            with self._lock:
+                if self._inflight is future:
+                    self._inflight = None
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            # Bị invalidate() khi đang lấy (ví dụ vừa gỡ ban): không lưu kết quả cũ vào cache
+            if self.generation == generation:
+                self.snapshot = snapshot
+            if self._inflight is future:
+                self._inflight = None
+        future.set_result(snapshot)
+        return snapshot
+
+    def invalidate(self):
+        """Bỏ cache (sau khi ban/gỡ ban); lần lấy đang chạy không được dùng chung nữa"""
+        with self._lock:
+            self.generation += 1
+            self.snapshot = None
+            self._inflight = None
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+        while True:
+            try:
+                self.clients.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_service():
+    """Dịch vụ dùng chung trong tiến trình"""
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = JailStatusService()
+        return _default_service
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Trình xem log dung lượng lớn: mmap file, chỉ mục offset dòng xây dựng tăng dần,
+chỉ hiển thị các dòng đang nhìn thấy và tìm kiếm trong nền theo từng khối
+"""
+
+import bisect
+import mmap
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from array import array
+from tkinter import ttk
+
+from file_tailer import InotifyWatcher
+
+# Số byte lập chỉ mục mỗi lượt (để thread nền nhả GIL thường xuyên)
+INDEX_CHUNK = 4 * 1024 * 1024
+SEARCH_CHUNK = 4 * 1024 * 1024
+MAX_SEARCH_RESULTS = 100000
+POLL_MS = 200
+FOLLOW_INTERVAL = 1.0
+
+
+class LineIndex:
+    """Offset đầu mỗi dòng của một file, cập nhật tăng dần khi file lớn lên"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('Q', [0])
+        self.indexed_to = 0
+        self.size = 0
+        self.map = None
+        self._file = None
+        self._inode = None
+        self.lock = threading.Lock()
+
+    def _reset(self):
+        self.offsets = array('Q', [0])
+        self.indexed_to = 0
+        self.size = 0
+        self.map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def update(self, max_bytes=INDEX_CHUNK):
+        """Ánh xạ lại file nếu lớn lên và lập chỉ mục thêm tối đa max_bytes.
+
+        Trả về True nếu vẫn còn phần chưa được lập chỉ mục.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            with self.lock:
+                self._reset()
+            return False
+
+        with self.lock:
+            inode = (st.st_dev, st.st_ino)
+            if inode != self._inode or st.st_size < self.size:
+                # Log bị xoay vòng hoặc cắt ngắn: lập chỉ mục lại từ đầu
+                self._reset()
+                self._inode = inode
+
+            if st.st_size > self.size:
+                if self._file is None:
+                    self._file = open(self.path, 'rb')
+                # mmap cũ không đóng ngay vì thread UI có thể đang đọc nó
+                self.map = mmap.mmap(self._file.fileno(), st.st_size, access=mmap.ACCESS_READ)
+                self.size = st.st_size
+
+            data = self.map
+            start = self.indexed_to
+            end = min(self.size, start + max_bytes)
+
+        if data is None or start >= end:
+            return False
+
+        offsets = array('Q')
+        position = data.find(b'\n', start, end)
+        while position != -1:
+            offsets.append(position + 1)
+            position = data.find(b'\n', position + 1, end)
+
+        with self.lock:
+            if self.map is data:
+                self.offsets.extend(offsets)
+                self.indexed_to = end
+            return self.indexed_to < self.size
+
+    def line_count(self):
+        """Số dòng đã được lập chỉ mục (tính cả dòng cuối chưa có '\\n')"""
+        count = len(self.offsets)
+        if self.offsets[-1] >= self.indexed_to:
+            count -= 1
+        return count
+
+    def get_lines(self, first, count):
+        with self.lock:
+            data = self.map
+            offsets = self.offsets
+            indexed_to = self.indexed_to
+        if data is None:
+            return []
+
+        lines = []
+        total = len(offsets)
+        for number in range(first, min(first + count, total)):
+            start = offsets[number]
+            end = offsets[number + 1] if number + 1 < total else indexed_to
+            if start >= end:
+                break
+            lines.append(data[start:end].rstrip(b'\r\n').decode('utf-8', 'replace'))
+        return lines
+
+    def line_of(self, offset):
+        """Số thứ tự dòng chứa byte offset (tìm nhị phân)"""
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+
+class LogSearch:
+    """Tìm chuỗi con hoặc regex trong file đã mmap, chạy trong thread nền"""
+
+    def __init__(self, index, pattern, use_regex, results):
+        self.index = index
+        self.results = results
+        self.cancelled = threading.Event()
+        if use_regex:
+            self.regex = re.compile(pattern.encode('utf-8'), re.MULTILINE)
+            self.needle = None
+        else:
+            self.regex = None
+            self.needle = pattern.encode('utf-8')
+
+    def run(self):
+        with self.index.lock:
+            data = self.index.map
+            end = self.index.indexed_to
+        found = 0
+        last_line = -1
+        position = 0
+
+        while data is not None and position < end and not self.cancelled.is_set():
+            chunk_end = min(end, position + SEARCH_CHUNK)
+            lines = []
+            if self.needle is not None:
+                # mmap.find chạy bằng C, không cần copy dữ liệu
+                hit = data.find(self.needle, position, chunk_end + len(self.needle) - 1)
+                while hit != -1 and hit < chunk_end:
+                    lines.append(self.index.line_of(hit))
+                    hit = data.find(self.needle, hit + 1, chunk_end + len(self.needle) - 1)
+            else:
+                # Regex chạy trên khối dòng hoàn chỉnh
+                block_end = data.rfind(b'\n', position, chunk_end) + 1 if chunk_end < end else end
+                if block_end <= position:
+                    block_end = chunk_end
+                for match in self.regex.finditer(data[position:block_end]):
+                    lines.append(self.index.line_of(position + match.start()))
+                chunk_end = block_end
+
+            unique = [line for line in lines if line != last_line]
+            unique = sorted(set(unique))
+            if unique:
+                last_line = unique[-1]
+                found += len(unique)
+                self.results.put(('lines', unique))
+                if found >= MAX_SEARCH_RESULTS:
+                    break
+            self.results.put(('progress', chunk_end / end if end else 1.0))
+            position = chunk_end
+
+        self.results.put(('done', found))
+
+
+class LogViewer(ttk.Frame):
+    """Widget xem log: chỉ render các dòng đang hiển thị"""
+
+    def __init__(self, parent, path, visible_lines=30):
+        super().__init__(parent)
+        self.path = path
+        self.index = LineIndex(path)
+        self.visible_lines = visible_lines
+        self.top_line = 0
+        self.follow = tk.BooleanVar(value=True)
+        self.matches = []
+        self.match_cursor = -1
+        self.search = None
+        self.search_results = queue.Queue()
+        self._rendered = None
+        self.search_status = ""
+        self._closed = threading.Event()
+
+        self.create_widgets()
+        threading.Thread(target=self.index_loop, daemon=True).start()
+        self.after(POLL_MS, self.poll)
+        self.bind('<Destroy>', lambda e: self._closed.set() if e.widget is self else None)
+
+    def create_widgets(self):
+        # Thanh tìm kiếm
+        search_frame = ttk.Frame(self)
+        search_frame.pack(fill=tk.X, pady=(0, 5))
+
+        self.search_var = tk.StringVar()
+        entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        entry.bind('<Return>', lambda e: self.start_search())
+
+        self.regex_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(search_frame, text="Regex", variable=self.regex_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(search_frame, text="Tìm", command=self.start_search).pack(side=tk.LEFT)
+        ttk.Button(search_frame, text="Trước", command=lambda: self.jump_match(-1)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(search_frame, text="Sau", command=lambda: self.jump_match(1)).pack(side=tk.LEFT, padx=2)
+        ttk.Checkbutton(search_frame, text="Theo dõi", variable=self.follow).pack(side=tk.LEFT, padx=5)
+
+        self.info_var = tk.StringVar(value="Đang lập chỉ mục...")
+        ttk.Label(self, textvariable=self.info_var).pack(fill=tk.X)
+
+        # Vùng hiển thị
+        view_frame = ttk.Frame(self)
+        view_frame.pack(fill=tk.BOTH, expand=True)
+
+        self.text = tk.Text(view_frame, wrap=tk.NONE, height=self.visible_lines)
+        self.text.tag_configure('match', background='yellow')
+        self.scrollbar = ttk.Scrollbar(view_frame, orient=tk.VERTICAL, command=self.on_scroll)
+        xscroll = ttk.Scrollbar(view_frame, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.config(xscrollcommand=xscroll.set)
+
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        xscroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.text.bind('<MouseWheel>', lambda e: self.scroll_lines(-3 if e.delta > 0 else 3))
+        self.text.bind('<Button-4>', lambda e: self.scroll_lines(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll_lines(3))
+        self.text.bind('<Configure>', self.on_resize)
+
+    # ---- Lập chỉ mục (thread nền) ----
+
+    def index_loop(self):
+        watcher = InotifyWatcher(self.path)
+        try:
+            while not self._closed.is_set():
+                try:
+                    more = self.index.update()
+                except (OSError, ValueError) as e:
+                    print(f"Lỗi lập chỉ mục log: {e}")
+                    more = False
+                if not more:
+                    # Chờ file thay đổi (inotify) thay vì đọc lại liên tục
+                    watcher.wait(FOLLOW_INTERVAL)
+        finally:
+            watcher.close()
+
+    # ---- Cuộn ----
+
+    def on_resize(self, event):
+        line_height = max(1, self.text.tk.call('font', 'metrics', self.text.cget('font'), '-linespace'))
+        self.visible_lines = max(1, event.height // line_height)
+        self.render()
+
+    def max_top(self):
+        return max(0, self.index.line_count() - self.visible_lines)
+
+    def scroll_to(self, line):
+        self.top_line = max(0, min(int(line), self.max_top()))
+        # Người dùng cuộn lên thì tạm dừng theo dõi
+        self.follow.set(self.top_line >= self.max_top())
+        self.render()
+        return 'break'
+
+    def scroll_lines(self, delta):
+        return self.scroll_to(self.top_line + delta)
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(float(amount) * self.index.line_count())
+        elif unit == 'pages':
+            self.scroll_lines(int(amount) * self.visible_lines)
+        else:
+            self.scroll_lines(int(amount))
+
+    # ---- Hiển thị ----
+
+    def render(self):
+        total = self.index.line_count()
+        key = (self.top_line, self.visible_lines, total if self.top_line + self.visible_lines > total else None,
+               self.match_cursor)
+        if key == self._rendered:
+            return
+        self._rendered = key
+
+        lines = self.index.get_lines(self.top_line, self.visible_lines)
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.insert(tk.END, '\n'.join(lines))
+
+        if 0 <= self.match_cursor < len(self.matches):
+            row = self.matches[self.match_cursor] - self.top_line
+            if 0 <= row < len(lines):
+                self.text.tag_add('match', f'{row + 1}.0', f'{row + 1}.end')
+        self.text.config(state=tk.DISABLED)
+
+        if total:
+            self.scrollbar.set(self.top_line / total, min(1.0, (self.top_line + self.visible_lines) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def poll(self):
+        """Chạy trên main loop: cập nhật theo dữ liệu mới và kết quả tìm kiếm"""
+        if self._closed.is_set():
+            return
+
+        if self.follow.get():
+            self.top_line = self.max_top()
+
+        searching = self.drain_search_results()
+        total = self.index.line_count()
+        size_mb = self.index.size / (1024 * 1024)
+        status = f"{total} dòng ({size_mb:.1f} MB)"
+        if self.index.indexed_to < self.index.size:
+            status += f" - đang lập chỉ mục {self.index.indexed_to * 100 // max(1, self.index.size)}%"
+        if searching:
+            status += f" - {searching}"
+        self.info_var.set(status)
+
+        self.render()
+        self.after(POLL_MS, self.poll)
+
+    # ---- Tìm kiếm ----
+
+    def start_search(self):
+        pattern = self.search_var.get()
+        if self.search is not None:
+            self.search.cancelled.set()
+        self.search_results = queue.Queue()
+        self.matches = []
+        self.match_cursor = -1
+        self.search_status = ""
+        if not pattern:
+            return
+
+        try:
+            self.search = LogSearch(self.index, pattern, self.regex_var.get(), self.search_results)
+        except re.error as e:
+            self.search = None
+            self.search_status = f"Regex không hợp lệ: {e}"
+            return
+        self.search_status = "Đang tìm..."
+        threading.Thread(target=self.search.run, daemon=True).start()
+
+    def drain_search_results(self):
+        while True:
+            try:
+                kind, value = self.search_results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'lines':
+                self.matches.extend(value)
+                if self.match_cursor < 0:
+                    self.jump_match(1)
+            elif kind == 'progress':
+                self.search_status = f"Đang tìm {value * 100:.0f}% - {len(self.matches)} kết quả"
+            elif kind == 'done':
+                self.search_status = f"{len(self.matches)} kết quả"
+        return self.search_status
+
+    def jump_match(self, step):
+        if not self.matches:
+            return
+        self.match_cursor = (self.match_cursor + step) % len(self.matches)
+        self.follow.set(False)
+        self.top_line = max(0, min(self.matches[self.match_cursor] - self.visible_lines // 2, self.max_top()))
+        self.render()
@@ -1,25 +1,44 @@
+import time
+
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import subprocess
 import os
 import sys
 
-# Import các tab mới
-from auto_block_tab import AutoBlockTab
-from statistics_tab import StatisticsTab
-from fail2ban_tab import Fail2BanTab
+from gui_worker import get_worker, BusyIndicator
+from dashboard_state import DashboardState
+from control_socket import (ControlClient, ControlError, validate_config,
+                            load_config_file, save_config_file, CONFIG_FILE)
+
+# Các tab nặng (matplotlib, fail2ban-client) chỉ được import khi người dùng mở tab đó,
+# xem add_lazy_tab()
+
+# Mục tiêu thời gian tới lần vẽ đầu tiên (ms)
+STARTUP_TARGET_MS = 500
 
 class FirewallGUI:
-    def __init__(self, root):
+    def __init__(self, root, check_root=True):
         self.root = root
         self.root.title("Firewall Management System - PBL4")
         self.root.geometry("1200x800")
         
+        # Tab nào chưa được tạo: frame -> hàm dựng
+        self.pending_tabs = {}
+        
+        # Pool dùng chung cho mọi lệnh subprocess của GUI
+        self.worker = get_worker(root)
+        self.dashboard_state = DashboardState(root, self.worker)
+        
         # Kiểm tra quyền root
-        self.check_root_privileges()
+        if check_root:
+            self.check_root_privileges()
         
         # Tạo giao diện
         self.setup_gui()
+        self.dashboard_state.start()
         
         # Kiểm tra dependencies
         self.check_dependencies()
@@ -35,33 +54,36 @@ class FirewallGUI:
             sys.exit(1)
     
     def check_dependencies(self):
-        """Kiểm tra các dependencies cần thiết"""
-        missing_deps = []
-        
-        # Kiểm tra iptables
-        try:
-            subprocess.run(['iptables', '--version'], capture_output=True, check=True)
-        except:
-            missing_deps.append("iptables")
-        
-        # Kiểm tra fail2ban
-        try:
-            subprocess.run(['fail2ban-client', '--version'], capture_output=True, check=True)
-        except:
-            missing_deps.append("fail2ban")
+        """Kiểm tra các dependencies cần thiết (song song, trong nền)"""
+        checks = {
+            'iptables': ['iptables', '--version'],
+            'fail2ban': ['fail2ban-client', '--version'],
+            'iproute2': ['ss', '-h'],
+        }
+        results = {}
         
-        # Kiểm tra ss
-        try:
-            subprocess.run(['ss', '-h'], capture_output=True, check=True)
-        except:
-            missing_deps.append("iproute2")
-        
-        if missing_deps:
-            messagebox.showwarning(
-                "Thiếu Dependencies",
-                f"Các công cụ sau chưa được cài đặt: {', '.join(missing_deps)}\n\n"
-                "Một số tính năng có thể không hoạt động."
-            )
+        def command_works(command):
+            try:
+                subprocess.run(command, capture_output=True, check=True)
+                return True
+            except:
+                return False
+        
+        def on_result(name, ok):
+            results[name] = ok
+            if len(results) < len(checks):
+                return
+            missing_deps = [dep for dep in checks if not results[dep]]
+            if missing_deps:
+                messagebox.showwarning(
+                    "Thiếu Dependencies",
+                    f"Các công cụ sau chưa được cài đặt: {', '.join(missing_deps)}\n\n"
+                    "Một số tính năng có thể không hoạt động."
+                )
+        
+        for name, command in checks.items():
+            self.worker.submit(command_works, command,
+                               on_done=lambda ok, name=name: on_result(name, ok))
     
     def setup_gui(self):
         """Thiết lập giao diện chính"""
@@ -69,17 +91,39 @@ class FirewallGUI:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Tạo các tab
+        # Tạo các tab (tab nặng chỉ được dựng khi được chọn lần đầu)
         self.setup_dashboard_tab()
         self.setup_firewall_tab()
         self.setup_auto_block_tab()
         self.setup_statistics_tab()
         self.setup_fail2ban_tab()
         self.setup_settings_tab()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
         
         # Status bar
         self.setup_status_bar()
     
+    def add_lazy_tab(self, text, builder):
+        """Thêm tab rỗng; builder(frame) chỉ chạy khi tab được chọn lần đầu"""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=text)
+        self.pending_tabs[str(frame)] = (frame, builder)
+        return frame
+    
+    def on_tab_changed(self, event):
+        """Dựng tab khi người dùng mở nó lần đầu"""
+        self.build_tab(self.notebook.select())
+    
+    def build_tab(self, tab_id):
+        pending = self.pending_tabs.pop(str(tab_id), None)
+        if pending is None:
+            return
+        frame, builder = pending
+        self.status_var.set("Đang tải...")
+        self.root.update_idletasks()
+        builder(frame)
+        self.status_var.set("Sẵn sàng")
+    
     def setup_dashboard_tab(self):
         """Tab Dashboard tổng quan"""
         dashboard_frame = ttk.Frame(self.notebook)
@@ -100,28 +144,39 @@ class FirewallGUI:
             text="Làm Mới Tất Cả", 
             command=self.refresh_all
         ).pack(side=tk.RIGHT)
+        BusyIndicator(header_frame, self.worker, 'main', side=tk.RIGHT, padx=5)
         
         # Statistics cards
         stats_frame = ttk.Frame(dashboard_frame)
         stats_frame.pack(fill=tk.X, padx=10, pady=10)
         
+        # Các card gắn với DashboardState: chỉ cập nhật khi giá trị đổi
+        state = self.dashboard_state
+        
         # Card 1: Tổng số IP bị chặn
         card1 = ttk.LabelFrame(stats_frame, text="IP Bị Chặn")
         card1.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        ttk.Label(card1, text="0", font=('Arial', 24, 'bold')).pack(pady=20)
+        blocked_label = ttk.Label(card1, text="0", font=('Arial', 24, 'bold'))
+        blocked_label.pack(pady=20)
         ttk.Label(card1, text="Tổng số IP đang bị chặn").pack(pady=5)
+        state.subscribe('blocked_count', lambda value: blocked_label.config(text=str(value)))
         
         # Card 2: Cảnh báo hôm nay
         card2 = ttk.LabelFrame(stats_frame, text="Cảnh Báo Hôm Nay")
         card2.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        ttk.Label(card2, text="0", font=('Arial', 24, 'bold')).pack(pady=20)
+        alerts_label = ttk.Label(card2, text="0", font=('Arial', 24, 'bold'))
+        alerts_label.pack(pady=20)
         ttk.Label(card2, text="Số cảnh báo trong ngày").pack(pady=5)
+        state.subscribe('alerts_today', lambda value: alerts_label.config(text=str(value)))
         
         # Card 3: Trạng thái tự động chặn
         card3 = ttk.LabelFrame(stats_frame, text="Tự Động Chặn")
         card3.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
-        ttk.Label(card3, text="TẮT", font=('Arial', 24, 'bold'), foreground='red').pack(pady=20)
+        auto_block_label = ttk.Label(card3, text="TẮT", font=('Arial', 24, 'bold'), foreground='red')
+        auto_block_label.pack(pady=20)
         ttk.Label(card3, text="Trạng thái tự động chặn").pack(pady=5)
+        state.subscribe('auto_block_active', lambda active: auto_block_label.config(
+            text="BẬT" if active else "TẮT", foreground='green' if active else 'red'))
         
         # Recent alerts
         alerts_frame = ttk.LabelFrame(dashboard_frame, text="Cảnh Báo Gần Đây")
@@ -136,6 +191,15 @@ class FirewallGUI:
         alerts_text.insert(tk.END, "Chưa có cảnh báo nào...\n")
         alerts_text.config(state=tk.DISABLED)
         
+        def show_recent_alerts(alerts):
+            alerts_text.config(state=tk.NORMAL)
+            alerts_text.delete(1.0, tk.END)
+            for alert in reversed(alerts):  # Mới nhất ở trên
+                alerts_text.insert(tk.END, alert + "\n")
+            alerts_text.config(state=tk.DISABLED)
+        
+        state.subscribe('recent_alerts', show_recent_alerts)
+        
         # Quick actions
         actions_frame = ttk.LabelFrame(dashboard_frame, text="Hành Động Nhanh")
         actions_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -148,30 +212,32 @@ class FirewallGUI:
                   command=self.view_logs).pack(side=tk.LEFT, padx=5)
     
     def setup_firewall_tab(self):
-        """Tab quản lý firewall cơ bản (giữ nguyên từ code cũ)"""
-        firewall_frame = ttk.Frame(self.notebook)
-        self.notebook.add(firewall_frame, text="Firewall")
-        
-        # ... (giữ nguyên code firewall tab hiện tại của bạn)
-        ttk.Label(firewall_frame, text="Firewall Management - Giữ nguyên từ code hiện tại").pack(pady=20)
+        """Tab quản lý firewall: bảng rules iptables có tốc độ theo từng rule"""
+        def build(frame):
+            from rules_browser import RulesBrowser
+            self.rules_browser = RulesBrowser(frame)
+        self.add_lazy_tab("Firewall", build)
     
     def setup_auto_block_tab(self):
         """Tab tự động chặn"""
-        auto_block_frame = ttk.Frame(self.notebook)
-        self.notebook.add(auto_block_frame, text="Tự Động Chặn")
-        self.auto_block_tab = AutoBlockTab(auto_block_frame)
+        def build(frame):
+            from auto_block_tab import AutoBlockTab
+            self.auto_block_tab = AutoBlockTab(frame)
+        self.add_lazy_tab("Tự Động Chặn", build)
     
     def setup_statistics_tab(self):
         """Tab thống kê"""
-        stats_frame = ttk.Frame(self.notebook)
-        self.notebook.add(stats_frame, text="Thống Kê")
-        self.stats_tab = StatisticsTab(stats_frame)
+        def build(frame):
+            from statistics_tab import StatisticsTab  # Kéo theo matplotlib
+            self.stats_tab = StatisticsTab(frame)
+        self.add_lazy_tab("Thống Kê", build)
     
     def setup_fail2ban_tab(self):
         """Tab Fail2Ban"""
-        fail2ban_frame = ttk.Frame(self.notebook)
-        self.notebook.add(fail2ban_frame, text="Fail2Ban")
-        self.fail2ban_tab = Fail2BanTab(fail2ban_frame)
+        def build(frame):
+            from fail2ban_tab import Fail2BanTab
+            self.fail2ban_tab = Fail2BanTab(frame)
+        self.add_lazy_tab("Fail2Ban", build)
     
     def setup_settings_tab(self):
         """Tab cài đặt"""
@@ -182,14 +248,30 @@ class FirewallGUI:
         general_frame = ttk.LabelFrame(settings_frame, text="Cấu Hình Chung")
         general_frame.pack(fill=tk.X, padx=10, pady=10)
         
+        # Kênh thông báo của daemon (notifier.py), lưu cùng file cấu hình auto-block
         ttk.Label(general_frame, text="Địa chỉ Email nhận cảnh báo:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
-        email_var = tk.StringVar(value="admin@example.com")
-        ttk.Entry(general_frame, textvariable=email_var, width=30).grid(row=0, column=1, padx=5, pady=2)
+        self.notify_email_var = tk.StringVar()
+        ttk.Entry(general_frame, textvariable=self.notify_email_var, width=30).grid(row=0, column=1, padx=5, pady=2)
+        
+        ttk.Label(general_frame, text="Webhook (URL):").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        self.notify_webhook_var = tk.StringVar()
+        ttk.Entry(general_frame, textvariable=self.notify_webhook_var, width=30).grid(row=1, column=1, padx=5, pady=2)
+        
+        self.notify_syslog_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(general_frame, text="Ghi thông báo vào syslog",
+                        variable=self.notify_syslog_var).grid(row=2, column=1, sticky=tk.W, padx=5, pady=2)
         
-        ttk.Label(general_frame, text="Log Level:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        ttk.Label(general_frame, text="Gộp cảnh báo mỗi (giây):").grid(row=3, column=0, sticky=tk.W, padx=5, pady=2)
+        self.notify_window_var = tk.StringVar(value="30")
+        ttk.Entry(general_frame, textvariable=self.notify_window_var, width=10).grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
+        
+        ttk.Button(general_frame, text="Gửi Thử", command=self.send_test_notification).grid(
+            row=4, column=1, sticky=tk.W, padx=5, pady=2)
+        
+        ttk.Label(general_frame, text="Log Level:").grid(row=5, column=0, sticky=tk.W, padx=5, pady=2)
         log_level = ttk.Combobox(general_frame, values=['DEBUG', 'INFO', 'WARNING', 'ERROR'], state='readonly')
         log_level.set('INFO')
-        log_level.grid(row=1, column=1, padx=5, pady=2)
+        log_level.grid(row=5, column=1, padx=5, pady=2)
         
         # Tự động khởi động
         startup_frame = ttk.LabelFrame(settings_frame, text="Tự Động Khởi Động")
@@ -204,6 +286,9 @@ class FirewallGUI:
         
         # Nút lưu cài đặt
         ttk.Button(settings_frame, text="Lưu Cài Đặt", command=self.save_settings).pack(pady=10)
+        
+        self.control = ControlClient()
+        self.load_settings()
     
     def setup_status_bar(self):
         """Thanh trạng thái"""
@@ -214,12 +299,25 @@ class FirewallGUI:
         ttk.Label(status_frame, textvariable=self.status_var).pack(side=tk.LEFT, padx=5)
         
         ttk.Label(status_frame, text="PBL4 - Linux Firewall System").pack(side=tk.RIGHT, padx=5)
+        
+        # Thời gian main thread bị chặn (mục tiêu < 16 ms)
+        self.ui_lag_var = tk.StringVar(value="")
+        ttk.Label(status_frame, textvariable=self.ui_lag_var).pack(side=tk.RIGHT, padx=5)
+        self.update_ui_lag()
+    
+    def update_ui_lag(self):
+        """Hiển thị độ trễ lớn nhất của main loop trong thời gian gần đây"""
+        lag_ms, callback_ms = self.worker.blocking_stats()
+        self.ui_lag_var.set(f"UI trễ tối đa: {lag_ms:.0f} ms")
+        self.root.after(2000, self.update_ui_lag)
     
     def refresh_all(self):
-        """Làm mới tất cả tab"""
+        """Làm mới tất cả tab (các tab tự chạy nền, không chặn giao diện)"""
         self.status_var.set("Đang làm mới dữ liệu...")
         
         # Làm mới từng tab
+        self.dashboard_state.refresh()
+        
         if hasattr(self, 'auto_block_tab'):
             self.auto_block_tab.check_service_status()
         
@@ -229,37 +327,23 @@ class FirewallGUI:
         if hasattr(self, 'fail2ban_tab'):
             self.fail2ban_tab.refresh_status()
         
-        self.status_var.set("Đã làm mới dữ liệu")
-        messagebox.showinfo("Thành công", "Đã làm mới tất cả dữ liệu")
+        if hasattr(self, 'rules_browser'):
+            self.rules_browser.sample()
+        
+        def done():
+            self.status_var.set("Đã làm mới dữ liệu")
+            messagebox.showinfo("Thành công", "Đã làm mới tất cả dữ liệu")
+        
+        self.worker.when_idle(['main', 'firewall', 'auto_block', 'statistics', 'fail2ban'], done)
     
     def show_iptables_rules(self):
-        """Hiển thị rules iptables"""
-        try:
-            result = subprocess.run(
-                ['iptables', '-L', '-n', '-v'],
-                capture_output=True, text=True
-            )
-            
-            # Tạo cửa sổ mới để hiển thị rules
-            rules_window = tk.Toplevel(self.root)
-            rules_window.title("IPTables Rules")
-            rules_window.geometry("800x600")
-            
-            text_widget = tk.Text(rules_window, wrap=tk.NONE)
-            scrollbar_y = ttk.Scrollbar(rules_window, orient=tk.VERTICAL, command=text_widget.yview)
-            scrollbar_x = ttk.Scrollbar(rules_window, orient=tk.HORIZONTAL, command=text_widget.xview)
-            
-            text_widget.config(yscrollcommand=scrollbar_y.set, xscrollcommand=scrollbar_x.set)
-            
-            text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-            scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-            
-            text_widget.insert(tk.END, result.stdout)
-            text_widget.config(state=tk.DISABLED)
-            
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể lấy rules: {e}")
+        """Hiển thị rules iptables (bảng phân trang, không dump toàn bộ text)"""
+        from rules_browser import RulesBrowser
+        
+        rules_window = tk.Toplevel(self.root)
+        rules_window.title("IPTables Rules")
+        rules_window.geometry("1000x600")
+        RulesBrowser(rules_window)
     
     def check_services(self):
         """Kiểm tra trạng thái các dịch vụ"""
@@ -269,74 +353,141 @@ class FirewallGUI:
             'iptables': 'IPTables'
         }
         
-        status_text = "KIỂM TRA DỊCH VỤ:\n\n"
-        
-        for service, name in services.items():
-            try:
-                if service == 'iptables':
-                    # Đơn giản kiểm tra iptables
-                    subprocess.run(['iptables', '-L'], capture_output=True, check=True)
-                    status = "Đang chạy"
-                else:
-                    result = subprocess.run(
-                        ['systemctl', 'is-active', service],
-                        capture_output=True, text=True
-                    )
-                    status = "Đang chạy" if result.stdout.strip() == 'active' else "Dừng"
-                
-                status_text += f"• {name}: {status}\n"
-                
-            except:
-                status_text += f"• {name}: Lỗi\n"
-        
-        messagebox.showinfo("Trạng Thái Dịch Vụ", status_text)
+        def fetch():
+            status_text = "KIỂM TRA DỊCH VỤ:\n\n"
+            
+            for service, name in services.items():
+                try:
+                    if service == 'iptables':
+                        # Đơn giản kiểm tra iptables
+                        subprocess.run(['iptables', '-L'], capture_output=True, check=True)
+                        status = "Đang chạy"
+                    else:
+                        result = subprocess.run(
+                            ['systemctl', 'is-active', service],
+                            capture_output=True, text=True
+                        )
+                        status = "Đang chạy" if result.stdout.strip() == 'active' else "Dừng"
+                    
+                    status_text += f"• {name}: {status}\n"
+                    
+                except:
+                    status_text += f"• {name}: Lỗi\n"
+            return status_text
+        
+        self.worker.submit(
+            fetch, on_done=lambda text: messagebox.showinfo("Trạng Thái Dịch Vụ", text),
+            key='main.services', group='main'
+        )
     
     def view_logs(self):
-        """Xem logs hệ thống"""
+        """Xem logs hệ thống (mmap + chỉ mục dòng, không nạp cả file vào widget)"""
+        from log_viewer import LogViewer
+        from alert_follower import ALERT_LOG
+
         log_window = tk.Toplevel(self.root)
         log_window.title("System Logs")
-        log_window.geometry("600x400")
+        log_window.geometry("900x500")
         
         notebook = ttk.Notebook(log_window)
         notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Tab firewall logs
-        firewall_frame = ttk.Frame(notebook)
-        notebook.add(firewall_frame, text="Firewall Logs")
-        
-        firewall_text = tk.Text(firewall_frame)
-        firewall_scrollbar = ttk.Scrollbar(firewall_frame, orient=tk.VERTICAL, command=firewall_text.yview)
-        firewall_text.config(yscrollcommand=firewall_scrollbar.set)
-        
-        firewall_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        firewall_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        try:
-            # Đọc log firewall
-            log_files = [
-                '/var/log/firewall_auto_block.log',
-                '/var/log/firewall_alerts.json'
-            ]
-            
-            for log_file in log_files:
-                if os.path.exists(log_file):
-                    with open(log_file, 'r') as f:
-                        firewall_text.insert(tk.END, f"=== {log_file} ===\n")
-                        firewall_text.insert(tk.END, f.read())
-                        firewall_text.insert(tk.END, "\n\n")
-        except Exception as e:
-            firewall_text.insert(tk.END, f"Lỗi đọc log: {e}")
-        
-        firewall_text.config(state=tk.DISABLED)
+        for title, log_file in (("Firewall Logs", '/var/log/firewall_auto_block.log'),
+                                ("Cảnh Báo", ALERT_LOG)):
+            viewer = LogViewer(notebook, log_file)
+            notebook.add(viewer, text=title)
+    
+    def load_settings(self):
+        """Đọc cấu hình thông báo từ daemon (nếu đang chạy), không thì từ file (chạy nền)"""
+        def fetch():
+            try:
+                return self.control.get_config()
+            except ControlError:
+                pass
+            try:
+                return load_config_file(CONFIG_FILE)
+            except (OSError, ValueError, ControlError) as e:
+                print(f"Lỗi đọc {CONFIG_FILE}: {e}")
+                return {}
+        
+        def show(config):
+            self.notify_email_var.set(', '.join(config.get('notify_email', [])))
+            self.notify_webhook_var.set(config.get('notify_webhook', ''))
+            self.notify_syslog_var.set(bool(config.get('notify_syslog', False)))
+            self.notify_window_var.set(str(config.get('notify_window', 30)))
+        
+        self.worker.submit(fetch, on_done=show, key='settings.load', replace=True)
     
     def save_settings(self):
-        """Lưu cài đặt"""
-        messagebox.showinfo("Thành công", "Đã lưu cài đặt")
-        self.status_var.set("Đã lưu cài đặt hệ thống")
+        """Lưu cài đặt thông báo: áp dụng ngay cho daemon đang chạy, hoặc ghi file"""
+        try:
+            values = validate_config({
+                'notify_email': self.notify_email_var.get(),
+                'notify_webhook': self.notify_webhook_var.get(),
+                'notify_syslog': self.notify_syslog_var.get(),
+                'notify_window': self.notify_window_var.get(),
+            })
+        except ControlError as e:
+            messagebox.showerror("Lỗi", f"Giá trị không hợp lệ: {e}")
+            return
+        
+        def run():
+            if self.control.is_available():
+                try:
+                    self.control.set_config(values, persist=True)
+                    return True
+                except ControlError as e:
+                    print(f"Không áp dụng được qua socket điều khiển: {e}")
+            config = load_config_file(CONFIG_FILE)
+            config.update(values)
+            save_config_file(config, CONFIG_FILE)
+            return False
+        
+        def done(live):
+            if live:
+                messagebox.showinfo("Thành công", "Đã lưu và áp dụng cài đặt cho daemon đang chạy")
+            else:
+                messagebox.showinfo("Thành công", "Đã lưu cài đặt (áp dụng khi daemon khởi động)")
+            self.status_var.set("Đã lưu cài đặt hệ thống")
+        
+        self.worker.submit(run, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể lưu cài đặt: {e}"),
+                           key='settings.save')
+    
+    def send_test_notification(self):
+        """Nhờ daemon gửi một thông báo thử qua các kênh đã lưu"""
+        def done(channels):
+            messagebox.showinfo("Thành công", f"Đã gửi thông báo thử qua: {', '.join(channels)}")
+        
+        self.worker.submit(self.control.notify_test, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Lỗi", f"Không gửi được thông báo thử: {e}"),
+                           key='settings.notify_test')
+
+def report_first_paint(root, benchmark):
+    """Đo thời gian từ lúc khởi chạy tới khi cửa sổ được vẽ lần đầu"""
+    def on_idle():
+        elapsed_ms = (time.perf_counter() - STARTUP_T0) * 1000
+        verdict = "ĐẠT" if elapsed_ms <= STARTUP_TARGET_MS else "CHẬM"
+        print(f"Thời gian tới lần vẽ đầu tiên: {elapsed_ms:.0f} ms "
+              f"(mục tiêu {STARTUP_TARGET_MS} ms - {verdict})")
+        if benchmark:
+            root.destroy()
+            sys.exit(0 if elapsed_ms <= STARTUP_TARGET_MS else 1)
+    
+    def on_visible(event):
+        root.unbind('<Visibility>')
+        # Lần idle kế tiếp là lúc Tk đã vẽ xong các widget
+        root.after_idle(on_idle)
+    
+    root.bind('<Visibility>', on_visible)
 
 def main():
+    # --benchmark-startup: đo thời gian khởi động rồi thoát (không cần quyền root)
+    benchmark = '--benchmark-startup' in sys.argv
+    
     root = tk.Tk()
-    app = FirewallGUI(root)
+    report_first_paint(root, benchmark)
+    app = FirewallGUI(root, check_root=not benchmark)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Kho lưu chuỗi thời gian dạng round-robin (mmap) cho thống kê kết nối.
+
+File có kích thước cố định, gồm 3 archive 1 giây / 1 phút / 1 giờ. Mỗi slot
+lưu tổng, giá trị lớn nhất và top-N IP của một khoảng thời gian, nên dung
+lượng đĩa và bộ nhớ không tăng theo thời gian.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+from ip_utils import ip_key, key_to_ip
+
+DEFAULT_PATH = '/var/log/firewall/metrics.tsdb'
+
+# Các metric dạng gauge (lấy trung bình theo số mẫu) và dạng sự kiện (cộng dồn)
+GAUGES = ('connections', 'established', 'syn_sent', 'syn_recv',
+          'time_wait', 'close_wait', 'fin_wait', 'other')
+EVENTS = ('blocks', 'alerts')
+METRICS = GAUGES + EVENTS
+
+# (độ phân giải giây, số slot): 1 giờ ở 1s, 7 ngày ở 1m, 1 năm ở 1h
+ARCHIVES = ((1, 3600), (60, 7 * 24 * 60), (3600, 366 * 24))
+
+TOP_N = 10
+
+MAGIC = b'FWTS'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sIIII')
+_HEADER_SIZE = 64
+_SLOT = struct.Struct('<qII%dd%dd' % (len(METRICS), len(METRICS)) + '16sI' * TOP_N)
+_SLOT_START = struct.Struct('<q')
+
+# IP lưu dạng 16 byte (IPv4 ánh xạ ::ffff:a.b.c.d) = ip_utils.ip_key dạng big-endian
+_EMPTY_IP = b'\x00' * 16
+
+
+class _Slot:
+    """Nội dung giải mã của một slot"""
+
+    __slots__ = ('start', 'samples', 'sums', 'maxes', 'top')
+
+    def __init__(self, start):
+        self.start = start
+        self.samples = 0
+        self.sums = [0.0] * len(METRICS)
+        self.maxes = [0.0] * len(METRICS)
+        self.top = {}           # khóa IP -> số kết nối đỉnh
+
+
+class MetricsStore:
+    """Kho chuỗi thời gian kích thước cố định, đọc/ghi qua mmap"""
+
+    def __init__(self, path=DEFAULT_PATH, writable=False):
+        self.path = path
+        self.writable = writable
+        self._file = None
+        self._map = None
+        self._offsets = []
+
+        offset = _HEADER_SIZE
+        for step, slots in ARCHIVES:
+            self._offsets.append(offset)
+            offset += slots * _SLOT.size
+        self.size = offset
+
+    def open(self):
+        """Mở (hoặc tạo) file; trả về False nếu chưa có file để đọc"""
+        if self._map is not None:
+            return True
+
+        if self.writable:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._file = os.fdopen(fd, 'r+b')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                if not self._valid_header():
+                    self._file.truncate(0)
+                    self._file.truncate(self.size)
+                    self._file.seek(0)
+                    self._file.write(_HEADER.pack(MAGIC, VERSION, len(METRICS), TOP_N, len(ARCHIVES)))
+                    self._file.flush()
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._map = mmap.mmap(self._file.fileno(), self.size)
+            return True
+
+        if not os.path.exists(self.path):
+            return False
+        self._file = open(self.path, 'rb')
+        if not self._valid_header():
+            self._file.close()
+            self._file = None
+            return False
+        self._map = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_READ)
+        return True
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _valid_header(self):
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() != self.size:
+            return False
+        self._file.seek(0)
+        header = self._file.read(_HEADER.size)
+        return header == _HEADER.pack(MAGIC, VERSION, len(METRICS), TOP_N, len(ARCHIVES))
+
+    # ---- Mã hóa slot ----
+
+    def _slot_offset(self, archive, bucket_start):
+        step, slots = ARCHIVES[archive]
+        return self._offsets[archive] + ((bucket_start // step) % slots) * _SLOT.size
+
+    def _read_slot(self, offset):
+        values = _SLOT.unpack_from(self._map, offset)
+        count = len(METRICS)
+        slot = _Slot(values[0])
+        slot.samples = values[1]
+        slot.sums = list(values[3:3 + count])
+        slot.maxes = list(values[3 + count:3 + 2 * count])
+        top = values[3 + 2 * count:]
+        for i in range(0, len(top), 2):
+            if top[i + 1] and top[i] != _EMPTY_IP:
+                slot.top[int.from_bytes(top[i], 'big')] = top[i + 1]
+        return slot
+
+    def _write_slot(self, offset, slot):
+        top = sorted(slot.top.items(), key=lambda x: x[1], reverse=True)[:TOP_N]
+        packed_top = []
+        for key, count in top:
+            packed_top.extend((key.to_bytes(16, 'big'), int(count)))
+        packed_top.extend((_EMPTY_IP, 0) * (TOP_N - len(top)))
+        _SLOT.pack_into(self._map, offset, slot.start, slot.samples, 0,
+                        *slot.sums, *slot.maxes, *packed_top)
+
+    def _update(self, timestamp, apply):
+        """Áp dụng hàm apply(slot) lên slot tương ứng ở mọi archive"""
+        if not self.writable or not self.open():
+            raise RuntimeError("MetricsStore chưa được mở ở chế độ ghi")
+
+        timestamp = int(timestamp)
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        try:
+            for archive, (step, slots) in enumerate(ARCHIVES):
+                bucket_start = timestamp - timestamp % step
+                offset = self._slot_offset(archive, bucket_start)
+                slot = self._read_slot(offset)
+                # Slot còn dữ liệu của vòng trước thì ghi đè
+                if slot.start != bucket_start:
+                    slot = _Slot(bucket_start)
+                apply(slot)
+                self._write_slot(offset, slot)
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    # ---- Ghi ----
+
+    def record_sample(self, timestamp, gauges, top_ips=None):
+        """Ghi một mẫu gauge (dict tên -> giá trị) và số kết nối theo IP (khóa IP hoặc chuỗi)"""
+        indexes = [(METRICS.index(name), float(value)) for name, value in gauges.items()
+                   if name in GAUGES]
+        top = []
+        if top_ips:
+            top = sorted(top_ips.items(), key=lambda x: x[1], reverse=True)[:TOP_N]
+            top = [(ip if isinstance(ip, int) else ip_key(ip), count) for ip, count in top]
+
+        def apply(slot):
+            slot.samples += 1
+            for index, value in indexes:
+                slot.sums[index] += value
+                if value > slot.maxes[index]:
+                    slot.maxes[index] = value
+            # Top IP của một khoảng: giữ giá trị đỉnh của từng IP
+            for key, count in top:
+                if count > slot.top.get(key, 0):
+                    slot.top[key] = count
+
+        self._update(timestamp, apply)
+
+    def add_events(self, name, count=1, timestamp=None):
+        """Cộng dồn sự kiện (blocks, alerts) vào khoảng thời gian hiện tại"""
+        if name not in EVENTS:
+            raise ValueError(f"Metric sự kiện không hợp lệ: {name}")
+        index = METRICS.index(name)
+        if timestamp is None:
+            timestamp = time.time()
+
+        def apply(slot):
+            slot.sums[index] += count
+            if slot.sums[index] > slot.maxes[index]:
+                slot.maxes[index] = slot.sums[index]
+
+        self._update(timestamp, apply)
+
+    # ---- Đọc ----
+
+    def pick_archive(self, start, end=None):
+        """Chọn archive mịn nhất còn giữ được thời điểm start"""
+        if end is None:
+            end = time.time()
+        for archive, (step, slots) in enumerate(ARCHIVES):
+            if end - start <= step * (slots + 1):
+                return archive
+        return len(ARCHIVES) - 1
+
+    def _slots(self, start, end, archive):
+        step, slots = ARCHIVES[archive]
+        start = int(start) - int(start) % step
+        end = int(end)
+        # Không đọc quá một vòng của archive
+        start = max(start, end - end % step - (slots - 1) * step)
+        for bucket_start in range(start, end + 1, step):
+            offset = self._slot_offset(archive, bucket_start)
+            # Chỉ giải mã đầy đủ những slot thuộc đúng khoảng thời gian
+            if _SLOT_START.unpack_from(self._map, offset)[0] == bucket_start:
+                yield self._read_slot(offset)
+
+    def read(self, metric, start, end=None, archive=None, aggregate='mean'):
+        """Trả về danh sách (timestamp, giá trị) của một metric trong khoảng thời gian.
+
+        Gauge trả về trung bình theo mẫu (hoặc 'max'); sự kiện trả về tổng trong mỗi khoảng.
+        """
+        if end is None:
+            end = time.time()
+        if not self.open():
+            return []
+        if archive is None:
+            archive = self.pick_archive(start, end)
+
+        index = METRICS.index(metric)
+        is_event = metric in EVENTS
+        points = []
+        for slot in self._slots(start, end, archive):
+            if aggregate == 'max':
+                value = slot.maxes[index]
+            elif is_event:
+                value = slot.sums[index]
+            elif slot.samples:
+                value = slot.sums[index] / slot.samples
+            else:
+                continue
+            points.append((slot.start, value))
+        return points
+
+    def iter_records(self, start, end=None, archive=None):
+        """Duyệt tuần tự từng khoảng: (timestamp, dict metric -> giá trị, dict top IP)"""
+        if end is None:
+            end = time.time()
+        if not self.open():
+            return
+        if archive is None:
+            archive = self.pick_archive(start, end)
+
+        for slot in self._slots(start, end, archive):
+            values = {}
+            for index, name in enumerate(METRICS):
+                if name in EVENTS:
+                    values[name] = slot.sums[index]
+                elif slot.samples:
+                    values[name] = slot.sums[index] / slot.samples
+                else:
+                    values[name] = None
+            yield slot.start, values, {key_to_ip(key): count for key, count in slot.top.items()}
+
+    def read_top_ips(self, start, end=None, archive=None, limit=TOP_N):
+        """Top IP (số kết nối đỉnh) trong khoảng thời gian"""
+        if end is None:
+            end = time.time()
+        if not self.open():
+            return []
+        if archive is None:
+            archive = self.pick_archive(start, end)
+
+        merged = {}
+        for slot in self._slots(start, end, archive):
+            for key, count in slot.top.items():
+                if count > merged.get(key, 0):
+                    merged[key] = count
+        top = sorted(merged.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [(key_to_ip(key), count) for key, count in top]
+
+
+# Khoảng thời gian dùng chung cho GUI và web dashboard
+RANGES = {
+    'hour': 3600,
+    'day': 24 * 3600,
+    'week': 7 * 24 * 3600,
+    'month': 31 * 24 * 3600,
+}
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+Gửi thông báo cảnh báo của auto_block.py qua email (SMTP), webhook và syslog.
+
+Daemon chỉ đưa cảnh báo vào hàng đợi có giới hạn (không bao giờ chờ); một thread
+gộp các cảnh báo trong `notify_window` giây thành một bản tóm tắt, rồi mỗi kênh
+gửi bằng thread riêng với giới hạn số tin mỗi giờ. Khi kênh bị giới hạn hoặc
+lỗi, bản tóm tắt mới được gộp vào bản đang chờ: một đợt DDoS 5.000 lần chặn
+thành vài email chứ không phải 5.000 email.
+
+Thử không cần mail server thật:
+    python3 notifier.py smtp-server --port 2525 --mbox /tmp/firewall.mbox
+    python3 notifier.py test --email admin@example.com --smtp-port 2525 --alerts 5000
+"""
+
+import argparse
+import json
+import logging
+import mailbox
+import queue
+import smtplib
+import socket
+import socketserver
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from ip_utils import parse_network, format_network
+
+QUEUE_SIZE = 10000
+# Số cảnh báo liệt kê chi tiết trong một bản tóm tắt (phần còn lại chỉ được đếm)
+SAMPLE_SIZE = 50
+TOP_NETWORKS = 10
+MAX_BACKOFF = 300
+SYSLOG_ADDRESS = '/dev/log'
+
+# Kênh -> (số tin mỗi giờ mặc định, số tin gửi liền được khi vừa yên lặng)
+DEFAULT_LIMITS = {
+    'email': (12, 3),
+    'webhook': (120, 10),
+    'syslog': (600, 20),
+}
+
+
+# ---- Bản tóm tắt ----
+
+def _network_of(ip):
+    """IP -> dải /24 (IPv4) hoặc /64 (IPv6) chứa nó; dải ngắn hơn giữ nguyên"""
+    try:
+        version, start, end, prefixlen = parse_network(ip)
+    except ValueError:
+        return None
+    bits = 24 if version == 4 else 64
+    if prefixlen <= bits:
+        return format_network(version, start, prefixlen)
+    width = 32 if version == 4 else 128
+    mask = ((1 << bits) - 1) << (width - bits)
+    return format_network(version, start & mask, bits)
+
+
+class Digest:
+    """Tóm tắt nhiều cảnh báo với kích thước giới hạn (đếm + một ít mẫu)"""
+
+    def __init__(self):
+        self.count = 0
+        self.dropped = 0
+        self.actions = Counter()
+        self.reasons = Counter()
+        self.networks = Counter()
+        self.samples = []
+        self.first = None
+        self.last = None
+
+    def add(self, alert):
+        timestamp = alert.get('timestamp') or time.time()
+        self.count += 1
+        self.actions[alert.get('action', '?')] += 1
+        # "SYN flood detected: 80 SYN packets" -> "SYN flood detected"
+        self.reasons[str(alert.get('reason', '')).split(':', 1)[0]] += 1
+        network = _network_of(str(alert.get('ip', '')))
+        if network is not None:
+            self.networks[network] += 1
+        if len(self.samples) < SAMPLE_SIZE:
+            self.samples.append(alert)
+        self.first = timestamp if self.first is None else min(self.first, timestamp)
+        self.last = timestamp if self.last is None else max(self.last, timestamp)
+
+    def merge(self, other):
+        self.count += other.count
+        self.dropped += other.dropped
+        self.actions.update(other.actions)
+        self.reasons.update(other.reasons)
+        self.networks.update(other.networks)
+        self.samples.extend(other.samples[:SAMPLE_SIZE - len(self.samples)])
+        for timestamp in (other.first, other.last):
+            if timestamp is not None:
+                self.first = timestamp if self.first is None else min(self.first, timestamp)
+                self.last = timestamp if self.last is None else max(self.last, timestamp)
+        return self
+
+    def subject(self):
+        blocked = self.actions.get('BLOCKED', 0)
+        text = f"[Firewall {socket.gethostname()}] {self.count} cảnh báo"
+        if blocked:
+            text += f", {blocked} IP/dải bị chặn"
+        return text
+
+    def text(self):
+        def clock(timestamp):
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+        lines = [f"Từ {clock(self.first)} đến {clock(self.last)}: {self.count} cảnh báo", ""]
+        lines.append("Hành động:")
+        lines.extend(f"  {action}: {count}" for action, count in self.actions.most_common())
+        lines.append("Loại:")
+        lines.extend(f"  {reason}: {count}" for reason, count in self.reasons.most_common())
+        if self.networks:
+            lines.append("Dải nguồn nhiều nhất:")
+            lines.extend(f"  {network}: {count}" for network, count in self.networks.most_common(TOP_NETWORKS))
+        lines.append("")
+        lines.append("Chi tiết:")
+        for alert in self.samples:
+            lines.append(f"  {clock(alert.get('timestamp', 0))}  {alert.get('action', '?'):8} "
+                         f"{alert.get('ip', '?'):18} {alert.get('reason', '')}")
+        if self.count > len(self.samples):
+            lines.append(f"  ... và {self.count - len(self.samples)} cảnh báo khác")
+        if self.dropped:
+            lines.append(f"\n{self.dropped} cảnh báo bị bỏ vì hàng đợi thông báo đầy")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """Một dòng (syslog)"""
+        reasons = ', '.join(f"{reason}={count}" for reason, count in self.reasons.most_common(5))
+        networks = ', '.join(f"{network}={count}" for network, count in self.networks.most_common(5))
+        text = f"{self.subject()}; loại: {reasons}"
+        if networks:
+            text += f"; dải: {networks}"
+        if self.dropped:
+            text += f"; bỏ {self.dropped} do hàng đợi đầy"
+        return text
+
+    def to_dict(self):
+        return {
+            'host': socket.gethostname(),
+            'subject': self.subject(),
+            'text': self.text(),
+            'count': self.count,
+            'dropped': self.dropped,
+            'first': self.first,
+            'last': self.last,
+            'actions': dict(self.actions),
+            'reasons': dict(self.reasons),
+            'networks': dict(self.networks.most_common(TOP_NETWORKS)),
+            'alerts': self.samples,
+        }
+
+
+# ---- Kênh gửi ----
+
+class SmtpSink:
+    name = 'email'
+
+    def __init__(self, recipients, host='localhost', port=25, sender=None, timeout=10.0):
+        self.recipients = list(recipients)
+        self.host = host
+        self.port = port
+        self.sender = sender or f"firewall@{socket.gethostname()}"
+        self.timeout = timeout
+
+    def send(self, digest):
+        message = EmailMessage()
+        message['Subject'] = digest.subject()
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message['Date'] = formatdate(localtime=True)
+        message['Message-ID'] = make_msgid()
+        message.set_content(digest.text())
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+class WebhookSink:
+    name = 'webhook'
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, digest):
+        body = json.dumps(digest.to_dict()).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SyslogSink:
+    name = 'syslog'
+    # <facility daemon (3) * 8 + warning (4)>
+    PRIORITY = 3 * 8 + 4
+
+    def __init__(self, address=SYSLOG_ADDRESS):
+        self.address = address
+
+    def send(self, digest):
+        data = f"<{self.PRIORITY}>firewall-auto-block: {digest.summary()}".encode('utf-8')
+        if isinstance(self.address, tuple):
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(data, self.address)
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(data, self.address)
+
+
+class RateLimit:
+    """Token bucket: `per_hour` tin mỗi giờ, gửi liền tối đa `burst` tin"""
+
+    def __init__(self, per_hour, burst):
+        self.rate = per_hour / 3600.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class Channel:
+    """Một kênh với thread riêng: kênh chậm/lỗi không làm chậm kênh khác"""
+
+    def __init__(self, sink, limit):
+        self.sink = sink
+        self.name = sink.name
+        self.limit = limit
+        self.pending = None
+        self.sent = 0
+        self.failed = 0
+        self.backoff = 0
+        self.retry_at = 0
+        self.last_error = None
+        self.stopped = False
+        self.flush = False
+        self.successor = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"notify-{self.name}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, flush=False):
+        """flush=True: gửi nốt bản đang chờ (bỏ qua giới hạn tốc độ) rồi mới dừng"""
+        with self.cond:
+            self.stopped = True
+            self.flush = flush
+            self.cond.notify()
+
+    def hand_over(self, successor):
+        """Dừng kênh và chuyển bản đang chờ, số đếm sang kênh thay thế (đổi cấu hình).
+
+        Không chờ: nếu thread đang gửi dở, chính thread chuyển giao khi gửi xong
+        (bản gửi lỗi quay về pending rồi mới được chuyển), main loop không bị chặn.
+        """
+        with self.cond:
+            self.successor = successor
+            self.stopped = True
+            self.flush = False
+            if self.limit.rate == successor.limit.rate:
+                # Giữ hạn mức đã dùng; thread cũ không đụng tới limit sau khi dừng
+                successor.limit = self.limit
+            self.cond.notify()
+        if self.thread.ident is None:
+            self._hand_over()
+
+    def _hand_over(self):
+        with self.cond:
+            successor = self.successor
+            if successor is None:
+                return
+            pending, self.pending = self.pending, None
+            sent, failed, last_error = self.sent, self.failed, self.last_error
+        with successor.cond:
+            successor.sent += sent
+            successor.failed += failed
+            successor.last_error = successor.last_error or last_error
+            if pending is not None:
+                successor.pending = pending if successor.pending is None else pending.merge(successor.pending)
+                successor.cond.notify()
+
+    def join(self, timeout=None):
+        """Chờ thread kết thúc; trả về True nếu đã kết thúc"""
+        if self.thread.ident is not None:
+            self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def offer(self, digest):
+        """Không chặn: gộp vào bản đang chờ gửi"""
+        with self.cond:
+            if self.pending is None:
+                self.pending = Digest().merge(digest)
+            else:
+                self.pending.merge(digest)
+            self.cond.notify()
+
+    def _run(self):
+        try:
+            self._send_loop()
+        finally:
+            self._hand_over()
+
+    def _send_loop(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    if self.pending is not None:
+                        delay = max(self.limit.wait_time(), self.retry_at - time.monotonic())
+                        if delay <= 0:
+                            break
+                        self.cond.wait(delay)
+                    else:
+                        self.cond.wait()
+                final = self.stopped
+                if final:
+                    if not self.flush or self.pending is None:
+                        return
+                    self.flush = False
+                else:
+                    self.limit.take()
+                digest, self.pending = self.pending, None
+
+            try:
+                self.sink.send(digest)
+            except Exception as e:
+                with self.cond:
+                    self.failed += 1
+                    self.last_error = str(e)
+                    self.backoff = min(MAX_BACKOFF, self.backoff * 2 or 5)
+                    self.retry_at = time.monotonic() + self.backoff
+                    # Giữ lại để gửi cùng bản sau
+                    self.pending = digest if self.pending is None else digest.merge(self.pending)
+                logging.error(f"Lỗi gửi thông báo qua {self.name}: {e}")
+            else:
+                with self.cond:
+                    self.sent += 1
+                    self.backoff = 0
+                    self.retry_at = 0
+            if final:
+                return
+
+    def stats(self):
+        with self.cond:
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'pending': self.pending.count if self.pending else 0,
+                'last_error': self.last_error,
+            }
+
+
+# ---- Pipeline ----
+
+_STOP = object()
+
+
+class Notifier:
+    """notify(alert) được gọi từ main loop của daemon: chỉ put_nowait vào hàng đợi"""
+
+    def __init__(self, channels=(), window=30, queue_size=QUEUE_SIZE):
+        self.channels = list(channels)
+        self.window = window
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.digests = 0
+        self._lock = threading.Lock()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(build_channels(config), config.get('notify_window', 30))
+
+    def start(self):
+        for channel in self.channels:
+            channel.start()
+        self.thread = threading.Thread(target=self._run, name='notify', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10.0):
+        """Gửi nốt bản tóm tắt đang gộp và bản đang chờ của mỗi kênh rồi dừng
+        (chờ tổng cộng tối đa `timeout` giây)"""
+        deadline = time.monotonic() + timeout
+        if self.thread is not None:
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread.join(max(0.0, deadline - time.monotonic()))
+        for channel in self.channels:
+            channel.stop(flush=True)
+        for channel in self.channels:
+            if not channel.join(max(0.0, deadline - time.monotonic())):
+                logging.warning(f"Kênh thông báo {channel.name} chưa gửi xong khi dừng")
+
+    def reconfigure(self, config):
+        """Thay các kênh theo cấu hình mới (gọi từ main loop khi cấu hình đổi, không chờ mạng)"""
+        channels = build_channels(config)
+        # Đổi danh sách kênh dưới khóa: _dispatch không gửi vào kênh đã dừng
+        with self._lock:
+            new = {channel.name: channel for channel in channels}
+            for previous in self.channels:
+                channel = new.get(previous.name)
+                if channel is None:
+                    previous.stop()
+                else:
+                    # Kênh vẫn bật: giữ bản đang chờ, số đếm và hạn mức đã dùng
+                    previous.hand_over(channel)
+            self.channels = channels
+        self.window = config.get('notify_window', self.window)
+        if self.thread is not None:
+            for channel in channels:
+                channel.start()
+
+    def notify(self, alert):
+        if not self.channels:
+            return
+        try:
+            self.queue.put_nowait(alert)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        digest = None
+        deadline = None
+        while True:
+            timeout = None if digest is None else max(0.0, deadline - time.monotonic())
+            try:
+                alert = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                alert = None
+
+            if alert is _STOP:
+                if digest is not None:
+                    self._dispatch(digest)
+                return
+            if alert is not None:
+                if digest is None:
+                    digest = Digest()
+                    deadline = time.monotonic() + self.window
+                digest.add(alert)
+            if digest is not None and time.monotonic() >= deadline:
+                self._dispatch(digest)
+                digest = None
+
+    def _dispatch(self, digest):
+        with self._lock:
+            digest.dropped, self.dropped = self.dropped, 0
+            for channel in self.channels:
+                channel.offer(digest)
+        self.digests += 1
+
+    def send_now(self, digest):
+        """Gửi một bản tóm tắt ngay, bỏ qua cửa sổ gộp (lệnh gửi thử)"""
+        with self._lock:
+            for channel in self.channels:
+                channel.offer(digest)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'dropped': self.dropped,
+            'digests': self.digests,
+            'channels': {channel.name: channel.stats() for channel in self.channels},
+        }
+
+
+def build_channels(config):
+    """Các kênh bật trong cấu hình (khóa notify_* của auto_block.CONFIG)"""
+    channels = []
+    recipients = config.get('notify_email') or []
+    if recipients:
+        sink = SmtpSink(recipients, config.get('notify_smtp_host', 'localhost'),
+                        config.get('notify_smtp_port', 25))
+        channels.append(Channel(sink, RateLimit(config.get('notify_email_per_hour', DEFAULT_LIMITS['email'][0]),
+                                                DEFAULT_LIMITS['email'][1])))
+    if config.get('notify_webhook'):
+        channels.append(Channel(WebhookSink(config['notify_webhook']),
+                                RateLimit(config.get('notify_webhook_per_hour', DEFAULT_LIMITS['webhook'][0]),
+                                          DEFAULT_LIMITS['webhook'][1])))
+    if config.get('notify_syslog'):
+        channels.append(Channel(SyslogSink(), RateLimit(*DEFAULT_LIMITS['syslog'])))
+    return channels
+
+
+def test_digest():
+    digest = Digest()
+    digest.add({'timestamp': time.time(), 'ip': '*', 'action': 'TEST',
+                'reason': "Thông báo thử từ Firewall Management System"})
+    return digest
+
+
+# ---- SMTP server thay thế (thử nghiệm) ----
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, text):
+        self.wfile.write(text.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sender, recipients = None, []
+        self.reply(f"220 {socket.gethostname()} firewall test SMTP")
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            command = line[:4].upper()
+            if command in ('HELO', 'EHLO'):
+                self.reply("250 OK")
+            elif command == 'MAIL':
+                sender, recipients = line.split(':', 1)[1].strip(), []
+                self.reply("250 OK")
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip())
+                self.reply("250 OK")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for chunk in self.rfile:
+                    if chunk in (b'.\r\n', b'.\n'):
+                        break
+                    # Bỏ dấu chấm đệm đầu dòng (RFC 5321 4.5.2)
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                self.server.store(sender, recipients, b''.join(data))
+                self.reply("250 OK")
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif command == 'NOOP':
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SmtpStandIn(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """SMTP server tối giản nhận mọi thư (lưu trong bộ nhớ và tùy chọn file mbox)"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=2525, mbox=None):
+        super().__init__((host, port), _SmtpHandler)
+        self.mbox = mbox
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def store(self, sender, recipients, data):
+        with self._lock:
+            self.messages.append((sender, recipients, data))
+            if self.mbox:
+                box = mailbox.mbox(self.mbox)
+                box.lock()
+                try:
+                    box.add(data)
+                finally:
+                    box.unlock()
+                    box.close()
+        print(f"Nhận thư từ {sender} tới {', '.join(recipients)} ({len(data)} byte)", flush=True)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thông báo cảnh báo firewall")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    server = sub.add_parser('smtp-server', help="Chạy SMTP server thử nghiệm")
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=2525)
+    server.add_argument('--mbox', help="Lưu thư nhận được vào file mbox")
+
+    test = sub.add_parser('test', help="Đẩy cảnh báo giả qua pipeline và in thống kê")
+    test.add_argument('--email', help="Người nhận, cách nhau bởi dấu phẩy")
+    test.add_argument('--smtp-host', default='127.0.0.1')
+    test.add_argument('--smtp-port', type=int, default=2525)
+    test.add_argument('--webhook')
+    test.add_argument('--syslog', action='store_true')
+    test.add_argument('--alerts', type=int, default=1000)
+    test.add_argument('--window', type=int, default=2)
+    test.add_argument('--wait', type=float, default=5.0, help="Số giây chờ các kênh gửi xong")
+    args = parser.parse_args(argv)
+
+    if args.command == 'smtp-server':
+        standin = SmtpStandIn(args.host, args.port, args.mbox)
+        print(f"SMTP thử nghiệm: {args.host}:{standin.server_address[1]}")
+        try:
+            standin.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    notifier = Notifier.from_config({
+        'notify_email': args.email.split(',') if args.email else [],
+        'notify_smtp_host': args.smtp_host,
+        'notify_smtp_port': args.smtp_port,
+        'notify_webhook': args.webhook,
+        'notify_syslog': args.syslog,
+        'notify_window': args.window,
+    })
+    if not notifier.channels:
+        parser.error("cần ít nhất một kênh: --email, --webhook hoặc --syslog")
+    notifier.start()
+
+    started = time.perf_counter()
+    for i in range(args.alerts):
+        notifier.notify({
+            'id': f"test{i:08x}",
+            'timestamp': time.time(),
+            'ip': f"203.0.{(i >> 8) & 255}.{i & 255}",
+            'reason': f"Connection flood detected: {100 + i % 500} connections",
+            'action': 'BLOCKED',
+        })
+    elapsed = time.perf_counter() - started
+    print(f"Đưa {args.alerts} cảnh báo vào hàng đợi trong {elapsed * 1000:.1f} ms")
+
+    time.sleep(args.window + args.wait)
+    notifier.stop()
+    print(json.dumps(notifier.stats(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
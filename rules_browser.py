@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Bảng rules iptables ảo hóa: dữ liệu phân tích từ iptables-save -c, lọc/sắp xếp
+trong bộ nhớ, Treeview chỉ chứa một trang và tốc độ gói/byte được lấy mẫu định kỳ
+"""
+
+import shlex
+import subprocess
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+from gui_worker import get_worker, BusyIndicator
+from iptables_rules import RulesCache
+from tree_sync import sync_tree
+
+# Chu kỳ lấy mẫu bộ đếm (ms)
+SAMPLE_INTERVAL_MS = 5000
+PAGE_SIZE = 200
+
+# Cột Treeview: (tên cột, tiêu đề, thuộc tính Rule, độ rộng)
+COLUMNS = (
+    ('chain', 'Chain', 'chain', 90),
+    ('num', '#', 'num', 50),
+    ('target', 'Target', 'target', 90),
+    ('protocol', 'Prot', 'protocol', 60),
+    ('source', 'Nguồn', 'source', 150),
+    ('destination', 'Đích', 'destination', 150),
+    ('dport', 'Port', 'dport', 70),
+    ('packets', 'Gói', 'packets', 90),
+    ('bytes', 'Bytes', 'bytes', 90),
+    ('pps', 'Gói/s', 'pps', 80),
+    ('bps', 'Bytes/s', 'bps', 90),
+)
+
+
+def format_bytes(value):
+    for unit in ('B', 'K', 'M', 'G'):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == 'B' else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}T"
+
+
+def rule_iid(rule):
+    """iid ổn định của rule trong Treeview (không đổi khi vị trí rule dịch chuyển)"""
+    return '|'.join(str(part) for part in rule.key)
+
+
+def rule_values(rule):
+    return (rule.chain, rule.num, rule.target, rule.protocol, rule.source,
+            rule.destination, rule.dport, rule.packets, format_bytes(rule.bytes),
+            f"{rule.pps:.1f}", format_bytes(rule.bps))
+
+
+class RulesBrowser:
+    def __init__(self, parent):
+        self.parent = parent
+        self.worker = get_worker(parent)
+        self.rules_cache = RulesCache(max_age=SAMPLE_INTERVAL_MS / 1000 / 2)
+
+        self.rules = []          # snapshot mới nhất
+        self.filtered = []       # sau khi lọc + sắp xếp
+        self.page = 0
+        self.sort_field = 'num'
+        self.sort_descending = False
+
+        self.create_widgets()
+        self.schedule_sample()
+
+    def create_widgets(self):
+        # Thanh lọc
+        filter_frame = ttk.Frame(self.parent)
+        filter_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(filter_frame, text="Chain:").pack(side=tk.LEFT)
+        self.chain_var = tk.StringVar(value='Tất cả')
+        self.chain_combo = ttk.Combobox(filter_frame, textvariable=self.chain_var,
+                                        values=['Tất cả'], state='readonly', width=12)
+        self.chain_combo.pack(side=tk.LEFT, padx=5)
+        self.chain_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+
+        ttk.Label(filter_frame, text="Target:").pack(side=tk.LEFT)
+        self.target_var = tk.StringVar(value='Tất cả')
+        self.target_combo = ttk.Combobox(filter_frame, textvariable=self.target_var,
+                                         values=['Tất cả'], state='readonly', width=10)
+        self.target_combo.pack(side=tk.LEFT, padx=5)
+        self.target_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_filter())
+
+        ttk.Label(filter_frame, text="Tìm:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=5)
+        search_entry.bind('<Return>', lambda e: self.apply_filter())
+
+        self.idle_only_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(filter_frame, text="Chỉ rule không có traffic",
+                        variable=self.idle_only_var, command=self.apply_filter).pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(filter_frame, text="Làm Mới", command=self.sample).pack(side=tk.RIGHT)
+        BusyIndicator(filter_frame, self.worker, 'firewall', side=tk.RIGHT, padx=5)
+
+        # Bảng rules
+        table_frame = ttk.Frame(self.parent)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tree = ttk.Treeview(table_frame, columns=[c[0] for c in COLUMNS], show='headings')
+        for column, heading, field, width in COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda f=field: self.sort_by(f))
+            anchor = tk.E if field in ('num', 'packets', 'bytes', 'pps', 'bps') else tk.W
+            self.tree.column(column, width=width, anchor=anchor)
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # Phân trang + thao tác
+        nav_frame = ttk.Frame(self.parent)
+        nav_frame.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Button(nav_frame, text="< Trước", command=lambda: self.go_page(-1)).pack(side=tk.LEFT)
+        self.page_var = tk.StringVar(value="Trang 0/0")
+        ttk.Label(nav_frame, textvariable=self.page_var).pack(side=tk.LEFT, padx=10)
+        ttk.Button(nav_frame, text="Sau >", command=lambda: self.go_page(1)).pack(side=tk.LEFT)
+
+        ttk.Button(nav_frame, text="Xóa Rule Đã Chọn", command=self.delete_selected).pack(side=tk.RIGHT)
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(nav_frame, textvariable=self.summary_var).pack(side=tk.RIGHT, padx=10)
+
+    # ---- Lấy mẫu bộ đếm ----
+
+    def schedule_sample(self):
+        # Chỉ lấy mẫu khi tab đang hiển thị
+        if self.parent.winfo_ismapped():
+            self.sample()
+        self.parent.after(SAMPLE_INTERVAL_MS, self.schedule_sample)
+
+    def sample(self):
+        self.worker.submit(self.fetch_rules, on_done=self.on_rules,
+                           on_error=lambda e: print(f"Lỗi đọc rules: {e}"),
+                           key='firewall.rules', group='firewall')
+
+    def fetch_rules(self):
+        # Chạy trong thread nền
+        self.rules_cache.refresh()
+        return self.rules_cache.rules
+
+    def on_rules(self, rules):
+        self.rules = rules
+
+        chains = sorted({rule.chain for rule in rules})
+        targets = sorted({rule.target for rule in rules if rule.target})
+        self.chain_combo['values'] = ['Tất cả'] + chains
+        self.target_combo['values'] = ['Tất cả'] + targets
+
+        self.apply_filter(keep_page=True)
+
+    # ---- Lọc, sắp xếp, phân trang (trong bộ nhớ) ----
+
+    def apply_filter(self, keep_page=False):
+        chain = self.chain_var.get()
+        target = self.target_var.get()
+        search = self.search_var.get().strip()
+        idle_only = self.idle_only_var.get()
+
+        rules = self.rules
+        if chain != 'Tất cả':
+            rules = [r for r in rules if r.chain == chain]
+        if target != 'Tất cả':
+            rules = [r for r in rules if r.target == target]
+        if search:
+            rules = [r for r in rules if search in r.spec]
+        if idle_only:
+            rules = [r for r in rules if r.packets == 0]
+
+        if self.sort_field == 'num':
+            rules = sorted(rules, key=lambda r: (r.table, r.chain, r.num), reverse=self.sort_descending)
+        else:
+            field = self.sort_field
+            rules = sorted(rules, key=lambda r: getattr(r, field), reverse=self.sort_descending)
+
+        self.filtered = rules
+        if not keep_page:
+            self.page = 0
+        self.page = min(self.page, max(0, self.page_count() - 1))
+        self.render_page()
+
+    def sort_by(self, field):
+        if self.sort_field == field:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_field = field
+            # Cột số mặc định giảm dần (rule nóng nhất lên đầu)
+            self.sort_descending = field in ('packets', 'bytes', 'pps', 'bps')
+        self.apply_filter()
+
+    def page_count(self):
+        return (len(self.filtered) + PAGE_SIZE - 1) // PAGE_SIZE
+
+    def go_page(self, step):
+        page = self.page + step
+        if 0 <= page < self.page_count():
+            self.page = page
+            self.render_page()
+
+    def render_page(self):
+        """Đồng bộ Treeview với trang hiện tại theo iid: chỉ sửa dòng thay đổi"""
+        start = self.page * PAGE_SIZE
+        page_rules = self.filtered[start:start + PAGE_SIZE]
+
+        sync_tree(self.tree, [(rule_iid(rule), rule_values(rule)) for rule in page_rules])
+
+        self.page_var.set(f"Trang {self.page + 1 if self.filtered else 0}/{self.page_count()}")
+        total_pps = sum(rule.pps for rule in self.filtered)
+        self.summary_var.set(f"{len(self.filtered)}/{len(self.rules)} rules - {total_pps:.1f} gói/s")
+
+    # ---- Xóa rule ----
+
+    def delete_selected(self):
+        selected = set(self.tree.selection())
+        rules = [rule for rule in self.filtered if rule_iid(rule) in selected]
+        if not rules:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn rule để xóa")
+            return
+        if not messagebox.askyesno("Xác nhận", f"Xóa {len(rules)} rule đã chọn?"):
+            return
+
+        def delete():
+            # Xóa theo nội dung rule (không theo số thứ tự vì có thể đã dịch chuyển)
+            failed = 0
+            for rule in rules:
+                command = ['iptables', '-t', rule.table, '-D', rule.chain] + shlex.split(rule.spec)
+                if subprocess.run(command, capture_output=True).returncode != 0:
+                    failed += 1
+            return failed
+
+        def done(failed):
+            if failed:
+                messagebox.showerror("Lỗi", f"Không xóa được {failed}/{len(rules)} rule")
+            self.sample()
+
+        self.worker.submit(delete, on_done=done,
+                           on_error=lambda e: messagebox.showerror("Lỗi", f"Không thể xóa rule: {e}"),
+                           group='firewall')
@@ -1,6 +1,7 @@
 import tkinter as tk
-from tkinter import ttk
-import matplotlib.pyplot as plt
+from tkinter import ttk, messagebox
+import matplotlib.style
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
@@ -8,23 +9,90 @@ import json
 import subprocess
 from collections import defaultdict, deque
 import threading
+import math
 import time
 
+from metrics_store import MetricsStore, RANGES
+from stats_collector import ConnectionCollector, AlertHistogram
+from ip_utils import key_to_ip
+from alert_follower import AlertFollower
+from stats_export import export_statistics, FORMATS, DATASETS
+from gui_worker import get_worker, BusyIndicator
+
+# Chu kỳ thu thập dữ liệu (giây) và chu kỳ kiểm tra cần vẽ lại (ms)
+COLLECT_INTERVAL = 10
+REDRAW_POLL_MS = 500
+
+CONNECTION_TYPES = ['ESTABLISHED', 'SYN-SENT', 'SYN-RECV', 'TIME-WAIT', 'KHÁC']
+HOURS = [f'{i:02d}:00' for i in range(24)]
+TOP_IP_BARS = 5
+
+# Lựa chọn khoảng thời gian cho biểu đồ kết nối
+HISTORY_RANGES = {
+    'Trực tiếp': None,
+    '1 giờ': 'hour',
+    '1 ngày': 'day',
+    '1 tuần': 'week',
+    '1 tháng': 'month',
+}
+
 class StatisticsTab:
     def __init__(self, parent):
         self.parent = parent
+        self.worker = get_worker(parent)
         self.connection_data = deque(maxlen=100)  # Lưu 100 điểm dữ liệu
         self.alert_data = deque(maxlen=50)       # Lưu 50 cảnh báo
         self.ip_connections = defaultdict(int)
+        self.state_counts = defaultdict(int)
+        self.port_counts = defaultdict(int)
+        self.collector = ConnectionCollector()
+        self.alert_histogram = AlertHistogram()
+        self.alert_follower = AlertFollower(self.on_new_alerts)
+        self.metrics_store = MetricsStore()  # Lịch sử do auto_block.py ghi
+        
+        # Thread thu thập chỉ đặt cờ, việc vẽ luôn chạy trên main loop của Tk
+        self.data_lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.frame_times = deque(maxlen=20)
+        self.frame_started = None
         
         self.setup_matplotlib()
         self.create_widgets()
         self.start_data_collection()
     
     def setup_matplotlib(self):
-        """Thiết lập matplotlib với style đẹp hơn"""
-        plt.style.use('ggplot')
-        self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(12, 8))
+        """Thiết lập matplotlib và tạo sẵn các artist (chỉ tạo một lần)"""
+        # Dùng Figure trực tiếp thay vì pyplot: nhẹ hơn và không có state toàn cục
+        matplotlib.style.use('ggplot')
+        self.fig = Figure(figsize=(12, 8))
+        ((self.ax1, self.ax2), (self.ax3, self.ax4)) = self.fig.subplots(2, 2)
+        
+        # Biểu đồ 1: đường tổng số kết nối
+        self.conn_line, = self.ax1.plot([], [], 'b-', linewidth=2)
+        self.ax1.xaxis_date()
+        self.ax1.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M'))
+        self.ax1.set_title('Tổng Số Kết Nối Theo Thời Gian')
+        self.ax1.set_ylabel('Số Kết Nối')
+        self.ax1.tick_params(axis='x', rotation=45)
+        self.ax1.grid(True, alpha=0.3)
+        
+        # Biểu đồ 2: pie trạng thái, cập nhật góc của từng wedge
+        self.state_wedges, self.state_labels, self.state_pcts = self.ax2.pie(
+            [1] * len(CONNECTION_TYPES), labels=CONNECTION_TYPES, autopct='%1.1f%%'
+        )
+        self.ax2.set_title('Phân Loại Kết Nối')
+        
+        # Biểu đồ 3: top IP, cố định số cột và chỉ đổi chiều cao/nhãn
+        self.top_ip_bars = self.ax3.bar(range(TOP_IP_BARS), [0] * TOP_IP_BARS, color='skyblue')
+        self.ax3.set_xticks(range(TOP_IP_BARS))
+        self.ax3.set_title('Top 5 IP Nhiều Kết Nối Nhất')
+        self.ax3.tick_params(axis='x', rotation=45)
+        
+        # Biểu đồ 4: cảnh báo theo giờ
+        self.alert_bars = self.ax4.bar(HOURS, [0] * len(HOURS), color='orange', alpha=0.7)
+        self.ax4.set_title('Cảnh Báo Theo Giờ')
+        self.ax4.tick_params(axis='x', rotation=45)
+        
         self.fig.tight_layout(pad=3.0)
     
     def create_widgets(self):
@@ -39,12 +107,23 @@ class StatisticsTab:
         ttk.Button(control_frame, text="Làm Mới", command=self.refresh_data).pack(side=tk.LEFT)
         ttk.Button(control_frame, text="Xuất Báo Cáo", command=self.export_report).pack(side=tk.LEFT, padx=5)
         
+        ttk.Label(control_frame, text="Khoảng thời gian:").pack(side=tk.LEFT, padx=(20, 5))
+        self.history_range = ttk.Combobox(control_frame, values=list(HISTORY_RANGES), state='readonly', width=12)
+        self.history_range.set('Trực tiếp')
+        self.history_range.bind('<<ComboboxSelected>>', lambda e: self.schedule_redraw())
+        self.history_range.pack(side=tk.LEFT)
+        
+        # Thời gian vẽ một khung (đo chi phí vẽ lại)
+        self.frame_time_var = tk.StringVar(value="Khung hình: -")
+        ttk.Label(control_frame, textvariable=self.frame_time_var).pack(side=tk.RIGHT)
+        BusyIndicator(control_frame, self.worker, 'statistics', side=tk.RIGHT, padx=5)
+        
         # Matplotlib canvas
         canvas_frame = ttk.Frame(main_frame)
         canvas_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
         self.canvas = FigureCanvasTkAgg(self.fig, canvas_frame)
-        self.canvas.draw()
+        self.canvas.mpl_connect('draw_event', self.on_draw_finished)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
         # Bottom frame for alerts and top IPs
@@ -71,6 +150,9 @@ class StatisticsTab:
         self.top_ips_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         top_ips_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        # Tab vừa hiện ra thì vẽ bù phần dữ liệu đã thay đổi
+        self.parent.bind('<Map>', lambda e: self.poll_redraw(reschedule=False))
+        
         # Initial data load
         self.refresh_data()
     
@@ -80,166 +162,273 @@ class StatisticsTab:
             while True:
                 try:
                     self.collect_connection_stats()
-                    self.collect_alerts()
-                    self.update_displays()
-                    time.sleep(10)  # Cập nhật mỗi 10 giây
+                    self.dirty.set()
+                    time.sleep(COLLECT_INTERVAL)
                 except Exception as e:
                     print(f"Lỗi thu thập dữ liệu: {e}")
                     time.sleep(30)
         
         thread = threading.Thread(target=collect_data, daemon=True)
         thread.start()
+        
+        # Cảnh báo được đẩy tới qua inotify, không cần đọc lại cả file
+        self.alert_follower.start()
+        
+        self.parent.after(REDRAW_POLL_MS, self.poll_redraw)
+    
+    def schedule_redraw(self):
+        """Đánh dấu cần vẽ lại; việc vẽ diễn ra ở lần poll kế tiếp trên main loop"""
+        self.dirty.set()
+        self.parent.after_idle(lambda: self.poll_redraw(reschedule=False))
+    
+    def poll_redraw(self, reschedule=True):
+        """Chạy trên main loop của Tk: chỉ vẽ khi có dữ liệu mới và tab đang hiển thị"""
+        try:
+            if self.dirty.is_set() and self.parent.winfo_ismapped():
+                self.dirty.clear()
+                self.update_displays()
+        except Exception as e:
+            print(f"Lỗi cập nhật biểu đồ: {e}")
+        
+        if reschedule:
+            self.parent.after(REDRAW_POLL_MS, self.poll_redraw)
     
     def collect_connection_stats(self):
-        """Thu thập thống kê kết nối"""
+        """Thu thập thống kê kết nối (một lần duyệt /proc/net/tcp)"""
         try:
-            # Lấy số lượng kết nối hiện tại
-            result = subprocess.run(['ss', '-tn'], capture_output=True, text=True)
-            connection_count = 0
-            current_ips = defaultdict(int)
-            
-            for line in result.stdout.split('\n'):
-                if 'ESTAB' in line or 'SYN-' in line:
-                    connection_count += 1
-                    parts = line.split()
-                    if len(parts) >= 5:
-                        ip = parts[4].split(':')[0]
-                        if self.is_valid_ip(ip):
-                            current_ips[ip] += 1
+            snapshot = self.collector.collect()
             
             # Cập nhật dữ liệu
-            timestamp = datetime.now()
-            self.connection_data.append((timestamp, connection_count))
-            self.ip_connections = current_ips
+            timestamp = datetime.fromtimestamp(snapshot.timestamp)
+            with self.data_lock:
+                self.connection_data.append((timestamp, snapshot.total))
+                self.ip_connections = snapshot.ips
+                self.state_counts = snapshot.states
+                self.port_counts = snapshot.ports
             
         except Exception as e:
             print(f"Lỗi thu thập thống kê: {e}")
     
     def collect_alerts(self):
-        """Thu thập cảnh báo từ file log"""
+        """Đọc ngay các cảnh báo mới trong journal"""
         try:
-            alert_file = '/var/log/firewall_alerts.json'
-            if os.path.exists(alert_file):
-                with open(alert_file, 'r') as f:
-                    alerts = json.load(f)
-                
-                # Chỉ lấy alerts mới
-                for alert in alerts[-10:]:  # 10 alerts gần nhất
-                    alert_time = datetime.fromtimestamp(alert['timestamp'])
-                    alert_text = f"{alert_time.strftime('%H:%M:%S')} - {alert['ip']} - {alert['reason']}\n"
-                    
-                    if alert_text not in self.alert_data:
-                        self.alert_data.append(alert_text)
-            
+            self.alert_follower.poll()
         except Exception as e:
             print(f"Lỗi thu thập cảnh báo: {e}")
     
+    def on_new_alerts(self, alerts):
+        """Nhận cảnh báo mới (đã loại trùng theo ID) từ AlertFollower"""
+        with self.data_lock:
+            for alert in alerts:
+                alert_time = datetime.fromtimestamp(alert['timestamp'])
+                self.alert_data.append(
+                    f"{alert_time.strftime('%H:%M:%S')} - {alert['ip']} - {alert['reason']}\n"
+                )
+                self.alert_histogram.add(alert['timestamp'])
+        self.dirty.set()
+    
     def update_displays(self):
-        """Cập nhật hiển thị"""
+        """Cập nhật hiển thị (chỉ gọi từ main loop của Tk)"""
         self.update_charts()
         self.update_alerts_text()
         self.update_top_ips_text()
     
     def update_charts(self):
-        """Cập nhật biểu đồ"""
-        # Clear all axes
-        for ax in [self.ax1, self.ax2, self.ax3, self.ax4]:
-            ax.clear()
+        """Cập nhật dữ liệu của các artist có sẵn rồi yêu cầu vẽ lại khi rảnh"""
+        self.frame_started = time.perf_counter()
         
         # Biểu đồ 1: Tổng số kết nối theo thời gian
-        if self.connection_data:
-            times, connections = zip(*self.connection_data)
-            self.ax1.plot(times, connections, 'b-', linewidth=2)
-            self.ax1.set_title('Tổng Số Kết Nối Theo Thời Gian')
-            self.ax1.set_ylabel('Số Kết Nối')
-            self.ax1.tick_params(axis='x', rotation=45)
-            self.ax1.grid(True, alpha=0.3)
-        
-        # Biểu đồ 2: Phân loại kết nối (giả lập)
-        connection_types = ['ESTABLISHED', 'SYN-SENT', 'SYN-RECEIVED', 'TIME-WAIT']
-        connection_counts = [len(self.connection_data) * 0.6, 
-                           len(self.connection_data) * 0.1, 
-                           len(self.connection_data) * 0.1, 
-                           len(self.connection_data) * 0.2]
-        self.ax2.pie(connection_counts, labels=connection_types, autopct='%1.1f%%')
-        self.ax2.set_title('Phân Loại Kết Nối')
+        history = self.get_connection_history()
+        if history:
+            times, connections = zip(*history)
+            self.conn_line.set_data(mdates.date2num(times), connections)
+        else:
+            self.conn_line.set_data([], [])
+        self.ax1.relim()
+        self.ax1.autoscale_view()
+        
+        # Biểu đồ 2: Phân loại kết nối theo trạng thái thực tế
+        with self.data_lock:
+            states = dict(self.state_counts)
+        values = [states.pop(state, 0) for state in CONNECTION_TYPES[:-1]]
+        values.append(sum(states.values()))
+        self.update_pie(values)
         
         # Biểu đồ 3: Top 5 IP có nhiều kết nối nhất
-        if self.ip_connections:
-            top_ips = sorted(self.ip_connections.items(), key=lambda x: x[1], reverse=True)[:5]
-            ips, counts = zip(*top_ips) if top_ips else ([], [])
-            self.ax3.bar(ips, counts, color='skyblue')
-            self.ax3.set_title('Top 5 IP Nhiều Kết Nối Nhất')
-            self.ax3.tick_params(axis='x', rotation=45)
-        
-        # Biểu đồ 4: Số lượng cảnh báo (giả lập)
-        hours = [f'{i:02d}:00' for i in range(24)]
-        alert_counts = [max(0, len(self.alert_data) // 24 + (i % 3)) for i in range(24)]
-        self.ax4.bar(hours, alert_counts, color='orange', alpha=0.7)
-        self.ax4.set_title('Cảnh Báo Theo Giờ')
-        self.ax4.tick_params(axis='x', rotation=45)
+        with self.data_lock:
+            top_ips = sorted(self.ip_connections.items(), key=lambda x: x[1], reverse=True)[:TOP_IP_BARS]
+        labels = [key_to_ip(key) for key, _ in top_ips] + [''] * (TOP_IP_BARS - len(top_ips))
+        counts = [count for _, count in top_ips] + [0] * (TOP_IP_BARS - len(top_ips))
+        for bar, count in zip(self.top_ip_bars, counts):
+            bar.set_height(count)
+        self.ax3.set_xticklabels(labels)
+        self.ax3.set_ylim(0, max(counts + [1]) * 1.1)
+        
+        # Biểu đồ 4: Số lượng cảnh báo theo giờ trong 24 giờ gần nhất
+        alert_counts = self.alert_histogram.values()
+        for bar, count in zip(self.alert_bars, alert_counts):
+            bar.set_height(count)
+        self.ax4.set_ylim(0, max(alert_counts + [1]) * 1.1)
+        
+        self.update_time_ms = (time.perf_counter() - self.frame_started) * 1000
+        self.canvas.draw_idle()
+    
+    def update_pie(self, values):
+        """Cập nhật góc các wedge của pie thay vì vẽ lại từ đầu"""
+        total = sum(values)
+        angle = 0.0
+        for wedge, label, pct, value in zip(self.state_wedges, self.state_labels, self.state_pcts, values):
+            span = 360.0 * value / total if total else 0.0
+            wedge.set_theta1(angle)
+            wedge.set_theta2(angle + span)
+            
+            middle = math.radians(angle + span / 2)
+            label.set_position((1.1 * math.cos(middle), 1.1 * math.sin(middle)))
+            label.set_horizontalalignment('left' if math.cos(middle) >= 0 else 'right')
+            label.set_visible(span > 0)
+            pct.set_position((0.6 * math.cos(middle), 0.6 * math.sin(middle)))
+            pct.set_text(f"{100.0 * value / total:.1f}%" if total else '')
+            pct.set_visible(span > 0)
+            angle += span
+    
+    def on_draw_finished(self, event):
+        """Đo thời gian một khung hình: từ lúc cập nhật dữ liệu đến khi vẽ xong"""
+        if self.frame_started is None:
+            return
+        frame_ms = (time.perf_counter() - self.frame_started) * 1000
+        self.frame_started = None
+        self.frame_times.append(frame_ms)
+        average = sum(self.frame_times) / len(self.frame_times)
+        self.frame_time_var.set(
+            f"Khung hình: {frame_ms:.0f} ms (cập nhật {self.update_time_ms:.1f} ms, "
+            f"TB {average:.0f} ms, max {max(self.frame_times):.0f} ms)"
+        )
+    
+    def get_connection_history(self):
+        """Dữ liệu biểu đồ kết nối: bộ nhớ (trực tiếp) hoặc kho chuỗi thời gian"""
+        range_name = HISTORY_RANGES.get(self.history_range.get())
+        if range_name is None:
+            with self.data_lock:
+                return list(self.connection_data)
         
-        self.canvas.draw()
+        end = time.time()
+        try:
+            points = self.metrics_store.read('connections', end - RANGES[range_name], end)
+        except Exception as e:
+            print(f"Lỗi đọc lịch sử thống kê: {e}")
+            return []
+        return [(datetime.fromtimestamp(ts), value) for ts, value in points]
     
     def update_alerts_text(self):
         """Cập nhật text cảnh báo"""
         self.alerts_text.delete(1.0, tk.END)
-        for alert in list(self.alert_data)[-10:]:  # Hiển thị 10 cảnh báo gần nhất
+        with self.data_lock:
+            recent_alerts = list(self.alert_data)[-10:]
+        for alert in recent_alerts:  # Hiển thị 10 cảnh báo gần nhất
             self.alerts_text.insert(tk.END, alert)
     
     def update_top_ips_text(self):
         """Cập nhật top IP"""
         self.top_ips_text.delete(1.0, tk.END)
-        if self.ip_connections:
+        with self.data_lock:
             top_ips = sorted(self.ip_connections.items(), key=lambda x: x[1], reverse=True)[:10]
-            for ip, count in top_ips:
-                self.top_ips_text.insert(tk.END, f"{ip}: {count} kết nối\n")
+            top_ports = sorted(self.port_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        if top_ips:
+            for key, count in top_ips:
+                self.top_ips_text.insert(tk.END, f"{key_to_ip(key)}: {count} kết nối\n")
+            self.top_ips_text.insert(tk.END, "\nCổng cục bộ:\n")
+            for port, count in top_ports:
+                self.top_ips_text.insert(tk.END, f"{port}: {count} kết nối\n")
         else:
             self.top_ips_text.insert(tk.END, "Không có dữ liệu")
     
     def refresh_data(self):
-        """Làm mới dữ liệu"""
-        self.collect_connection_stats()
-        self.collect_alerts()
-        self.update_displays()
+        """Làm mới dữ liệu (thu thập chạy nền, vẽ lại trên main loop)"""
+        def collect():
+            self.collect_connection_stats()
+            self.collect_alerts()
+        
+        self.worker.submit(collect, on_done=lambda result: self.schedule_redraw(),
+                           key='statistics.refresh', group='statistics')
     
     def export_report(self):
-        """Xuất báo cáo thống kê"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"/tmp/firewall_report_{timestamp}.txt"
-            
-            with open(filename, 'w') as f:
-                f.write("BÁO CÁO THỐNG KÊ FIREWALL\n")
-                f.write("=" * 50 + "\n")
-                f.write(f"Thời gian: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-                
-                f.write("THỐNG KÊ KẾT NỐI:\n")
-                f.write(f"- Tổng số kết nối theo dõi: {len(self.connection_data)}\n")
-                f.write(f"- Số IP duy nhất: {len(self.ip_connections)}\n\n")
-                
-                f.write("TOP IP KẾT NỐI NHIỀU NHẤT:\n")
-                if self.ip_connections:
-                    top_ips = sorted(self.ip_connections.items(), key=lambda x: x[1], reverse=True)[:10]
-                    for i, (ip, count) in enumerate(top_ips, 1):
-                        f.write(f"{i:2d}. {ip}: {count} kết nối\n")
-                f.write("\n")
-                
-                f.write("CẢNH BÁO GẦN ĐÂY:\n")
-                for alert in list(self.alert_data)[-10:]:
-                    f.write(alert)
-            
-            messagebox.showinfo("Thành công", f"Đã xuất báo cáo: {filename}")
+        """Xuất lịch sử thống kê ra file (chạy nền, có thanh tiến trình)"""
+        dialog = tk.Toplevel(self.parent)
+        dialog.title("Xuất Báo Cáo Thống Kê")
+        dialog.resizable(False, False)
+        
+        ttk.Label(dialog, text="Khoảng thời gian:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=2)
+        range_box = ttk.Combobox(dialog, values=list(HISTORY_RANGES)[1:], state='readonly', width=15)
+        range_box.set('1 ngày')
+        range_box.grid(row=0, column=1, padx=5, pady=2)
+        
+        ttk.Label(dialog, text="Định dạng:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
+        format_box = ttk.Combobox(dialog, values=FORMATS, state='readonly', width=15)
+        format_box.set('csv')
+        format_box.grid(row=1, column=1, padx=5, pady=2)
+        
+        ttk.Label(dialog, text="Thư mục:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=2)
+        output_dir = tk.StringVar(value='/tmp')
+        ttk.Entry(dialog, textvariable=output_dir, width=17).grid(row=2, column=1, padx=5, pady=2)
+        
+        compress = tk.BooleanVar(value=False)
+        ttk.Checkbutton(dialog, text="Nén (gzip/zstd)", variable=compress).grid(
+            row=3, column=0, columnspan=2, sticky=tk.W, padx=5, pady=2)
+        
+        progress_bar = ttk.Progressbar(dialog, maximum=len(DATASETS), length=250)
+        progress_bar.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
+        progress_var = tk.StringVar(value="")
+        ttk.Label(dialog, textvariable=progress_var).grid(row=5, column=0, columnspan=2, padx=5)
+        
+        # Thread xuất chỉ ghi vào state; dialog đọc state qua after()
+        state = {'dataset': None, 'rows': 0, 'done': 0, 'result': None, 'error': None, 'finished': False}
+        
+        def on_progress(dataset, rows):
+            if state['dataset'] not in (None, dataset):
+                state['done'] += 1
+            state['dataset'] = dataset
+            state['rows'] = rows
+        
+        def run_export(options):
+            # Chạy trong thread riêng: chỉ dùng giá trị đã đọc từ widget trên main thread
+            try:
+                end = time.time()
+                start = end - RANGES[HISTORY_RANGES[options['range']]]
+                state['result'] = export_statistics(start, end, options['directory'], options['format'],
+                                                    options['compress'], progress=on_progress)
+            except Exception as e:
+                state['error'] = e
+            finally:
+                state['finished'] = True
+        
+        def poll():
+            if state['dataset']:
+                progress_bar['value'] = state['done']
+                progress_var.set(f"{state['dataset']}: {state['rows']} dòng")
+            if not state['finished']:
+                dialog.after(200, poll)
+                return
             
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Không thể xuất báo cáo: {e}")
-    
-    def is_valid_ip(self, ip):
-        """Kiểm tra IP hợp lệ"""
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        try:
-            return all(0 <= int(part) <= 255 for part in parts)
-        except ValueError:
-            return False
\ No newline at end of file
+            progress_bar['value'] = len(DATASETS)
+            export_btn.config(state=tk.NORMAL)
+            if state['error']:
+                messagebox.showerror("Lỗi", f"Không thể xuất báo cáo: {state['error']}", parent=dialog)
+                return
+            summary = "\n".join(f"{path} ({rows} dòng)" for path, rows in state['result'].values())
+            messagebox.showinfo("Thành công", f"Đã xuất báo cáo:\n{summary}", parent=dialog)
+            dialog.destroy()
+        
+        def start_export():
+            export_btn.config(state=tk.DISABLED)
+            state.update(dataset=None, rows=0, done=0, result=None, error=None, finished=False)
+            options = {
+                'range': range_box.get(),
+                'format': format_box.get(),
+                'directory': output_dir.get(),
+                'compress': compress.get(),
+            }
+            threading.Thread(target=run_export, args=(options,), daemon=True).start()
+            dialog.after(200, poll)
+        
+        export_btn = ttk.Button(dialog, text="Xuất", command=start_export)
+        export_btn.grid(row=6, column=0, columnspan=2, pady=5)
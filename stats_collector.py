@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Thu thập thống kê kết nối TCP trong một lần duyệt /proc/net/tcp{,6}
+và biểu đồ cảnh báo theo giờ được cập nhật tăng dần
+"""
+
+import time
+from collections import defaultdict
+
+from ip_utils import V4_BASE
+
+PROC_FILES = (
+    ('/proc/net/tcp', False),
+    ('/proc/net/tcp6', True),
+)
+
+# Mã trạng thái TCP trong /proc/net/tcp (include/net/tcp_states.h)
+TCP_STATES = {
+    '01': 'ESTABLISHED',
+    '02': 'SYN-SENT',
+    '03': 'SYN-RECV',
+    '04': 'FIN-WAIT-1',
+    '05': 'FIN-WAIT-2',
+    '06': 'TIME-WAIT',
+    '07': 'CLOSE',
+    '08': 'CLOSE-WAIT',
+    '09': 'LAST-ACK',
+    '0A': 'LISTEN',
+    '0B': 'CLOSING',
+    '0C': 'NEW-SYN-RECV',
+}
+
+LISTEN = '0A'
+SYN_STATES = ('02', '03', '0C')
+# Kết nối "đang hoạt động" giống bộ lọc cũ `ESTAB` hoặc `SYN-` của ss
+ACTIVE_STATES = ('01',) + SYN_STATES
+
+_ADDR_CACHE_LIMIT = 65536
+
+
+class ConnectionSnapshot:
+    """Kết quả một lần thu thập"""
+
+    __slots__ = ('timestamp', 'states', 'ips', 'syn_ips', 'ports', 'total')
+
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+        self.states = defaultdict(int)   # trạng thái -> số socket
+        self.ips = defaultdict(int)      # khóa IP đối tác (ip_utils.ip_key) -> số kết nối đang hoạt động
+        self.syn_ips = defaultdict(int)  # khóa IP đối tác -> số kết nối SYN
+        self.ports = defaultdict(int)    # cổng cục bộ -> số kết nối đang hoạt động
+        self.total = 0                   # tổng socket (trừ LISTEN)
+
+
+class ConnectionCollector:
+    """Đọc /proc/net/tcp và /proc/net/tcp6 một lần, không fork `ss`/`netstat`"""
+
+    def __init__(self, proc_files=PROC_FILES):
+        self.proc_files = proc_files
+        self._addr_cache = {}
+
+    def collect(self):
+        snapshot = ConnectionSnapshot(time.time())
+        for path, ipv6 in self.proc_files:
+            try:
+                with open(path, 'r') as f:
+                    f.readline()  # Bỏ dòng tiêu đề
+                    self.parse_lines(f, ipv6, snapshot)
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    def parse_lines(self, lines, ipv6, snapshot):
+        """Duyệt các dòng /proc/net/tcp và cộng dồn vào snapshot"""
+        states = snapshot.states
+        ips = snapshot.ips
+        syn_ips = snapshot.syn_ips
+        ports = snapshot.ports
+        decode = self.decode_key
+        total = 0
+
+        for line in lines:
+            fields = line.split(None, 4)
+            if len(fields) < 4:
+                continue
+            state = fields[3]
+            if state == LISTEN:
+                continue
+
+            total += 1
+            states[TCP_STATES.get(state, state)] += 1
+
+            if state in ACTIVE_STATES:
+                remote_hex, _, _ = fields[2].rpartition(':')
+                ip = decode(remote_hex, ipv6)
+                ips[ip] += 1
+                if state in SYN_STATES:
+                    syn_ips[ip] += 1
+                ports[int(fields[1].rpartition(':')[2], 16)] += 1
+
+        snapshot.total += total
+
+    def decode_key(self, hex_addr, ipv6):
+        """Chuyển địa chỉ hex (little-endian theo từng word 32 bit) sang khóa IP số nguyên;
+        IPv4 trong tcp6 (::ffff:a.b.c.d) tự trùng khóa với IPv4"""
+        key = self._addr_cache.get(hex_addr)
+        if key is not None:
+            return key
+
+        raw = bytes.fromhex(hex_addr)
+        if ipv6:
+            raw = b''.join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+            key = int.from_bytes(raw, 'big')
+        else:
+            key = V4_BASE | int.from_bytes(raw, 'little')
+
+        if len(self._addr_cache) >= _ADDR_CACHE_LIMIT:
+            self._addr_cache.clear()
+        self._addr_cache[hex_addr] = key
+        return key
+
+
+def _local_hour(timestamp):
+    """Thời điểm bắt đầu (epoch) của giờ địa phương chứa timestamp.
+
+    Tính theo giờ địa phương chứ không phải timestamp // 3600 (giờ UTC): với
+    múi giờ lệch nửa giờ (+05:30) một giờ UTC trải trên hai ô giờ địa phương.
+    """
+    t = time.localtime(timestamp)
+    return int(timestamp) - t.tm_min * 60 - t.tm_sec
+
+
+class AlertHistogram:
+    """Số cảnh báo theo giờ trong 24 giờ gần nhất, cập nhật khi có cảnh báo mới"""
+
+    def __init__(self):
+        self.counts = [0] * 24
+        self.hours = [None] * 24  # Đầu giờ địa phương (epoch, _local_hour) của từng ô
+
+    def add(self, timestamp, count=1):
+        hour = _local_hour(timestamp)
+        if hour <= _local_hour(time.time()) - 24 * 3600:
+            return
+        slot = time.localtime(timestamp).tm_hour
+        if self.hours[slot] != hour:
+            self.hours[slot] = hour
+            self.counts[slot] = 0
+        self.counts[slot] += count
+
+    def values(self, now=None):
+        """Danh sách 24 giá trị theo giờ trong ngày (00:00 -> 23:00)"""
+        if now is None:
+            now = time.time()
+        oldest = _local_hour(now) - 23 * 3600
+        return [count if hour is not None and hour >= oldest else 0
+                for count, hour in zip(self.counts, self.hours)]
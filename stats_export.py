@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Xuất lịch sử thống kê (kết nối, số kết nối theo IP, cảnh báo, sự kiện chặn)
+ra CSV, JSON Lines hoặc Parquet. Dữ liệu được ghi theo từng khối nên bộ nhớ
+không phụ thuộc vào độ dài khoảng thời gian.
+
+Ví dụ:
+    sudo python3 stats_export.py --range week --format csv --gzip -o /tmp/report
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from metrics_store import MetricsStore, METRICS, RANGES
+from alert_follower import ALERT_LOG
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+CHUNK_ROWS = 10000
+
+DATASETS = {
+    'connections': ['timestamp', 'time'] + list(METRICS),
+    'ip_counts': ['timestamp', 'time', 'ip', 'connections'],
+    'alerts': ['timestamp', 'time', 'id', 'ip', 'reason', 'action'],
+    'blocks': ['timestamp', 'time', 'id', 'ip', 'reason', 'action'],
+}
+
+# Độ phân giải có thể chọn cho dữ liệu kết nối
+RESOLUTIONS = {'1s': 0, '1m': 1, '1h': 2}
+
+
+class ExportError(Exception):
+    pass
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
+
+# ---- Nguồn dữ liệu (generator, không nạp toàn bộ vào bộ nhớ) ----
+
+def iter_connections(store, start, end, archive=None):
+    for timestamp, values, top in store.iter_records(start, end, archive):
+        row = [timestamp, _iso(timestamp)]
+        row.extend(values[name] for name in METRICS)
+        yield row
+
+
+def iter_ip_counts(store, start, end, archive=None):
+    for timestamp, values, top in store.iter_records(start, end, archive):
+        iso = _iso(timestamp)
+        for ip, count in sorted(top.items(), key=lambda x: x[1], reverse=True):
+            yield [timestamp, iso, ip, count]
+
+
+def iter_alerts(start, end, alert_log=ALERT_LOG, action=None):
+    # File đã xoay vòng (.1) chứa các cảnh báo cũ hơn
+    for path in (alert_log + '.1', alert_log):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    alert = json.loads(line)
+                except ValueError:
+                    continue
+                timestamp = alert.get('timestamp', 0)
+                if timestamp < start or timestamp > end:
+                    continue
+                if action and alert.get('action') != action:
+                    continue
+                yield [timestamp, _iso(timestamp), alert.get('id', ''), alert.get('ip', ''),
+                       alert.get('reason', ''), alert.get('action', '')]
+
+
+# ---- Bộ ghi theo định dạng ----
+
+class CsvWriter:
+    def __init__(self, path, columns, compress):
+        self.file = gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter:
+    def __init__(self, path, columns, compress):
+        self.file = gzip.open(path, 'wt') if compress else open(path, 'w')
+        self.columns = columns
+
+    def write_rows(self, rows):
+        columns = self.columns
+        self.file.write(''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, columns, compress):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ExportError("Cần cài pyarrow để xuất Parquet: pip3 install pyarrow")
+        self.pa = pyarrow
+        self.columns = columns
+        self.path = path
+        self.compression = 'zstd' if compress else 'snappy'
+        self.writer = None
+        self.parquet = pyarrow.parquet
+
+    def write_rows(self, rows):
+        # Mỗi khối là một row group
+        arrays = {name: [row[i] for row in rows] for i, name in enumerate(self.columns)}
+        table = self.pa.table(arrays)
+        if self.writer is None:
+            self.writer = self.parquet.ParquetWriter(self.path, table.schema, compression=self.compression)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+WRITERS = {'csv': CsvWriter, 'jsonl': JsonlWriter, 'parquet': ParquetWriter}
+
+
+def output_path(output_dir, prefix, dataset, fmt, compress):
+    extension = fmt
+    if compress and fmt != 'parquet':
+        extension += '.gz'
+    return os.path.join(output_dir, f"{prefix}_{dataset}.{extension}")
+
+
+def export_dataset(rows, path, columns, fmt, compress=False, progress=None, dataset=''):
+    """Ghi một dataset theo khối CHUNK_ROWS dòng; trả về số dòng đã ghi"""
+    writer = WRITERS[fmt](path, columns, compress)
+    written = 0
+    chunk = []
+    try:
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                writer.write_rows(chunk)
+                written += len(chunk)
+                chunk = []
+                if progress:
+                    progress(dataset, written)
+        if chunk:
+            writer.write_rows(chunk)
+            written += len(chunk)
+    finally:
+        writer.close()
+
+    if progress:
+        progress(dataset, written)
+    return written
+
+
+def export_statistics(start, end, output_dir, fmt='csv', compress=False, datasets=None,
+                      resolution=None, prefix=None, progress=None,
+                      store=None, alert_log=ALERT_LOG):
+    """Xuất các dataset trong khoảng [start, end]; trả về dict dataset -> (file, số dòng)"""
+    if fmt not in FORMATS:
+        raise ExportError(f"Định dạng không hỗ trợ: {fmt}")
+    if end <= start:
+        raise ExportError("Thời điểm kết thúc phải sau thời điểm bắt đầu")
+
+    datasets = datasets or list(DATASETS)
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown:
+        raise ExportError(f"Dataset không hợp lệ: {', '.join(unknown)}")
+
+    if store is None:
+        store = MetricsStore()
+    archive = RESOLUTIONS.get(resolution) if resolution else None
+    prefix = prefix or f"firewall_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    sources = {
+        'connections': lambda: iter_connections(store, start, end, archive),
+        'ip_counts': lambda: iter_ip_counts(store, start, end, archive),
+        'alerts': lambda: iter_alerts(start, end, alert_log),
+        'blocks': lambda: iter_alerts(start, end, alert_log, action='BLOCKED'),
+    }
+
+    results = {}
+    for dataset in datasets:
+        path = output_path(output_dir, prefix, dataset, fmt, compress)
+        rows = export_dataset(sources[dataset](), path, DATASETS[dataset], fmt,
+                              compress, progress, dataset)
+        results[dataset] = (path, rows)
+    return results
+
+
+def parse_time(value):
+    """Nhận epoch (giây) hoặc thời gian ISO 8601"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Xuất lịch sử thống kê firewall")
+    parser.add_argument('--range', choices=list(RANGES), help="Khoảng thời gian tính tới hiện tại")
+    parser.add_argument('--start', type=parse_time, help="Thời điểm bắt đầu (epoch hoặc ISO 8601)")
+    parser.add_argument('--end', type=parse_time, help="Thời điểm kết thúc (mặc định: hiện tại)")
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--gzip', action='store_true', help="Nén output (Parquet dùng zstd)")
+    parser.add_argument('--resolution', choices=list(RESOLUTIONS),
+                        help="Độ phân giải dữ liệu kết nối (mặc định: tự chọn)")
+    parser.add_argument('--datasets', default=','.join(DATASETS),
+                        help="Danh sách dataset, cách nhau bởi dấu phẩy")
+    parser.add_argument('-o', '--output-dir', default='/tmp')
+    args = parser.parse_args(argv)
+
+    end = args.end if args.end else time.time()
+    if args.start:
+        start = args.start
+    else:
+        start = end - RANGES[args.range or 'day']
+
+    def progress(dataset, rows):
+        print(f"\r{dataset}: {rows} dòng", end='', file=sys.stderr, flush=True)
+
+    try:
+        results = export_statistics(start, end, args.output_dir, args.format, args.gzip,
+                                    args.datasets.split(','), args.resolution, progress=progress)
+    except ExportError as e:
+        print(f"\nLỗi: {e}", file=sys.stderr)
+        return 1
+
+    print(file=sys.stderr)
+    for dataset, (path, rows) in results.items():
+        print(f"{dataset}: {rows} dòng -> {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
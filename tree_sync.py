@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Đồng bộ Treeview với danh sách dòng theo iid: chỉ thêm/xóa/sửa các dòng thay đổi,
+nhờ đó giữ được vùng chọn và vị trí cuộn của người dùng
+"""
+
+
+def _same(current, values):
+    return tuple(str(v) for v in current) == tuple(str(v) for v in values)
+
+
+def sync_tree(tree, rows):
+    """rows: danh sách (iid, values) theo đúng thứ tự cần hiển thị.
+
+    Trả về (số dòng thêm, số dòng xóa, số dòng sửa).
+    """
+    wanted = {iid for iid, values in rows}
+    stale = [iid for iid in tree.get_children() if iid not in wanted]
+    if stale:
+        tree.delete(*stale)
+
+    children = list(tree.get_children())
+    added = updated = 0
+    for position, (iid, values) in enumerate(rows):
+        if position < len(children) and children[position] == iid:
+            if not _same(tree.item(iid, 'values'), values):
+                tree.item(iid, values=values)
+                updated += 1
+            continue
+
+        if iid in wanted and tree.exists(iid):
+            # Dòng đã có nhưng sai vị trí
+            children.remove(iid)
+            tree.move(iid, '', position)
+            if not _same(tree.item(iid, 'values'), values):
+                tree.item(iid, values=values)
+                updated += 1
+        else:
+            tree.insert('', position, iid=iid, values=values)
+            added += 1
+        children.insert(position, iid)
+
+    return added, len(stale), updated
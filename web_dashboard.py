@@ -3,17 +3,59 @@
 Web Dashboard để quản trị firewall
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 import subprocess
 import json
+import gzip
 import os
 from datetime import datetime
 
+from iptables_rules import RulesCache, IPTABLES
+from metrics_store import MetricsStore, METRICS, RANGES
+from ban_index import get_ban_index, SOURCE_MANUAL, BACKEND_IPTABLES
+from control_socket import (ControlClient, ControlError, validate_config,
+                            load_config_file, save_config_file)
+from ip_utils import is_valid_ip, parse_network, check_block_network, NetworkSet
+
 app = Flask(__name__)
 
 # File lưu trữ alerts
 ALERT_FILE = '/var/log/firewall_alerts.json'
 
+# Cache rules đã phân tích, dùng chung cho mọi request
+rules_cache = RulesCache(max_age=2.0)
+
+# Kho chuỗi thời gian do auto_block.py ghi, web chỉ đọc
+metrics_store = MetricsStore()
+
+# Chỉ mục chặn dùng chung với daemon và GUI
+ban_index = get_ban_index()
+
+# Socket điều khiển của auto_block.py đang chạy
+control = ControlClient()
+
+def compressed_json(payload):
+    """Trả JSON, nén gzip nếu trình duyệt hỗ trợ"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    if 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return Response(body, mimetype='application/json')
+    
+    response = Response(gzip.compress(body, compresslevel=6), mimetype='application/json')
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def current_whitelist():
+    """Whitelist đang dùng: của daemon nếu đang chạy, không thì của file cấu hình"""
+    try:
+        config = control.get_config()
+    except ControlError:
+        try:
+            config = load_config_file()
+        except (OSError, ValueError, ControlError):
+            config = {}
+    return NetworkSet(config.get('whitelist', []))
+
 class FirewallManager:
     @staticmethod
     def get_iptables_rules():
@@ -29,52 +71,41 @@ class FirewallManager:
     
     @staticmethod
     def get_blocked_ips():
-        """Lấy danh sách IP đang bị chặn"""
-        blocked = []
+        """Lấy danh sách IP/dải mạng đang bị chặn (mọi nguồn)"""
         try:
-            result = subprocess.run(
-                ['iptables', '-L', 'INPUT', '-n', '--line-numbers'],
-                capture_output=True, text=True
-            )
-            for line in result.stdout.split('\n'):
-                if 'DROP' in line:
-                    parts = line.split()
-                    for part in parts:
-                        if FirewallManager.is_valid_ip(part):
-                            blocked.append(part)
-            return list(set(blocked))
+            ban_index.reload()
+            return [record.network for record in ban_index.entries()]
         except Exception as e:
             return []
     
     @staticmethod
-    def is_valid_ip(ip):
-        """Kiểm tra IP hợp lệ"""
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        try:
-            return all(0 <= int(part) <= 255 for part in parts)
-        except ValueError:
-            return False
-    
-    @staticmethod
-    def block_ip(ip):
-        """Chặn IP thủ công"""
+    def block_ip(ip, reason='Chặn thủ công từ web', ttl=None):
+        """Chặn IP thủ công (bỏ qua nếu IP đã nằm trong một dải đang bị chặn)"""
+        added, covering = ban_index.add(ip, SOURCE_MANUAL, reason, ttl=ttl)
+        if not added:
+            if covering is not None:
+                return False, f"IP {ip} đã bị chặn bởi {covering.network} ({covering.source})"
+            return False, f"IP {ip} đã bị chặn"
         try:
             subprocess.run([
-                'iptables', '-I', 'INPUT', '1', '-s', ip, '-j', 'DROP'
+                IPTABLES[parse_network(ip)[0]], '-I', 'INPUT', '1', '-s', ip, '-j', 'DROP'
             ], check=True)
             return True, f"Đã chặn IP {ip}"
         except subprocess.CalledProcessError as e:
+            ban_index.remove(ip)
             return False, f"Lỗi khi chặn IP: {e}"
     
     @staticmethod
     def unblock_ip(ip):
         """Gỡ chặn IP"""
+        record = ban_index.get(ip)
+        if record is not None and record.backend != BACKEND_IPTABLES:
+            return False, f"IP {ip} bị chặn bởi {record.source}, hãy gỡ ban từ đó"
         try:
             subprocess.run([
-                'iptables', '-D', 'INPUT', '-s', ip, '-j', 'DROP'
+                IPTABLES[parse_network(ip)[0]], '-D', 'INPUT', '-s', ip, '-j', 'DROP'
             ], check=True)
+            ban_index.remove(ip)
             return True, f"Đã gỡ chặn IP {ip}"
         except subprocess.CalledProcessError as e:
             return False, f"Lỗi khi gỡ chặn IP: {e}"
@@ -101,9 +132,10 @@ def index():
 @app.route('/api/status')
 def api_status():
     """API trạng thái hệ thống"""
+    blocked_ips = FirewallManager.get_blocked_ips()
     status = {
-        'blocked_ips': FirewallManager.get_blocked_ips(),
-        'total_blocked': len(FirewallManager.get_blocked_ips()),
+        'blocked_ips': blocked_ips,
+        'total_blocked': len(blocked_ips),
         'alerts': FirewallManager.get_alerts()[:10],  # 10 alerts mới nhất
         'timestamp': datetime.now().isoformat()
     }
@@ -115,10 +147,20 @@ def api_block_ip():
     data = request.json
     ip = data.get('ip', '').strip()
     
-    if not FirewallManager.is_valid_ip(ip):
+    if not is_valid_ip(ip, allow_network=True):
         return jsonify({'success': False, 'message': 'IP không hợp lệ'})
+    try:
+        check_block_network(ip, current_whitelist())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    
+    ttl = data.get('ttl')
+    try:
+        ttl = int(ttl) if ttl else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'TTL không hợp lệ'})
     
-    success, message = FirewallManager.block_ip(ip)
+    success, message = FirewallManager.block_ip(ip, ttl=ttl)
     return jsonify({'success': success, 'message': message})
 
 @app.route('/api/unblock_ip', methods=['POST'])
@@ -127,17 +169,139 @@ def api_unblock_ip():
     data = request.json
     ip = data.get('ip', '').strip()
     
-    if not FirewallManager.is_valid_ip(ip):
+    if not is_valid_ip(ip, allow_network=True):
         return jsonify({'success': False, 'message': 'IP không hợp lệ'})
     
     success, message = FirewallManager.unblock_ip(ip)
     return jsonify({'success': success, 'message': message})
 
+@app.route('/api/bans')
+def api_bans():
+    """API chỉ mục chặn hợp nhất (auto_block, thủ công, fail2ban, rule có sẵn)"""
+    ban_index.reload()
+    ip = request.args.get('ip', '').strip()
+    if ip:
+        records = ban_index.covering(ip)
+    else:
+        records = ban_index.entries(request.args.get('source') or None)
+    return compressed_json({
+        'total': len(records),
+        'bans': [record.to_dict() for record in records]
+    })
+
 @app.route('/api/rules')
 def api_rules():
     """API xem rules iptables"""
     rules = FirewallManager.get_iptables_rules()
     return jsonify({'rules': rules})
 
+@app.route('/api/rules/parsed')
+def api_rules_parsed():
+    """API rules đã phân tích: lọc, sắp xếp, phân trang và tốc độ theo rule"""
+    args = request.args
+    try:
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', 100))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Tham số phân trang không hợp lệ'}), 400
+    
+    try:
+        result = rules_cache.query(
+            chain=args.get('chain'),
+            table=args.get('table'),
+            target=args.get('target'),
+            search=args.get('search'),
+            sort=args.get('sort', 'num'),
+            descending=args.get('order') == 'desc',
+            page=page,
+            per_page=per_page
+        )
+    except (subprocess.CalledProcessError, OSError) as e:
+        return jsonify({'success': False, 'message': f"Lỗi đọc rules: {e}"}), 500
+    
+    result['success'] = True
+    return compressed_json(result)
+
+@app.route('/api/metrics')
+def api_metrics():
+    """API lịch sử thống kê theo khoảng thời gian (hour/day/week/month)"""
+    range_name = request.args.get('range', 'day')
+    if range_name not in RANGES:
+        return jsonify({'success': False, 'message': 'Khoảng thời gian không hợp lệ'}), 400
+    
+    names = request.args.get('metrics', 'connections').split(',')
+    if any(name not in METRICS for name in names):
+        return jsonify({'success': False, 'message': 'Metric không hợp lệ'}), 400
+    
+    end = datetime.now().timestamp()
+    start = end - RANGES[range_name]
+    series = {name: metrics_store.read(name, start, end) for name in names}
+    
+    return compressed_json({
+        'success': True,
+        'range': range_name,
+        'series': series,
+        'top_ips': metrics_store.read_top_ips(start, end)
+    })
+
+@app.route('/api/config', methods=['GET', 'POST'])
+def api_config():
+    """API cấu hình auto-block: đọc/áp dụng ngay cho daemon, ghi file nếu daemon tắt"""
+    if request.method == 'GET':
+        try:
+            return jsonify({'success': True, 'live': True, 'config': control.get_config()})
+        except ControlError:
+            try:
+                config = load_config_file()
+            except (OSError, ValueError, ControlError) as e:
+                return jsonify({'success': False, 'message': f"Lỗi đọc file cấu hình: {e}"}), 500
+            return jsonify({'success': True, 'live': False, 'config': config})
+    
+    data = request.json or {}
+    try:
+        values = validate_config(data.get('values', {}))
+    except ControlError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if control.is_available():
+        try:
+            applied = control.set_config(values, persist=data.get('persist', True))
+            return jsonify({'success': True, 'live': True, 'config': applied})
+        except ControlError as e:
+            return jsonify({'success': False, 'message': str(e)}), 503
+    
+    try:
+        config = load_config_file()
+        config.update(values)
+        save_config_file(config)
+    except (OSError, ValueError, ControlError) as e:
+        return jsonify({'success': False, 'message': f"Lỗi ghi file cấu hình: {e}"}), 500
+    return jsonify({'success': True, 'live': False, 'config': values,
+                    'message': 'Daemon không chạy, cấu hình áp dụng khi khởi động'})
+
+@app.route('/api/daemon/stats')
+def api_daemon_stats():
+    """API thống kê của daemon auto-block"""
+    try:
+        return jsonify({'success': True, 'stats': control.stats()})
+    except ControlError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+@app.route('/api/daemon/top')
+def api_daemon_top():
+    """API các IP vi phạm nhiều nhất trong cửa sổ hiện tại (metric: conn/syn/http)"""
+    try:
+        n = int(request.args.get('n', 10))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'n không hợp lệ'}), 400
+    metric = request.args.get('metric', 'conn')
+    if metric not in ('conn', 'syn', 'http'):
+        return jsonify({'success': False, 'message': 'Metric không hợp lệ'}), 400
+    
+    try:
+        return jsonify({'success': True, 'metric': metric, 'top': control.top(metric, n)})
+    except ControlError as e:
+        return jsonify({'success': False, 'message': str(e)}), 503
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
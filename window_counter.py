@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Bộ đếm cửa sổ trượt theo khóa (IP): lưu số đếm theo từng bucket thời gian thay
+vì từng timestamp, nên không bị giới hạn số sự kiện như deque(maxlen=...)
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class WindowCounter:
+    """Tổng số sự kiện của mỗi khóa trong `window` giây gần nhất.
+
+    Dùng chung cho thống kê TCP (SYN, kết nối) và số request HTTP; an toàn khi
+    thread đọc log thêm số đếm trong lúc vòng lặp chính kiểm tra ngưỡng.
+    """
+
+    def __init__(self, window, resolution=1.0):
+        self.window = window
+        self.resolution = resolution
+        self.buckets = {}       # khóa -> deque([bucket, số đếm])
+        self.totals = {}        # khóa -> tổng trong cửa sổ
+        self._lock = threading.Lock()
+
+    def _bucket(self, now):
+        return int(now // self.resolution)
+
+    def add(self, key, count=1, now=None):
+        bucket = self._bucket(time.time() if now is None else now)
+        with self._lock:
+            self._add(key, count, bucket)
+
+    def add_many(self, counts, now=None):
+        """counts: dict/Counter khóa -> số đếm, cùng một thời điểm"""
+        bucket = self._bucket(time.time() if now is None else now)
+        with self._lock:
+            for key, count in counts.items():
+                self._add(key, count, bucket)
+
+    def _add(self, key, count, bucket):
+        slots = self.buckets.get(key)
+        if slots is None:
+            slots = self.buckets[key] = deque()
+            self.totals[key] = 0
+        if slots and slots[-1][0] == bucket:
+            slots[-1][1] += count
+        else:
+            slots.append([bucket, count])
+        self.totals[key] += count
+
+    def expire(self, now=None):
+        """Bỏ các bucket đã ra khỏi cửa sổ"""
+        cutoff = self._bucket((time.time() if now is None else now) - self.window)
+        with self._lock:
+            for key in list(self.buckets):
+                slots = self.buckets[key]
+                while slots and slots[0][0] <= cutoff:
+                    self.totals[key] -= slots.popleft()[1]
+                if not slots:
+                    del self.buckets[key]
+                    del self.totals[key]
+
+    def total(self, key):
+        with self._lock:
+            return self.totals.get(key, 0)
+
+    def over(self, threshold):
+        """Các (khóa, tổng) có tổng vượt ngưỡng"""
+        with self._lock:
+            return [(key, total) for key, total in self.totals.items() if total > threshold]
+
+    def top(self, n):
+        with self._lock:
+            return sorted(self.totals.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def __len__(self):
+        return len(self.totals)
+
+    def __contains__(self, key):
+        return key in self.totals